@@ -5,9 +5,26 @@
 __version__ = "1.0.0"
 __author__ = "1x1,wfy"
 
-from .models import ExcelItem, ExcelFile, ExcelData, SaveRequest, UndoResponse
-from .excel_service import ExcelService, excel_service
-from .main import app
+import importlib
+
+from .models import ExcelItem, ExcelFile, ExcelData, SaveRequest, UndoResponse, JobInfo, QueryResult
+
+# 服务、任务和应用按需导入，导入包本身不会加载 FastAPI 和解析依赖
+_LAZY_ATTRS = {
+    "ExcelService": ".excel_service",
+    "excel_service": ".excel_service",
+    "JobManager": ".jobs",
+    "job_manager": ".jobs",
+    "app": ".main",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
+
 
 __all__ = [
     "ExcelItem",
@@ -15,7 +32,11 @@ __all__ = [
     "ExcelData",
     "SaveRequest",
     "UndoResponse",
+    "JobInfo",
+    "QueryResult",
     "ExcelService",
     "excel_service",
+    "JobManager",
+    "job_manager",
     "app"
 ]
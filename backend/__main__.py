@@ -0,0 +1,10 @@
+"""
+批量维护命令行入口：python -m backend --help
+"""
+
+import sys
+
+from .cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
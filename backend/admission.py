@@ -0,0 +1,122 @@
+"""
+接口准入控制
+
+读取、保存、比较、查询、导出等需要解析或写入xlsx的操作进入 heavy 通道，工作表列表、版本列表、撤回等
+轻量操作进入 light 通道。每个通道有并发上限和有界的等待队列：
+
+- 有空闲名额时立即执行
+- 名额用完时排队（先到先得），最多等待 max_wait 秒
+- 队列已满或等待超时时抛出 Overloaded，接口返回503和 Retry-After，客户端稍后重试
+
+通道在事件循环中排队，阻塞操作由调用方放到线程池执行，事件循环本身不会被解析阻塞，
+/health、/files 等不经过通道的接口在过载时仍能立即响应。
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+
+class Overloaded(Exception):
+    """通道已饱和（队列已满或等待超时）"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Lane:
+    """有并发上限和有界等待队列的通道（只在事件循环线程中使用）"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.max_wait = max_wait
+        self.running = 0
+        self._waiters: deque = deque()
+        # 单次操作耗时的指数移动平均，用于估算 Retry-After
+        self._average = 1.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """估算排在队尾的请求需要等待的秒数（1到60秒）"""
+        estimate = self._average * (self.waiting + 1) / self.concurrency
+        return min(60, max(1, math.ceil(estimate)))
+
+    def _reject(self, reason: str, message: str):
+        metrics.ADMISSION.inc(lane=self.name, result=reason)
+        raise Overloaded(message, self.retry_after())
+
+    async def acquire(self):
+        """获取一个名额，通道饱和时抛出 Overloaded"""
+        if self.running < self.concurrency and not self._waiters:
+            self.running += 1
+            metrics.ADMISSION.inc(lane=self.name, result="admitted")
+            return
+        if len(self._waiters) >= self.queue_size:
+            self._reject("rejected", "服务器繁忙，请稍后重试")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        metrics.ADMISSION_QUEUE.set(len(self._waiters), lane=self.name)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # 超时或取消的同时已得到名额：转交给下一个等待者
+                self.release()
+            else:
+                future.cancel()
+                self._waiters.remove(future)
+            metrics.ADMISSION_QUEUE.set(len(self._waiters), lane=self.name)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("timeout", f"排队超过{self.max_wait:g}秒，请稍后重试")
+            raise
+        metrics.ADMISSION_QUEUE.set(len(self._waiters), lane=self.name)
+        metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, lane=self.name)
+        metrics.ADMISSION.inc(lane=self.name, result="queued")
+
+    def release(self):
+        """释放名额：有等待者时直接转交，否则空出名额"""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    def observe(self, seconds: float):
+        """记录一次操作的耗时"""
+        self._average = 0.8 * self._average + 0.2 * seconds
+
+
+def _env(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+# 解析受 GIL 限制，同时解析的文件过多只会让每个请求都变慢
+HEAVY = Lane(
+    "heavy",
+    concurrency=int(_env("QUOTE_HEAVY_CONCURRENCY", min(4, os.cpu_count() or 1))),
+    queue_size=int(_env("QUOTE_HEAVY_QUEUE", 16)),
+    max_wait=_env("QUOTE_QUEUE_WAIT", 10),
+)
+
+LIGHT = Lane(
+    "light",
+    concurrency=int(_env("QUOTE_LIGHT_CONCURRENCY", 16)),
+    queue_size=int(_env("QUOTE_LIGHT_QUEUE", 64)),
+    max_wait=_env("QUOTE_QUEUE_WAIT", 10),
+)
@@ -0,0 +1,218 @@
+"""
+批量维护命令行工具
+
+对数据目录中的所有报价文件（或指定的文件）执行批量操作，文件分配到多个进程并行处理：
+
+    python -m backend validate                 # 验证所有文件，有问题时退出码为1
+    python -m backend recompute                # 重新计算总价，写回总价与 数量×价格 不一致的工作表
+    python -m backend convert --dry-run        # 列出需要转换为标准格式的旧格式文件
+    python -m backend convert                  # 转换为标准格式（表头在第一行、标准列名）
+    python -m backend reindex                  # 重新解析所有文件并重建SQLite镜像
+
+每个进程使用自己的 ExcelService，写操作通过锁文件与正在运行的服务互斥，
+修改前的文件照常备份并保存为历史版本，可以撤回。SQLite镜像只由主进程写入。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+try:
+    from .excel_service import ExcelService
+except ImportError:
+    from excel_service import ExcelService
+
+COMMANDS = {
+    "validate": "验证所有文件（表头、数量和价格、总价）",
+    "recompute": "重新计算总价并写回不一致的工作表",
+    "convert": "将旧格式文件（表头不在第一行、非标准列名、轻量读取器不支持）转换为标准格式",
+    "reindex": "重新解析所有文件并重建SQLite镜像",
+}
+
+# 工作进程中的服务（由 _init_worker 创建）
+_service: Optional[ExcelService] = None
+
+
+def _init_worker(base_dir: str, reader: Optional[str]):
+    global _service
+    _service = ExcelService(base_dir, reader=reader)
+
+
+def _process(command: str, file_name: str, dry_run: bool) -> Dict[str, Any]:
+    """在工作进程中处理一个文件的所有工作表"""
+    service = _service
+    result: Dict[str, Any] = {"file": file_name, "sheets": {}}
+    try:
+        sheets = service.list_sheets(file_name)
+        for index, sheet in enumerate(sheets):
+            if command == "reindex":
+                if index == 0:
+                    # 镜像记录的是第一个工作表解析时的文件版本
+                    result["version"], table = service.read_versioned(file_name)
+                else:
+                    table = service.read_table(file_name, sheet)
+                result["sheets"][sheet] = {"rows": len(table), "total": table.total}
+                result.setdefault("tables", {})[sheet] = table
+                continue
+
+            info = service.inspect_sheet(file_name, sheet)
+            if not info["header"] and index > 0:
+                # 说明、封面等其他工作表不是报价表，不算问题
+                info["issues"], info["issue_count"] = [], 0
+            if command == "recompute" and info["header"] and info["stale_totals"]:
+                info["action"] = f"重新计算 {info['stale_totals']} 行总价"
+            elif command == "convert" and info["header"] and info["legacy"]:
+                info["action"] = f"转换：{info['legacy']}"
+            if info.get("action") and not dry_run:
+                # 重新计算只重写数据行，保留标题、合计等行；转换按标准格式重写整个工作表
+                rewrite = service.recompute_sheet if command == "recompute" else service.rewrite_sheet
+                info["rewritten"] = rewrite(file_name, sheet)
+            result["sheets"][sheet] = info
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _describe(command: str, result: Dict[str, Any]) -> List[str]:
+    """需要报告的内容（每个工作表一行），没有时为空"""
+    if "error" in result:
+        return [f"错误: {result['error']}"]
+    lines = []
+    for sheet, info in result["sheets"].items():
+        if command == "reindex":
+            continue
+        parts = []
+        if command == "validate":
+            if info["issue_count"]:
+                parts.append(f"{info['issue_count']} 个问题，如 {info['issues'][0]}")
+            if info["stale_totals"]:
+                parts.append(f"{info['stale_totals']} 行总价与 数量×价格 不一致")
+            if info["legacy"]:
+                parts.append(f"旧格式：{info['legacy']}")
+        elif info.get("action"):
+            parts.append(info["action"] + ("（已写入）" if "rewritten" in info else "（未写入）"))
+        if parts:
+            lines.append(f"[{sheet}] " + "；".join(parts))
+    return lines
+
+
+def _progress(done: int, total: int, start: float):
+    if not sys.stderr.isatty():
+        return
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write(f"\r进度 {done}/{total}（{rate:.1f} 个/秒）")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def run(command: str, base_dir: str = "data", files: Optional[List[str]] = None,
+        workers: Optional[int] = None, dry_run: bool = False, reader: Optional[str] = None,
+        log=print) -> Dict[str, Any]:
+    """执行批量操作，返回汇总（见 main 的输出）"""
+    service = ExcelService(base_dir, reader=reader)
+    names = files or sorted(service.list_excel_files())
+    missing = [f for f in names if not service.storage.exists(f)]
+    names = [f for f in names if f not in missing]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(names) or 1))
+
+    start = time.perf_counter()
+    results: Dict[str, Dict[str, Any]] = {}
+    mirror_written = mirror_removed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(base_dir, reader)) as pool:
+        futures = [pool.submit(_process, command, f, dry_run) for f in names]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            tables = result.pop("tables", None)
+            if command == "reindex" and "error" not in result:
+                mirror_written += service.mirror.sync_file(result["file"], result.pop("version"), tables)["written"]
+            results[result["file"]] = result
+            for line in _describe(command, result):
+                log(f"{result['file']} {line}")
+            _progress(done, len(names), start)
+
+    if command == "reindex" and files is None:
+        for file_name in set(service.mirror.versions()) - set(names):
+            service.mirror.remove_file(file_name)
+            mirror_removed += 1
+
+    elapsed = time.perf_counter() - start
+    errors = {f: r["error"] for f, r in results.items() if "error" in r}
+    for f in missing:
+        errors[f] = "文件不存在"
+    sheets = [info for r in results.values() for info in r["sheets"].values()]
+    summary: Dict[str, Any] = {
+        "command": command,
+        "files": len(names),
+        "sheets": len(sheets),
+        "rows": sum(info["rows"] for info in sheets),
+        "errors": errors,
+        "workers": workers,
+        "seconds": round(elapsed, 2),
+    }
+    if command == "validate":
+        summary["issues"] = sum(info["issue_count"] for info in sheets)
+        summary["stale_totals"] = sum(info["stale_totals"] for info in sheets)
+        summary["legacy"] = sum(1 for info in sheets if info["legacy"])
+    elif command in ("recompute", "convert"):
+        summary["to_rewrite"] = sum(1 for info in sheets if info.get("action"))
+        summary["rewritten"] = sum(1 for info in sheets if "rewritten" in info)
+    else:
+        summary["mirror"] = {"written": mirror_written, "removed": mirror_removed}
+    summary["results"] = results
+    return summary
+
+
+def _print_summary(summary: Dict[str, Any]):
+    print(f"\n{summary['command']}: {summary['files']} 个文件，{summary['sheets']} 个工作表，"
+          f"{summary['rows']} 行，{summary['workers']} 个进程，耗时 {summary['seconds']} 秒")
+    if summary["command"] == "validate":
+        print(f"  验证问题 {summary['issues']} 个，总价不一致 {summary['stale_totals']} 行，"
+              f"旧格式工作表 {summary['legacy']} 个")
+    elif "to_rewrite" in summary:
+        print(f"  需要重写 {summary['to_rewrite']} 个工作表，已重写 {summary['rewritten']} 个")
+    else:
+        print(f"  SQLite镜像写入 {summary['mirror']['written']} 行，移除 {summary['mirror']['removed']} 个文件")
+    if summary["errors"]:
+        print(f"  失败 {len(summary['errors'])} 个文件:")
+        for file_name, error in sorted(summary["errors"].items()):
+            print(f"    ✗ {file_name}: {error}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend", description="报价文件批量维护")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        sub.add_argument("files", nargs="*", help="文件名（默认为数据目录中的所有文件）")
+        sub.add_argument("--data", default="data", help="数据目录（默认 data）")
+        sub.add_argument("--workers", type=int, help="进程数（默认为CPU核数）")
+        sub.add_argument("--reader", choices=("auto", "lean", "pandas"), help="解析引擎（默认取 QUOTE_READER）")
+        sub.add_argument("--json", action="store_true", help="以JSON输出汇总和每个文件的结果")
+        if name in ("recompute", "convert"):
+            sub.add_argument("--dry-run", action="store_true", help="只报告需要修改的工作表，不写入")
+    args = parser.parse_args(argv)
+
+    # 内存存储只存在于单个进程中，工作进程无法共享
+    if os.environ.get("QUOTE_STORAGE", "local") != "local":
+        parser.error("批量维护只支持本地存储（QUOTE_STORAGE=local）")
+
+    summary = run(args.command, args.data, args.files or None, args.workers,
+                  getattr(args, "dry_run", False), args.reader,
+                  log=(lambda line: None) if args.json else print)
+    if args.json:
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2, default=str)
+        print()
+    else:
+        _print_summary(summary)
+
+    failed = bool(summary["errors"])
+    if args.command == "validate":
+        failed = failed or summary["issues"] > 0 or summary["stale_totals"] > 0
+    return 1 if failed else 0
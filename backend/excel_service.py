@@ -1,196 +1,1400 @@
 import os
-import pandas as pd
-import shutil
-from typing import List, Dict, Any
+import io
+import json
+import hashlib
+import itertools
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Tuple
 from datetime import datetime
-import time
 
 try:
     from .models import ExcelItem
+    from . import metrics, tracing
+    from .xlsx_reader import UnsupportedWorkbook
+    from . import xlsx_reader
+    from .layout import Layout, LayoutCache, RangeTracker, find_header, is_header, normalize_columns
+    from .quote_table import QuoteTable, hash_row
+    from . import rowdiff
+    from .sqlite_mirror import QuoteMirror
+    from . import xlsx_writer
+    from .versioning import VersionHistory, VersionMismatch, version_token
+    from .merge import merge_records
+    from .locks import FileLock
+    from .singleflight import SingleFlight
+    from .storage import STORAGES, Storage, Source, create_storage
+    from .snapshot import Snapshot
 except ImportError:
     from models import ExcelItem
+    import metrics
+    import tracing
+    from xlsx_reader import UnsupportedWorkbook
+    import xlsx_reader
+    from layout import Layout, LayoutCache, RangeTracker, find_header, is_header, normalize_columns
+    from quote_table import QuoteTable, hash_row
+    import rowdiff
+    from sqlite_mirror import QuoteMirror
+    import xlsx_writer
+    from versioning import VersionHistory, VersionMismatch, version_token
+    from merge import merge_records
+    from locks import FileLock
+    from singleflight import SingleFlight
+    from storage import STORAGES, Storage, Source, create_storage
+    from snapshot import Snapshot
+
+# 解析引擎：lean 为轻量读取器，pandas 为 pandas.read_excel，auto 优先使用轻量读取器，不支持时回退到 pandas
+READERS = ("auto", "lean", "pandas")
+
+# 嵌入图片期间文件被其他请求保存时的最多处理次数
+EMBED_RETRIES = 3
+
+
+class SheetNotFound(KeyError):
+    """工作表不存在"""
 
 class ExcelService:
     """Excel文件服务类"""
     
-    def __init__(self, base_dir: str = "data"):
+    def __init__(self, base_dir: str = "data", reader: Optional[str] = None,
+                 storage: Optional[Storage] = None):
         self.base_dir = base_dir
+        # 解析引擎，默认取环境变量 QUOTE_READER
+        self.reader = reader or os.environ.get("QUOTE_READER", "auto")
+        if self.reader not in READERS:
+            raise ValueError(f"不支持的解析引擎: {self.reader}")
         # 确保目录存在
         os.makedirs(base_dir, exist_ok=True)
         # 备份目录
         self.backup_dir = os.path.join(base_dir, "backups")
         os.makedirs(self.backup_dir, exist_ok=True)
-        # 文件操作重试次数
-        self.max_retries = 3
-        self.retry_delay = 0.5
-    
-    def _wait_for_file_unlock(self, file_path: str) -> bool:
-        """等待文件解锁"""
-        for _ in range(self.max_retries):
-            try:
-                # 尝试以只读模式打开文件，检查是否被锁定
-                with open(file_path, 'rb') as f:
-                    pass
-                return True
-            except (PermissionError, IOError):
-                time.sleep(self.retry_delay)
-        return False
+        # 被替换的历史版本（三方合并的基础版本）
+        self.history = VersionHistory(os.path.join(self.backup_dir, "versions"))
+        # 锁文件目录：多个 worker 进程共享数据目录时，写操作通过锁文件互斥
+        self.lock_dir = os.path.join(base_dir, "locks")
+        os.makedirs(self.lock_dir, exist_ok=True)
+        # 工作簿存储：报价文件、撤回备份、写锁和修改代数。
+        # 默认取环境变量 QUOTE_STORAGE（local/memory）和 QUOTE_EXCEL_DIR（报价文件目录，默认为数据目录）
+        if storage is None:
+            kind = os.environ.get("QUOTE_STORAGE", "local")
+            if kind not in STORAGES:
+                raise ValueError(f"不支持的存储类型: {kind}")
+            storage = create_storage(kind, os.environ.get("QUOTE_EXCEL_DIR", base_dir),
+                                     self.backup_dir, self.lock_dir)
+        self.storage = storage
+        # 本进程已知的各文件修改代数，与存储中的不一致时说明其他进程修改过文件
+        self._generations: Dict[str, int] = {}
+        # 缓存目录（图片指纹等辅助数据）
+        self.cache_dir = os.path.join(base_dir, "cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 上传暂存目录
+        self.upload_dir = os.path.join(base_dir, "uploads")
+        os.makedirs(self.upload_dir, exist_ok=True)
+        # 图片处理并行度
+        self.image_workers = min(8, os.cpu_count() or 1)
+        # 解析结果缓存：(文件名, 工作表) -> ((修改时间, 文件大小), QuoteTable)，第一个工作表为None
+        self._cache: Dict[Tuple[str, Optional[str]], Any] = {}
+        # 工作表名称缓存：文件名 -> ((修改时间, 文件大小), 工作表名称列表)
+        self._sheet_names: Dict[str, Any] = {}
+        self._cache_lock = threading.Lock()
+        # 同时读取同一文件同一版本的请求共用一次解析
+        self._parses = SingleFlight()
+        # 布局缓存：表头位置、数据范围和列名
+        self.layouts = LayoutCache(self.cache_dir)
+        # 解析结果快照：停止时保存，重启后首次读取未修改的文件时直接加载
+        self.snapshot = Snapshot(os.path.join(self.cache_dir, "snapshot"),
+                                 os.path.join(self.lock_dir, "snapshot.lock"))
+        # SQLite 镜像，首次使用时创建；创建后文件变化时在后台线程中同步
+        self._mirror: Optional[QuoteMirror] = None
+        self._mirror_lock = threading.Lock()
+        self._mirror_executor: Optional[ThreadPoolExecutor] = None
+        self._mirror_sync_lock = FileLock(os.path.join(self.lock_dir, "mirror.lock"))
+        # 本进程是否已完成过一次全部同步
+        self._mirror_synced = False
     
     def list_excel_files(self) -> List[str]:
         """列出所有Excel文件"""
+        return self.storage.list()
+    
+    def _stat(self, file_name: str) -> Tuple[int, int]:
+        """文件版本 (修改时间, 文件大小)，文件不存在时抛出 FileNotFoundError"""
         try:
-            return [
-                f for f in os.listdir(self.base_dir)
-                if f.endswith(".xlsx") 
-                and f != "temp.xlsx"
-                and not f.startswith("~$")  # 过滤Excel临时文件
-            ]
+            return self.storage.stat(file_name)
         except FileNotFoundError:
-            return []
+            raise FileNotFoundError(f"文件不存在: {file_name}")
+    
+    def list_sheets(self, file_name: str) -> List[str]:
+        """
+        列出工作表名称（按工作簿中的顺序）
+        
+        只读取工作簿元数据（workbook.xml），不解析工作表内容。
+        """
+        key = self._stat(file_name)
+        self._check_generation(file_name)
+        with self._cache_lock:
+            cached = self._sheet_names.get(file_name)
+        if cached is not None and cached[0] == key:
+            return list(cached[1])
+        
+        names = self.snapshot.sheet_names(file_name, key)
+        if names is None:
+            names = self._read_sheet_names(file_name)
+        with self._cache_lock:
+            self._sheet_names[file_name] = (key, names)
+        return list(names)
+    
+    def _read_sheet_names(self, file_name: str) -> List[str]:
+        """读取工作簿元数据中的工作表名称"""
+        try:
+            with xlsx_reader.XlsxReader(self.storage.source(file_name)) as reader:
+                return reader.sheet_names
+        except UnsupportedWorkbook:
+            from openpyxl import load_workbook
+            wb = load_workbook(self.storage.source(file_name), read_only=True)
+            try:
+                return list(wb.sheetnames)
+            finally:
+                wb.close()
     
-    def read_excel(self, file_name: str) -> Dict[str, Any]:
-        """读取Excel文件数据"""
-        path = os.path.join(self.base_dir, file_name)
+    def _resolve_sheet(self, file_name: str, sheet: Optional[str]) -> Optional[str]:
+        """检查工作表是否存在；第一个工作表统一用None表示，与不指定工作表共用缓存"""
+        if sheet is None:
+            return None
+        names = self.list_sheets(file_name)
+        if sheet not in names:
+            raise SheetNotFound(f"工作表不存在: {sheet}")
+        return None if sheet == names[0] else sheet
+    
+    def read_excel(self, file_name: str, sheet: Optional[str] = None) -> Dict[str, Any]:
+        """
+        读取Excel文件数据，返回字典形式的记录（供接口返回）；sheet 默认第一个工作表
         
-        if not os.path.exists(path):
+        version 为读取内容对应的版本令牌，保存时提交以检测并发修改。
+        """
+        version, table = self._read_versioned(file_name, sheet)
+        
+        # 每次生成新的字典，调用方可以随意修改
+        with metrics.stage("materialize"):
+            return {
+                "records": table.to_records(),
+                "total": table.total,
+                "version": version_token(version)
+            }
+    
+    def current_version(self, file_name: str) -> Optional[str]:
+        """文件当前的版本令牌，文件不存在时返回None"""
+        try:
+            return version_token(self.storage.stat(file_name))
+        except FileNotFoundError:
+            return None
+    
+    def list_versions(self, file_name: str) -> Dict[str, Any]:
+        """文件的当前版本、撤回用备份的版本和保存的历史版本（最新的在前）"""
+        current = self.current_version(file_name)
+        if current is None:
             raise FileNotFoundError(f"文件不存在: {file_name}")
+        backup = self.storage.backup_stat(file_name)
+        return {
+            "current": current,
+            "backup": version_token(backup) if backup is not None else None,
+            "history": self.history.versions(file_name)
+        }
+    
+    def diff_versions(self, file_name: str, old: str, new: Optional[str] = None,
+                      sheet: Optional[str] = None) -> Dict[str, Any]:
+        """
+        比较文件的两个版本（行级差异，见 rowdiff）
         
-        df = pd.read_excel(path, dtype=str)
+        old、new 为版本令牌、"backup"（撤回用的备份）或 "current"（当前文件，new 默认）。
+        当前文件使用解析缓存；历史版本优先读取解析结果旁路文件，没有时解析一次并保存旁路文件。
+        版本不存在时抛出 FileNotFoundError。
+        """
+        old_token, old_table = self._version_table(file_name, old, sheet)
+        new_token, new_table = self._version_table(file_name, new, sheet)
+        with metrics.stage("diff"):
+            columns = rowdiff.union_columns(old_table.columns, new_table.columns)
+            old_rows = old_table.rows(columns)
+            new_rows = new_table.rows(columns)
+            changes = rowdiff.diff_rows(columns, old_rows, new_rows, cells=True)
+        return {
+            "from": old_token,
+            "to": new_token,
+            "added": [{"row": i, "record": dict(zip(columns, new_rows[i - 1]))} for i in changes["added"]],
+            "removed": [{"row": i, "record": dict(zip(columns, old_rows[i - 1]))} for i in changes["removed"]],
+            "modified": changes["modified"],
+            "total": {"from": old_table.total, "to": new_table.total,
+                      "change": new_table.total - old_table.total},
+        }
+    
+    def _version_table(self, file_name: str, spec: Optional[str], sheet: Optional[str]) -> Tuple[str, QuoteTable]:
+        """按版本说明（见 diff_versions）读取一个版本，返回 (版本令牌, QuoteTable)"""
+        if spec is None or spec == "current":
+            version, table = self._read_versioned(file_name, sheet)
+            return version_token(version), table
         
-        # 清理列名：去除前后空格
-        df.columns = [col.strip() if pd.notna(col) else col for col in df.columns]
+        if spec == "backup":
+            version = self.storage.backup_stat(file_name)
+            if version is None:
+                raise FileNotFoundError(f"文件没有可撤回的备份: {file_name}")
+            # 备份保留原文件的修改时间，版本令牌与被替换的版本相同
+            token = version_token(version)
+            source = self.storage.backup_source(file_name)
+        else:
+            source = self.history.path(file_name, spec)
+            if source is None:
+                raise FileNotFoundError(f"版本不存在: {spec}")
+            token = spec
         
-        # 过滤掉无效行：序号列包含非数字的行（如"合计"、"单位"等）
-        valid_records = []
+        data = self.history.load_rows(file_name, token, sheet)
+        if data is not None:
+            metrics.CACHE_REQUESTS.inc(cache="version_rows", result="hit")
+            return token, QuoteTable.from_columns(data["columns"], data["total"])
+        metrics.CACHE_REQUESTS.inc(cache="version_rows", result="miss")
+        try:
+            table = self._parse_excel(source, None, sheet)
+        except KeyError:
+            raise SheetNotFound(f"工作表不存在: {sheet}")
+        self.history.save_rows(file_name, token, sheet, {"columns": table.to_columns(), "total": table.total})
+        return token, table
+    
+    def read_table(self, file_name: str, sheet: Optional[str] = None) -> QuoteTable:
+        """
+        读取Excel文件数据（按文件修改时间缓存解析结果，只解析指定的工作表）
+        
+        返回的表在多个调用方之间共享，不应修改。
+        """
+        return self._read_versioned(file_name, sheet)[1]
+    
+    def read_versioned(self, file_name: str, sheet: Optional[str] = None) -> Tuple[Tuple[int, int], QuoteTable]:
+        """读取Excel文件数据，同时返回读取内容对应的文件版本 (修改时间, 文件大小)，见 read_table"""
+        return self._read_versioned(file_name, sheet)
+    
+    def _read_versioned(self, file_name: str, sheet: Optional[str] = None):
+        """读取Excel文件数据，返回 ((修改时间, 文件大小), QuoteTable)"""
+        self._check_generation(file_name)
+        sheet = self._resolve_sheet(file_name, sheet)
+        key = self._stat(file_name)
+        with self._cache_lock:
+            cached = self._cache.get((file_name, sheet))
+        if cached is not None and cached[0] == key:
+            metrics.CACHE_REQUESTS.inc(cache="parse", result="hit")
+            return cached
+        
+        def parse():
+            # 等待进入时可能刚有其他线程解析完成
+            with self._cache_lock:
+                cached = self._cache.get((file_name, sheet))
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            table = self.snapshot.table(file_name, sheet, key)
+            if table is not None:
+                metrics.CACHE_REQUESTS.inc(cache="snapshot", result="hit")
+            else:
+                metrics.CACHE_REQUESTS.inc(cache="parse", result="miss")
+                table = self._parse_excel(self.storage.source(file_name), file_name, sheet, key)
+            with self._cache_lock:
+                self._cache[(file_name, sheet)] = (key, table)
+            return table
+        
+        table, shared = self._parses.do((file_name, sheet, key), parse)
+        if shared:
+            metrics.CACHE_REQUESTS.inc(cache="parse", result="coalesced")
+        return key, table
+    
+    def _invalidate(self, file_name: str):
+        """清除文件（所有工作表）的解析缓存"""
+        with self._cache_lock:
+            for key in [k for k in self._cache if k[0] == file_name]:
+                del self._cache[key]
+            self._sheet_names.pop(file_name, None)
+    
+    def _check_generation(self, file_name: str):
+        """其他进程修改过文件时丢弃本进程的缓存"""
+        generation = self.storage.generation(file_name)
+        if self._generations.get(file_name) != generation:
+            self._invalidate(file_name)
+            self._generations[file_name] = generation
+    
+    def _publish_change(self, file_name: str):
+        """通知其他进程文件已被修改（调用方持有文件锁）"""
+        self._generations[file_name] = self.storage.bump_generation(file_name)
+    
+    def _file_changed(self, file_name: str):
+        """文件被修改后：清除解析缓存，通知其他进程，并在后台同步SQLite镜像"""
+        self._invalidate(file_name)
+        self._publish_change(file_name)
+        self._schedule_mirror_sync(file_name)
+    
+    @property
+    def mirror(self) -> QuoteMirror:
+        """SQLite 镜像（data/cache/quotes.sqlite3）"""
+        with self._mirror_lock:
+            if self._mirror is None:
+                self._mirror = QuoteMirror(os.path.join(self.cache_dir, "quotes.sqlite3"))
+                self._mirror_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mirror")
+            return self._mirror
+    
+    def sync_mirror(self, file_names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        将Excel文件（所有工作表）同步到SQLite镜像
+        
+        只处理版本（修改时间、大小）与镜像不一致的文件，并删除已不存在的文件。
+        file_names 为空时检查所有文件。
+        """
+        mirror = self.mirror
+        synced = written = removed = 0
+        errors = {}
+        with metrics.stage("mirror_sync"), self._mirror_sync_lock:
+            known = mirror.versions()
+            names = self.list_excel_files() if file_names is None else file_names
+            for file_name in names:
+                try:
+                    current = self.storage.stat(file_name)
+                except FileNotFoundError:
+                    if file_name in known:
+                        mirror.remove_file(file_name)
+                        removed += 1
+                    continue
+                if known.get(file_name) == current:
+                    continue
+                try:
+                    version, table = self._read_versioned(file_name)
+                    sheet_names = self.list_sheets(file_name)
+                    sheets = {sheet_names[0]: table}
+                    for sheet in sheet_names[1:]:
+                        sheets[sheet] = self.read_table(file_name, sheet)
+                    written += mirror.sync_file(file_name, version, sheets)["written"]
+                    synced += 1
+                except Exception as e:
+                    errors[file_name] = str(e)
+            if file_names is None:
+                for file_name in set(known) - set(names):
+                    mirror.remove_file(file_name)
+                    removed += 1
+                self._mirror_synced = True
+        return {"synced": synced, "written": written, "removed": removed, "errors": errors}
+    
+    def _schedule_mirror_sync(self, file_name: str):
+        """在后台同步单个文件（镜像尚未创建时不处理，首次查询时会全部同步）"""
+        if self._mirror is None:
+            return
+        
+        def run():
+            try:
+                self.sync_mirror([file_name])
+            except Exception as e:
+                print(f"同步SQLite镜像失败 {file_name}: {e}")
+        
+        self._mirror_executor.submit(run)
+    
+    def query(self, conditions: List[tuple], columns: Optional[List[str]] = None,
+              files: Optional[List[str]] = None, order_by: Optional[str] = None,
+              descending: bool = False, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        """
+        跨文件查询记录（SQLite镜像）
+        
+        不在每次查询时检查所有文件：镜像在保存后同步对应文件，其他程序的修改由定期全部同步发现。
+        本进程还没有全部同步过时先同步一次；指定了文件时先检查这些文件的版本。
+        """
+        if not self._mirror_synced:
+            self.sync_mirror()
+        elif files:
+            self.sync_mirror(files)
+        with metrics.stage("query"):
+            return self.mirror.query(conditions, columns, files, order_by, descending, limit, offset)
+    
+    def _parse_excel(self, source: Source, file_name: Optional[str] = None,
+                     sheet: Optional[str] = None, version: Optional[Tuple[int, int]] = None) -> QuoteTable:
+        """
+        解析Excel文件（路径或二进制流）的一个工作表（默认第一个），过滤无效行并计算总价
+        
+        指定 file_name 和文件版本时使用并更新该工作表的布局缓存（表头位置、数据范围）。
+        """
+        metrics.BYTES_READ.inc(version[1] if version is not None else _source_size(source))
+        with metrics.stage("parse"):
+            if self.reader != "pandas":
+                try:
+                    return self._collect(self._lean_records(source, file_name, sheet, version))
+                except UnsupportedWorkbook as e:
+                    if self.reader == "lean":
+                        raise ValueError(f"无法解析Excel文件: {e}")
+                    name = file_name or (os.path.basename(source) if isinstance(source, str) else "工作簿")
+                    print(f"轻量读取器不支持 {name}（{e}），改用 pandas 解析")
+                    if not isinstance(source, str):
+                        source.seek(0)
+            return self._collect(self._pandas_records(source, file_name, sheet, version))
+    
+    def _collect(self, items: Iterator[Dict[str, Any]]) -> QuoteTable:
+        """将记录逐行写入列式表并计算合计"""
+        table = QuoteTable()
         total = 0.0
+        for item in items:
+            # 只累加由数量和价格计算出的总价
+            if item.get("数量") and item.get("价格"):
+                total += item["总价"]
+            table.append(item)
+        table.total = float(total)
+        return table
+    
+    def _lean_records(self, source: Source, file_name: Optional[str] = None, sheet: Optional[str] = None,
+                      version: Optional[Tuple[int, int]] = None) -> Iterator[Dict[str, Any]]:
+        """使用轻量读取器逐行产出有效记录"""
+        layout_key = self._layout_key(file_name, sheet)
+        version, layout = self._layout(version, layout_key)
+        with xlsx_reader.XlsxReader(source) as reader:
+            yield from self._records_from_rows(reader.iter_rows(sheet), version, layout, layout_key)
+    
+    def _pandas_records(self, source: Source, file_name: Optional[str] = None, sheet: Optional[str] = None,
+                        version: Optional[Tuple[int, int]] = None) -> Iterator[Dict[str, Any]]:
+        """使用 pandas 逐行产出有效记录，兼容轻量读取器不支持的文件"""
+        import pandas as pd
         
-        for _, row in df.iterrows():
-            # 检查是否是有效的数据行
-            if self._is_valid_record(row):
-                item = {}
-                for col in df.columns:
-                    value = row[col]
-                    
-                    # 处理NaN值
-                    if pd.isna(value):
-                        item[col] = None
-                    else:
-                        # 清理值：去除前后空格和换行符，并替换中间的换行符为空格
-                        cleaned_value = str(value).strip().replace('\n', ' ').replace('\r', ' ')
-                        # 尝试转换为适当类型
-                        item[col] = self._convert_value(cleaned_value, col)
-                
-                # 计算总价
-                if item.get("数量") and item.get("价格"):
+        layout_key = self._layout_key(file_name, sheet)
+        version, layout = self._layout(version, layout_key)
+        sheet_name = sheet if sheet is not None else 0
+        with pd.ExcelFile(source) as excel:
+            # 与轻量读取器一致：工作表不存在时抛出 KeyError（pandas 抛出的是 ValueError）
+            if sheet is not None and sheet not in excel.sheet_names:
+                raise KeyError(f"工作表不存在: {sheet}")
+            if layout is not None:
+                # 已知布局时只读取表头到数据末尾
+                df = pd.read_excel(excel, sheet_name=sheet_name, dtype=str, header=None,
+                                   skiprows=layout.skiprows, nrows=layout.nrows + 1)
+                first_row = layout.header_row
+            else:
+                df = pd.read_excel(excel, sheet_name=sheet_name, dtype=str, header=None)
+                first_row = 1
+        rows = (
+            (i, [None if _is_missing(v) else v for v in values])
+            for i, values in enumerate(df.itertuples(index=False, name=None), start=first_row)
+        )
+        yield from self._records_from_rows(rows, version, layout, layout_key)
+    
+    def _layout_key(self, file_name: Optional[str], sheet: Optional[str] = None) -> Optional[str]:
+        """布局缓存的键：第一个工作表为文件名，其他工作表附加名称的哈希（工作表名可能含文件名不允许的字符）"""
+        if file_name is None or sheet is None:
+            return file_name
+        return f"{file_name}@{hashlib.sha1(sheet.encode('utf-8')).hexdigest()[:12]}"
+    
+    def _layout(self, version: Optional[Tuple[int, int]], layout_key: Optional[str]):
+        """返回 (文件版本, 该版本的布局)，未指定布局键或文件版本时均为None"""
+        if layout_key is None or version is None:
+            return None, None
+        layout = self.layouts.get(layout_key, version)
+        metrics.CACHE_REQUESTS.inc(cache="layout", result="hit" if layout is not None else "miss")
+        return version, layout
+    
+    def _records_from_rows(self, rows: Iterator[Tuple[int, List[Optional[str]]]],
+                           version: Optional[Tuple[int, int]] = None, layout: Optional[Layout] = None,
+                           layout_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        将 (行号, 值列表) 转换为有效记录
+        
+        有布局时跳过表头查找，只读取数据范围；数据行连续时不再逐行检查。
+        没有布局但指定了文件版本时查找表头，并在读完后记录该版本的布局。
+        """
+        if layout is not None:
+            columns = layout.columns
+            rows = layout.select(rows)
+            validate = not layout.contiguous
+            tracker = None
+        else:
+            header, rows = find_header(rows)
+            if header is None:
+                return
+            columns = normalize_columns(xlsx_reader.column_names(header[1]))
+            validate = True
+            tracker = RangeTracker()
+        
+        width = len(columns)
+        for row_number, values in rows:
+            if len(values) < width:
+                values = values + [None] * (width - len(values))
+            item = self._build_record(dict(zip(columns, values)), validate)
+            if item is not None:
+                if tracker is not None:
+                    tracker.add(row_number)
+                yield item
+        
+        # 只有完整读完时才记录布局
+        if tracker is not None and version is not None:
+            self.layouts.put(layout_key, tracker.layout(version, header[0], columns))
+    
+    def iter_records(self, file_name: str, sheet: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐行读取Excel文件一个工作表（默认第一个）的数据（流式，内存占用与文件大小无关）
+        
+        过滤和类型转换规则与 read_excel 相同；该工作表已缓存时直接从缓存读取。
+        文件和工作表在调用时检查（不存在时立即抛出 FileNotFoundError、SheetNotFound），
+        记录在迭代时才读取。
+        """
+        self._check_generation(file_name)
+        sheet = self._resolve_sheet(file_name, sheet)
+        key = self._stat(file_name)
+        return self._iter_records(file_name, sheet, key)
+    
+    def _iter_records(self, file_name: str, sheet: Optional[str], key: Tuple[int, int]) -> Iterator[Dict[str, Any]]:
+        with self._cache_lock:
+            cached = self._cache.get((file_name, sheet))
+        if cached is not None and cached[0] == key:
+            metrics.CACHE_REQUESTS.inc(cache="parse", result="hit")
+            yield from cached[1].iter_records()
+            return
+        
+        metrics.CACHE_REQUESTS.inc(cache="parse", result="miss")
+        metrics.BYTES_READ.inc(key[1])
+        count = 0
+        if self.reader != "pandas":
+            layout_key = self._layout_key(file_name, sheet)
+            version, layout = self._layout(key, layout_key)
+            try:
+                with xlsx_reader.XlsxReader(self.storage.source(file_name)) as reader:
+                    for item in self._records_from_rows(reader.iter_rows(sheet), version, layout, layout_key):
+                        yield item
+                        count += 1
+                return
+            except UnsupportedWorkbook as e:
+                # 可能在读到一半时才发现（如工作表 XML 格式错误），此时响应已经开始输出
+                if self.reader == "lean":
+                    raise
+                print(f"轻量读取器不支持 {file_name}（{e}），改用 openpyxl 读取")
+        
+        # 回退：openpyxl 只读模式同样是流式读取；跳过轻量读取器已经输出的记录，接着输出
+        from openpyxl import load_workbook
+        wb = load_workbook(self.storage.source(file_name), read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+            rows = (
+                (i, [str(v) if v is not None else None for v in values])
+                for i, values in enumerate(ws.iter_rows(values_only=True), start=1)
+            )
+            yield from itertools.islice(self._records_from_rows(rows), count, None)
+        finally:
+            wb.close()
+    
+    def _build_record(self, row, validate: bool = True) -> Optional[Dict[str, Any]]:
+        """将一行原始数据转换为记录，无效行返回None；validate为False时跳过有效行检查"""
+        # 检查是否是有效的数据行
+        if validate and not self._is_valid_record(row):
+            return None
+        
+        item = {}
+        for col in row.keys():
+            value = row[col]
+            
+            # 处理NaN值
+            if _is_missing(value):
+                item[col] = None
+            else:
+                # 清理值：去除前后空格和换行符，并替换中间的换行符为空格
+                cleaned_value = str(value).strip().replace('\n', ' ').replace('\r', ' ')
+                # 尝试转换为适当类型
+                item[col] = self._convert_value(cleaned_value, col)
+        
+        # 计算总价
+        if item.get("数量") and item.get("价格"):
+            try:
+                quantity = float(item["数量"]) if item["数量"] else 0
+                price = float(item["价格"]) if item["价格"] else 0
+                item["总价"] = quantity * price
+            except (ValueError, TypeError):
+                item["总价"] = 0
+        
+        return item
+    
+    def _file_lock(self, file_name: str):
+        """文件的写锁（可重入；本地存储时跨进程）：版本检查和写入之间不允许其他写操作"""
+        return self.storage.lock(file_name)
+    
+    def _temp_path(self) -> str:
+        """写入用的临时文件（每次保存唯一，多个进程同时保存不同文件时互不影响）"""
+        return os.path.join(self.upload_dir, f"{uuid.uuid4().hex}.xlsx")
+    
+    def save_versioned(self, file_name: str, records: List[Dict[str, Any]], sheet: Optional[str] = None,
+                       base_version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        带版本检查的保存
+        
+        - base_version 为None时直接覆盖；为"*"时要求文件已存在
+        - 与当前版本一致时直接保存
+        - 不一致时以该历史版本为基础，与当前文件内容按行三方合并后保存；
+          有冲突时抛出 MergeConflict，找不到历史版本时抛出 VersionMismatch
+        
+        返回 {"version": 保存后的版本令牌, "merged": 是否进行了合并,
+              "unchanged": 内容与当前文件相同（未写入）, "changes": 变化的行（见 _compare）}。
+        """
+        with self._file_lock(file_name):
+            current = self.current_version(file_name)
+            merged = False
+            if base_version == "*":
+                if current is None:
+                    raise VersionMismatch(f"文件不存在: {file_name}")
+            elif base_version is not None and base_version != current:
+                base_path = self.history.path(file_name, base_version)
+                if current is None or base_path is None:
+                    raise VersionMismatch(f"版本 {base_version} 已过期，请重新读取")
+                with metrics.stage("merge"):
                     try:
-                        quantity = float(item["数量"]) if item["数量"] else 0
-                        price = float(item["价格"]) if item["价格"] else 0
-                        item["总价"] = quantity * price
-                        total += item["总价"]
-                    except (ValueError, TypeError):
-                        item["总价"] = 0
-                
-                valid_records.append(item)
+                        base = self._parse_excel(base_path, None, sheet).to_records()
+                    except KeyError:
+                        raise VersionMismatch(f"版本 {base_version} 中没有工作表 {sheet}")
+                    theirs = self.read_table(file_name, sheet).to_records()
+                    # 只比较客户端提交的列，没有提交的列（如日期）不产生冲突
+                    columns = {k for r in records for k in r} or None
+                    records = merge_records(base, records, theirs, columns)
+                merged = True
+            
+            changes = self._save_excel(file_name, records, sheet)
+            return {
+                "version": self.current_version(file_name),
+                "merged": merged,
+                "unchanged": changes.pop("unchanged"),
+                "changes": changes
+            }
+    
+    def save_excel(self, file_name: str, records: List[Dict[str, Any]], sheet: Optional[str] = None) -> bool:
+        """
+        保存数据到Excel文件
         
-        return {
-            "records": valid_records,
-            "total": float(total)
-        }
+        sheet 默认第一个工作表。工作簿有多个工作表时只改写该工作表，其他工作表原样保留。
+        内容与文件当前内容相同时不写入文件，也不备份。
+        """
+        with self._file_lock(file_name):
+            self._save_excel(file_name, records, sheet)
+            return True
     
-    def save_excel(self, file_name: str, records: List[Dict[str, Any]]) -> bool:
-        """保存数据到Excel文件"""
-        path = os.path.join(self.base_dir, file_name)
-        temp_path = os.path.join(self.base_dir, "temp.xlsx")
-        # 备份放到备份目录，保留原始文件名并添加 .bak 后缀
-        backup_path = os.path.join(self.backup_dir, f"{file_name}.bak")
+    def _save_excel(self, file_name: str, records: List[Dict[str, Any]], sheet: Optional[str],
+                    force: bool = False) -> Dict[str, Any]:
+        """保存并返回与保存前内容的比较结果（见 _compare）；force 为True时内容相同也重新生成文件"""
+        sheet, multi_sheet = self._save_target(file_name, sheet)
         
         # 验证数据
-        self._validate_records(records)
+        with metrics.stage("validate"):
+            self._validate_records(records)
         
-        # 添加序号
-        records_with_index = self._add_index(records)
+        # 与当前内容相同时直接返回，不重新生成文件
+        with metrics.stage("compare"):
+            changes = self._compare(file_name, sheet, records)
+        if changes["unchanged"] and not force:
+            metrics.SAVES.inc(result="unchanged")
+            return changes
         
-        # 转换为DataFrame
-        df = pd.DataFrame(records_with_index)
+        temp_path = self._temp_path()
+        try:
+            with metrics.stage("serialize"):
+                # 添加序号
+                records_with_index = self._add_index(records)
+                
+                if multi_sheet:
+                    columns = self._record_columns(records_with_index)
+                    self._write_sheet(file_name, temp_path, sheet,
+                                      columns, self._sheet_rows(columns, records_with_index))
+                else:
+                    import pandas as pd
+                    
+                    # 转换为DataFrame
+                    df = pd.DataFrame(records_with_index)
+                    
+                    # 计算总价
+                    if "数量" in df.columns and "价格" in df.columns:
+                        df["总价"] = df["数量"] * df["价格"]
+                    
+                    # 写入临时文件
+                    df.to_excel(temp_path, index=False)
+                    columns = [str(c) for c in df.columns]
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         
-        # 计算总价
-        if "数量" in df.columns and "价格" in df.columns:
-            df["总价"] = df["数量"] * df["价格"]
+        self._commit_save(file_name, temp_path, sheet, multi_sheet, columns, len(records_with_index))
+        metrics.SAVES.inc(result="written")
+        return changes
+    
+    def _compare(self, file_name: str, sheet: Optional[str], records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        将要保存的记录与文件当前内容比较
+        
+        记录先转换为保存后再读取时的值（见 _normalize_record），再与缓存的行哈希比较。
+        返回 {"unchanged": 是否完全相同, "added": 新增的行号, "removed": 删除的行号（保存前）,
+        "modified": 修改的行号}。
+        """
+        new = [self._normalize_record(i, r) for i, r in enumerate(records, start=1)]
+        if not self.storage.exists(file_name):
+            return {"unchanged": False, "added": list(range(1, len(new) + 1)), "removed": [], "modified": []}
+        
+        table = self.read_table(file_name, sheet)
+        columns = rowdiff.union_columns(table.columns, self._record_columns(new))
+        new_rows = rowdiff.align(columns, new)
+        if len(new_rows) == len(table) and table.row_hashes(columns) == [hash_row(r) for r in new_rows]:
+            return {"unchanged": True, "added": [], "removed": [], "modified": []}
+        return {"unchanged": False, **rowdiff.diff_rows(columns, table.rows(columns), new_rows)}
+    
+    def _normalize_record(self, index: int, record: Dict[str, Any]) -> Dict[str, Any]:
+        """记录保存后再读取得到的值：序号重新编号，总价重新计算，值按列类型转换"""
+        result: Dict[str, Any] = {"序号": index}
+        for column, value in record.items():
+            if column != "序号":
+                result[column] = self._convert_value(value, column)
+        if "数量" in result and "价格" in result:
+            quantity, price = result["数量"], result["价格"]
+            result["总价"] = quantity * price if quantity is not None and price is not None else None
+        return result
+    
+    def save_stream(self, file_name: str, lines: Iterable[Any], sheet: Optional[str] = None,
+                    base_version: Optional[str] = None) -> int:
+        """
+        流式保存：lines 为 NDJSON 行（每行一个 ExcelItem 对象）
+        
+        逐行解析、验证并写入临时工作簿，内存占用与行数无关；任何一行验证失败时不修改原文件。
+        base_version 与当前版本不一致时抛出 VersionMismatch（流式保存不进行合并）。
+        返回写入的行数。
+        """
+        with self._file_lock(file_name):
+            current = self.current_version(file_name)
+            if base_version is not None and (current is None or base_version not in ("*", current)):
+                raise VersionMismatch(f"文件已被修改，当前版本 {current}")
+            return self._save_stream(file_name, lines, sheet)
+    
+    def _save_stream(self, file_name: str, lines: Iterable[Any], sheet: Optional[str]) -> int:
+        temp_path = self._temp_path()
+        sheet, multi_sheet = self._save_target(file_name, sheet)
+        columns = self._record_columns([dict.fromkeys(ExcelItem.model_fields)])
+        
+        def records():
+            index = 0
+            for line_number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = ExcelItem.model_validate_json(line).model_dump()
+                except ValueError as e:
+                    raise ValueError(f"第{line_number}行格式错误: {e}")
+                index += 1
+                self._validate_record(index, record)
+                record["序号"] = index
+                yield record
+        
+        try:
+            with metrics.stage("serialize"):
+                rows = self._sheet_rows(columns, records())
+                if multi_sheet:
+                    count = self._write_sheet(file_name, temp_path, sheet, columns, rows)
+                else:
+                    count = xlsx_writer.write_workbook(temp_path, self._first_sheet_name(file_name), columns, rows)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        self._commit_save(file_name, temp_path, sheet, multi_sheet, columns, count)
+        return count
+    
+    def _save_target(self, file_name: str, sheet: Optional[str]) -> Tuple[Optional[str], bool]:
+        """保存前检查目标工作表，返回 (工作表，None为第一个, 是否为多工作表文件)"""
+        if self.storage.exists(file_name):
+            multi_sheet = len(self.list_sheets(file_name)) > 1
+            return self._resolve_sheet(file_name, sheet), multi_sheet
+        if sheet is not None:
+            raise FileNotFoundError(f"文件不存在: {file_name}")
+        return None, False
+    
+    def _first_sheet_name(self, file_name: str) -> str:
+        """第一个工作表的名称，新文件与 pandas 一致使用 Sheet1"""
+        if self.storage.exists(file_name):
+            return self.list_sheets(file_name)[0]
+        return "Sheet1"
+    
+    def _commit_save(self, file_name: str, temp_path: str, sheet: Optional[str], multi_sheet: bool,
+                     columns: List[str], count: int, layout: Optional[Layout] = None):
+        """用写好的临时文件替换原文件，并更新缓存、布局（默认为表头在第一行的标准格式）和镜像"""
+        # 其他工作表的内容不变，保存后沿用它们的解析缓存
+        if multi_sheet:
+            old_version = self._stat(file_name)
+            with self._cache_lock:
+                carried = {
+                    k[1]: v[1] for k, v in self._cache.items()
+                    if k[0] == file_name and k[1] != sheet and v[0] == old_version
+                }
         
         # 备份原文件
-        if os.path.exists(path):
-            if not self._wait_for_file_unlock(path):
-                raise RuntimeError(f"文件 {file_name} 被占用，无法访问")
+        self._backup_file(file_name)
+        
+        # 替换原文件
+        self._replace_file(temp_path, file_name)
+        self._invalidate(file_name)
+        self._publish_change(file_name)
+        
+        # 写出的工作表布局已知：默认表头在第一行，其后每行都是数据行
+        version = self._stat(file_name)
+        if layout is None:
+            layout = Layout(version, 1, normalize_columns(columns), 2, count + 1, True)
+        else:
+            layout = Layout(version, layout.header_row, layout.columns, layout.data_start,
+                            layout.data_end, layout.contiguous)
+        self.layouts.put(self._layout_key(file_name, sheet), layout)
+        if multi_sheet:
+            self._carry_over(file_name, sheet, old_version, version, carried)
+        self._schedule_mirror_sync(file_name)
+    
+    def _record_columns(self, records: Iterable[Dict[str, Any]]) -> List[str]:
+        """写入的列：按首次出现的顺序合并各记录的列，有数量和价格时追加总价（与 DataFrame 一致）"""
+        columns: List[str] = []
+        for r in records:
+            for key in r:
+                if key not in columns:
+                    columns.append(key)
+        if "数量" in columns and "价格" in columns and "总价" not in columns:
+            columns.append("总价")
+        return columns
+    
+    def _sheet_rows(self, columns: List[str], records: Iterable[Dict[str, Any]]) -> Iterator[List[Any]]:
+        """按列顺序逐行生成单元格值，总价 = 数量 * 价格"""
+        compute_total = "数量" in columns and "价格" in columns
+        total_index = columns.index("总价") if compute_total else -1
+        for r in records:
+            values = [r.get(c) for c in columns]
+            if compute_total:
+                quantity, price = r.get("数量"), r.get("价格")
+                values[total_index] = (
+                    quantity * price if quantity is not None and price is not None else None
+                )
+            yield values
+    
+    def _write_sheet(self, file_name: str, dst: str, sheet: Optional[str],
+                     columns: List[str], rows: Iterable[List[Any]], first_row: int = 1,
+                     last_row: Optional[int] = None, header: bool = True) -> int:
+        """
+        将工作簿复制到 dst，只替换工作表 sheet（None为第一个）的数据
+        
+        默认替换整个工作表；指定 first_row、last_row 时只替换这一段行，见 xlsx_writer.replace_sheet。
+        返回写入的数据行数。
+        """
+        sheet_name = sheet if sheet is not None else self.list_sheets(file_name)[0]
+        try:
+            return xlsx_writer.replace_sheet(self.storage.source(file_name), dst, sheet_name, columns, rows,
+                                             first_row, last_row, header)
+        except UnsupportedWorkbook:
+            # 回退：openpyxl 加载整个工作簿，只重写目标工作表中的这一段行
+            from openpyxl import load_workbook
+            wb = load_workbook(self.storage.source(file_name))
+            ws = wb[sheet_name]
+            if last_row is None:
+                ws.delete_rows(first_row, ws.max_row)
+                if header:
+                    ws.append(columns)
+                count = 0
+                for values in rows:
+                    ws.append(values)
+                    count += 1
+            else:
+                lines = ([list(columns)] if header else []) + [list(values) for values in rows]
+                count = len(lines) - (1 if header else 0)
+                ws.delete_rows(first_row, last_row - first_row + 1)
+                ws.insert_rows(first_row, len(lines))
+                for offset, values in enumerate(lines):
+                    for column, value in enumerate(values, start=1):
+                        ws.cell(first_row + offset, column, value)
+            wb.save(dst)
+            return count
+    
+    def _carry_over(self, file_name: str, sheet: Optional[str], old_version: Tuple[int, int],
+                    new_version: Tuple[int, int], cached: Dict[Optional[str], QuoteTable]):
+        """保存一个工作表后，其他工作表沿用旧版本的解析缓存和布局"""
+        names = self.list_sheets(file_name)
+        for name in names:
+            other = None if name == names[0] else name
+            if other == sheet:
+                continue
+            layout_key = self._layout_key(file_name, other)
+            layout = self.layouts.get(layout_key, old_version)
+            if layout is not None:
+                self.layouts.put(layout_key, Layout(
+                    new_version, layout.header_row, layout.columns,
+                    layout.data_start, layout.data_end, layout.contiguous,
+                ))
+            if other in cached:
+                with self._cache_lock:
+                    self._cache[(file_name, other)] = (new_version, cached[other])
+    
+    def _archive(self, file_name: str):
+        """将文件的当前版本保存为历史版本（文件不存在时不处理）"""
+        try:
+            version = self.storage.stat(file_name)
+        except FileNotFoundError:
+            return
+        self.history.archive(self.storage.source(file_name), file_name, version)
+    
+    def _backup_file(self, file_name: str):
+        """备份原文件（撤回用），并保存为历史版本"""
+        self._archive(file_name)
+        with metrics.stage("backup"):
+            self.storage.backup(file_name)
+    
+    def _replace_file(self, temp_path: str, file_name: str):
+        """用临时文件替换原文件"""
+        metrics.BYTES_WRITTEN.inc(os.path.getsize(temp_path))
+        self.storage.replace(file_name, temp_path)
+    
+    def undo(self, file_name: str) -> bool:
+        """撤回上次保存"""
+        with self._file_lock(file_name):
+            if self.storage.backup_stat(file_name) is not None:
+                try:
+                    # 被撤回的内容保留为历史版本
+                    self._archive(file_name)
+                    self.storage.restore(file_name)
+                    self._file_changed(file_name)
+                    return True
+                except Exception as e:
+                    print(f"撤回文件失败: {e}")
+                    return False
+            return False
+    
+    def embed_images(self, file_name: str, column: str = "项目图片", size: int = 80,
+                     progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+        """
+        将图片列中的图片路径嵌入到Excel中
+
+        图片并行解码并缩小后一次性写入；按指纹跳过未变化的图片，
+        没有任何变化时不重写文件。处理期间文件被其他请求保存时按新内容重新处理，
+        重试 EMBED_RETRIES 次后仍被修改则抛出 VersionMismatch。
+        """
+        for _ in range(EMBED_RETRIES):
+            result = self._embed_images(file_name, column, size, progress)
+            if result is not None:
+                return result
+        raise VersionMismatch(f"文件 {file_name} 在嵌入图片期间被修改，请稍后重试")
+
+    def _embed_images(self, file_name: str, column: str, size: int,
+                      progress: Optional[Callable[[float, str], None]]) -> Optional[Dict[str, Any]]:
+        """嵌入一次图片；加载后文件被修改（写入前版本不一致）时不写入并返回None"""
+        from openpyxl import load_workbook
+        from openpyxl.drawing.image import Image as XLImage
+
+        # 图片处理耗时较长，不持有写锁；写入前在锁内检查版本，避免覆盖期间保存的内容
+        version = self._stat(file_name)
+        wb = load_workbook(self.storage.source(file_name))
+        ws = wb.active
+
+        # 在表头中查找图片列
+        col_idx = None
+        for cell in ws[1]:
+            if isinstance(cell.value, str) and cell.value.strip() == column:
+                col_idx = cell.column
+                break
+        if col_idx is None:
+            raise ValueError(f"找不到图片列: {column}")
+
+        # 已嵌入的图片：按锚点单元格分组
+        anchored = {}
+        for img in ws._images:
+            marker = getattr(img.anchor, "_from", None)
+            if marker is not None:
+                anchored.setdefault((marker.row + 1, marker.col + 1), []).append(img)
+
+        sidecar_path = os.path.join(self.cache_dir, f"{file_name}.images.json")
+        fingerprints = self._load_json(sidecar_path)
+
+        # 收集需要处理的行
+        tasks = []
+        for row in range(2, ws.max_row + 1):
+            value = ws.cell(row=row, column=col_idx).value
+            image_path = self._resolve_image_path(value)
+            if image_path:
+                coord = ws.cell(row=row, column=col_idx).coordinate
+                known = fingerprints.get(coord) if (row, col_idx) in anchored else None
+                tasks.append((row, coord, image_path, known))
+
+        # 并行计算指纹、解码并缩小图片
+        results = []
+        with ThreadPoolExecutor(max_workers=self.image_workers) as pool:
+            for i, result in enumerate(pool.map(lambda t: _prepare_image(t[2], size, t[3]), tasks), start=1):
+                results.append(result)
+                if progress:
+                    progress(0.9 * i / len(tasks), f"已处理图片 {i}/{len(tasks)}")
+
+        new_fingerprints = {}
+        embedded = skipped = 0
+        for (row, coord, _, _), (fingerprint, data, width, height) in zip(tasks, results):
+            new_fingerprints[coord] = fingerprint
+            if data is None:
+                skipped += 1
+                continue
+            # 替换该单元格上的旧图片
+            for old in anchored.pop((row, col_idx), []):
+                ws._images.remove(old)
+            img = XLImage(io.BytesIO(data))
+            img.width = width
+            img.height = height
+            ws.add_image(img, coord)
+            # 行高不足时调整（单位：磅）
+            height_pt = height * 0.75
+            if (ws.row_dimensions[row].height or 0) < height_pt:
+                ws.row_dimensions[row].height = height_pt
+            embedded += 1
+
+        # 路径已被清除的行：移除之前嵌入的图片
+        removed = 0
+        for coord in fingerprints:
+            if coord in new_fingerprints:
+                continue
+            cell = ws[coord]
+            for old in anchored.pop((cell.row, cell.column), []):
+                ws._images.remove(old)
+                removed += 1
+
+        if embedded or removed:
+            if progress:
+                progress(0.9, "正在写入文件")
+            with self._file_lock(file_name):
+                if self._stat(file_name) != version:
+                    return None
+                self._backup_file(file_name)
+                temp_path = self._temp_path()
+                wb.save(temp_path)
+                self._replace_file(temp_path, file_name)
+                self._file_changed(file_name)
+
+        if new_fingerprints != fingerprints:
+            with open(sidecar_path, "w", encoding="utf-8") as f:
+                json.dump(new_fingerprints, f, ensure_ascii=False)
+
+        return {
+            "file_name": file_name,
+            "embedded": embedded,
+            "skipped": skipped,
+            "removed": removed
+        }
+
+    def _resolve_image_path(self, value: Any) -> Optional[str]:
+        """解析图片路径：相对路径优先在数据目录下查找"""
+        if not isinstance(value, str) or not value.strip():
+            return None
+        value = value.strip()
+        for candidate in (os.path.join(self.base_dir, value), value):
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def _load_json(self, path: str) -> Dict[str, Any]:
+        """读取JSON辅助文件，不存在或损坏时返回空字典"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def new_upload_path(self) -> str:
+        """生成上传暂存文件路径"""
+        return os.path.join(self.upload_dir, f"{uuid.uuid4().hex}.part")
+    
+    def import_excel(self, temp_path: str, file_name: str, overwrite: bool = False,
+                     progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+        """
+        导入上传的Excel文件
+        
+        解析并验证暂存文件，通过后写入存储并写入解析缓存。
+        行级问题作为警告返回，不阻止导入。
+        """
+        try:
+            if not zipfile.is_zipfile(temp_path):
+                raise ValueError("上传的文件不是有效的.xlsx文件")
+            
+            if progress:
+                progress(0.1, "正在解析文件")
+            table = self._parse_excel(temp_path)
+            if progress:
+                progress(0.7, "正在验证数据")
+            if not len(table) and not self._has_known_columns(temp_path):
+                raise ValueError("上传的文件缺少报价表列（序号/内容）")
+            
+            warnings = []
+            for i, r in enumerate(table, start=1):
+                try:
+                    self._validate_record(i, r)
+                except ValueError as e:
+                    warnings.append(str(e))
+            
+            with self._file_lock(file_name):
+                if self.storage.exists(file_name):
+                    if not overwrite:
+                        raise FileExistsError(f"文件已存在: {file_name}")
+                    self._backup_file(file_name)
+                self._replace_file(temp_path, file_name)
+                self._invalidate(file_name)
+                self._publish_change(file_name)
+                # 在锁内写入缓存（之后的保存会使其失效），导入后的首次读取无需再次解析
+                version = self._stat(file_name)
+                with self._cache_lock:
+                    self._cache[(file_name, None)] = (version, table)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        self._schedule_mirror_sync(file_name)
+        
+        return {
+            "file_name": file_name,
+            "records": len(table),
+            "total": table.total,
+            "warnings": warnings[:50],
+            "warning_count": len(warnings)
+        }
+    
+    def reindex(self, progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+        """重新解析所有Excel文件并刷新缓存和SQLite镜像"""
+        files = self.list_excel_files()
+        indexed = 0
+        errors = {}
+        for i, file_name in enumerate(files, start=1):
+            if progress:
+                progress((i - 1) / max(len(files), 1), f"正在解析 {file_name}")
+            self._invalidate(file_name)
             try:
-                shutil.copy2(path, backup_path)
+                self.read_table(file_name)
+                indexed += 1
             except Exception as e:
-                print(f"备份文件失败: {e}")
+                errors[file_name] = str(e)
+        if progress:
+            progress(0.95, "正在同步SQLite镜像")
+        mirror = self.sync_mirror()
+        return {"files": len(files), "indexed": indexed, "errors": errors, "mirror": mirror}
+    
+    def aggregate(self, progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+        """跨文件汇总：每个文件的合计、按经办人汇总及总计"""
+        files = self.list_excel_files()
+        by_file = {}
+        by_handler: Dict[str, float] = {}
+        errors = {}
+        for i, file_name in enumerate(files, start=1):
+            if progress:
+                progress((i - 1) / max(len(files), 1), f"正在汇总 {file_name}")
+            try:
+                table = self.read_table(file_name)
+            except Exception as e:
+                errors[file_name] = str(e)
+                continue
+            by_file[file_name] = {"records": len(table), "total": table.total}
+            # 按列汇总，无需生成每行的字典
+            for handler, amount in zip(table.column("经办人"), table.column("总价")):
+                handler = handler or "未指定"
+                by_handler[handler] = by_handler.get(handler, 0.0) + (amount or 0.0)
+        return {
+            "files": by_file,
+            "by_handler": by_handler,
+            "total": sum(f["total"] for f in by_file.values()),
+            "errors": errors
+        }
+    
+    def inspect_sheet(self, file_name: str, sheet: Optional[str] = None) -> Dict[str, Any]:
+        """
+        检查工作表（批量维护用）：逐行读取原始值，不使用也不更新解析缓存和布局缓存
         
-        # 写入临时文件
-        df.to_excel(temp_path, index=False)
+        返回 {"rows": 有效行数, "header": 是否找到表头, "issues": 验证问题（前50条）, "issue_count": 问题数,
+              "stale_totals": 文件中的总价与 数量×价格 不一致的行数,
+              "legacy": 需要转换为标准格式的原因（标准格式时为None）}。
+        标准格式即保存后的格式：表头在第一行，列名为标准列名。
+        """
+        legacy = []
+        try:
+            reader = xlsx_reader.XlsxReader(self.storage.source(file_name))
+        except UnsupportedWorkbook as e:
+            import pandas as pd
+            
+            legacy.append(f"轻量读取器不支持（{e}）")
+            df = pd.read_excel(self.storage.source(file_name), sheet_name=sheet if sheet is not None else 0,
+                               dtype=str, header=None)
+            reader = None
+            rows = (
+                (i, [None if _is_missing(v) else v for v in values])
+                for i, values in enumerate(df.itertuples(index=False, name=None), start=1)
+            )
+        else:
+            rows = reader.iter_rows(sheet)
         
-        # 替换原文件（先删除原文件，再重命名临时文件）
+        count = stale = 0
+        issues = []
         try:
-            if os.path.exists(path):
-                if not self._wait_for_file_unlock(path):
-                    raise RuntimeError(f"文件 {file_name} 被占用，无法访问")
-                os.remove(path)
-            os.rename(temp_path, path)
-        except Exception as e:
-            # 如果替换失败，尝试使用shutil.move
+            header, rows = find_header(rows)
+            if header is None or not is_header(header[1]):
+                return {"rows": 0, "header": False, "issues": ["未找到表头（序号/内容）"], "issue_count": 1,
+                        "stale_totals": 0, "legacy": None}
+            raw_columns = [name.strip() for name in xlsx_reader.column_names(header[1])]
+            columns = normalize_columns(raw_columns)
+            if header[0] != 1:
+                legacy.append(f"表头在第{header[0]}行")
+            renamed = [f"{a}→{b}" for a, b in zip(raw_columns, columns) if a != b]
+            if renamed:
+                legacy.append(f"列名不是标准名称（{'、'.join(renamed)}）")
+            
+            width = len(columns)
+            for _, values in rows:
+                if len(values) < width:
+                    values = values + [None] * (width - len(values))
+                row = dict(zip(columns, values))
+                if not self._is_valid_record(row):
+                    continue
+                item = self._build_record(row, validate=False)
+                count += 1
+                try:
+                    self._validate_record(count, item)
+                except ValueError as e:
+                    issues.append(str(e))
+                # 只有数量和价格都有值时总价才由二者计算
+                if "总价" in row and item.get("数量") and item.get("价格"):
+                    stored = self._convert_value(row["总价"], "总价")
+                    if stored is None or abs(stored - item["总价"]) > 1e-6 * max(1.0, abs(item["总价"])):
+                        stale += 1
+        finally:
+            if reader is not None:
+                reader.close()
+        return {"rows": count, "header": True, "issues": issues[:50], "issue_count": len(issues),
+                "stale_totals": stale, "legacy": "；".join(legacy) or None}
+    
+    def rewrite_sheet(self, file_name: str, sheet: Optional[str] = None) -> Dict[str, Any]:
+        """
+        按标准格式重写工作表：表头在第一行、标准列名、总价重新计算
+        
+        内容与解析结果相同也会重写。原文件照常备份并保存为历史版本，可以撤回。
+        """
+        with self._file_lock(file_name):
+            records = self.read_table(file_name, sheet).to_records()
+            changes = self._save_excel(file_name, records, sheet, force=True)
+            changes.pop("unchanged")
+            return {"version": self.current_version(file_name), "records": len(records), "changes": changes}
+    
+    def recompute_sheet(self, file_name: str, sheet: Optional[str] = None) -> Dict[str, Any]:
+        """
+        重新计算工作表的总价（批量维护用）：只重写数据行
+        
+        表头、表头之前的标题行和数据之后的合计等行保持不变，列名和列的顺序不变。
+        原文件照常备份并保存为历史版本，可以撤回。
+        """
+        with self._file_lock(file_name):
+            resolved = self._resolve_sheet(file_name, sheet)
+            version, table = self._read_versioned(file_name, resolved)
+            layout_key = self._layout_key(file_name, resolved)
+            layout = self.layouts.get(layout_key, version)
+            if layout is None:
+                # 解析结果来自快照等时没有记录布局，重新解析一次
+                self._parse_excel(self.storage.source(file_name), file_name, resolved, version)
+                layout = self.layouts.get(layout_key, version)
+            if layout is None:
+                raise ValueError(f"无法确定工作表的数据范围: {file_name}")
+            
+            records = table.to_records()
+            temp_path = self._temp_path()
             try:
-                if os.path.exists(path):
-                    if not self._wait_for_file_unlock(path):
-                        raise RuntimeError(f"文件 {file_name} 被占用，无法访问")
-                    os.remove(path)
-                shutil.move(temp_path, path)
-            except Exception as e2:
-                print(f"替换文件失败: {e2}")
+                with metrics.stage("serialize"):
+                    count = self._write_sheet(file_name, temp_path, sheet, layout.columns,
+                                              self._sheet_rows(layout.columns, records),
+                                              layout.data_start, layout.data_end, header=False)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
                 raise
-        
-        return True
+            
+            multi_sheet = len(self.list_sheets(file_name)) > 1
+            self._commit_save(file_name, temp_path, resolved, multi_sheet, layout.columns, count, Layout(
+                version, layout.header_row, layout.columns, layout.data_start,
+                layout.data_start + count - 1, True,
+            ))
+            return {"version": self.current_version(file_name), "records": count}
     
-    def undo(self, file_name: str) -> bool:
-        """撤回上次保存"""
-        path = os.path.join(self.base_dir, file_name)
-        backup_path = os.path.join(self.backup_dir, f"{file_name}.bak")
-
-        if os.path.exists(backup_path):
+    def warm_up(self, limit: int = 5) -> List[str]:
+        """
+        预热：导入解析依赖，预先解析最近修改的文件并载入快照
+        
+        在服务启动后于后台线程中调用，使首次读取无需等待导入和解析。
+        """
+        import pandas  # noqa: F401
+        import openpyxl  # noqa: F401
+        
+        files = []
+        for file_name in self.list_excel_files():
             try:
-                # 先删除原文件
-                if os.path.exists(path):
-                    os.remove(path)
-                # 移动备份文件
-                shutil.move(backup_path, path)
-                return True
+                files.append((self.storage.stat(file_name)[0], file_name))
+            except OSError:
+                continue
+        files.sort(reverse=True)
+        
+        warmed = []
+        for _, file_name in files[:limit]:
+            try:
+                self.read_table(file_name)
+                warmed.append(file_name)
             except Exception as e:
-                print(f"撤回文件失败: {e}")
-                return False
-        return False
+                print(f"预热文件失败 {file_name}: {e}")
+        
+        # 快照中的其余工作表也一并载入：只读取快照，比解析快得多；文件已修改的跳过
+        for file_name, sheet, version in self.snapshot.pending():
+            try:
+                if self.storage.stat(file_name) == version:
+                    self.read_table(file_name, sheet)
+            except Exception as e:
+                print(f"载入快照失败 {file_name}: {e}")
+        return warmed
+    
+    def restore_snapshot(self) -> int:
+        """
+        载入上次停止时保存的快照索引，返回其中的解析结果数
+        
+        解析结果在首次读取对应文件时才加载，且只在文件版本未变化时使用。
+        """
+        return self.snapshot.restore()
+    
+    def save_snapshot(self) -> Dict[str, int]:
+        """将解析缓存和工作表名称保存为快照（服务停止时调用），只写入仍是当前版本的条目"""
+        with self._cache_lock:
+            tables = [(f, sheet, version, table) for (f, sheet), (version, table) in self._cache.items()]
+            sheets = dict(self._sheet_names)
+        
+        def current(file_name: str):
+            try:
+                return self.storage.stat(file_name)
+            except FileNotFoundError:
+                return None
+        
+        with metrics.stage("snapshot"):
+            return self.snapshot.save(tables, sheets, current)
+    
+    def _has_known_columns(self, path: str) -> bool:
+        """检查表头是否包含序号或内容列"""
+        import pandas as pd
+        
+        df = pd.read_excel(path, dtype=str, nrows=0)
+        columns = {str(col).strip() for col in df.columns}
+        return "序号" in columns or "内容" in columns
     
     def _validate_records(self, records: List[Dict[str, Any]]):
         """验证数据记录"""
         for i, r in enumerate(records, start=1):
-            # 内容可以为空，但如果有内容，则数量和价格应该有效
-            if r.get("内容"):
-                # 如果有内容，检查数量和价格
-                quantity = r.get("数量")
-                price = r.get("价格")
-                
-                if quantity is None or quantity <= 0:
-                    raise ValueError(f"第{i}行: 数量必须大于0")
-                if price is None or price < 0:
-                    raise ValueError(f"第{i}行: 价格不能为负")
+            self._validate_record(i, r)
+    
+    def _validate_record(self, i: int, r: Dict[str, Any]):
+        """验证单条数据记录，i为行号"""
+        # 内容可以为空，但如果有内容，则数量和价格应该有效
+        if r.get("内容"):
+            # 如果有内容，检查数量和价格
+            quantity = r.get("数量")
+            price = r.get("价格")
             
-            # 如果没有内容，但提供了数量或价格，也进行验证
-            else:
-                quantity = r.get("数量")
-                price = r.get("价格")
-                
-                if quantity is not None and quantity < 0:
-                    raise ValueError(f"第{i}行: 数量不能为负")
-                if price is not None and price < 0:
-                    raise ValueError(f"第{i}行: 价格不能为负")
+            if quantity is None or quantity <= 0:
+                raise ValueError(f"第{i}行: 数量必须大于0")
+            if price is None or price < 0:
+                raise ValueError(f"第{i}行: 价格不能为负")
+        
+        # 如果没有内容，但提供了数量或价格，也进行验证
+        else:
+            quantity = r.get("数量")
+            price = r.get("价格")
+            
+            if quantity is not None and quantity < 0:
+                raise ValueError(f"第{i}行: 数量不能为负")
+            if price is not None and price < 0:
+                raise ValueError(f"第{i}行: 价格不能为负")
     
     def _add_index(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """添加序号"""
@@ -200,26 +1404,21 @@ class ExcelService:
     
     def get_file_info(self, file_name: str) -> Dict[str, Any]:
         """获取文件信息"""
-        path = os.path.join(self.base_dir, file_name)
-        
-        if not os.path.exists(path):
-            raise FileNotFoundError(f"文件不存在: {file_name}")
-        
-        stat = os.stat(path)
+        mtime_ns, size = self._stat(file_name)
         return {
             "name": file_name,
-            "path": path,
-            "size": stat.st_size,
-            "modified": datetime.fromtimestamp(stat.st_mtime)
+            "path": self.storage.location(file_name),
+            "size": size,
+            "modified": datetime.fromtimestamp(mtime_ns / 1e9)
         }
     
     def _is_valid_record(self, row) -> bool:
         """检查是否是有效的数据行"""
         try:
             # 检查序号列：如果存在且可以转换为整数，则是有效行
-            if "序号" in row.index:
+            if "序号" in row:
                 seq_value = row["序号"]
-                if pd.isna(seq_value) or seq_value is None:
+                if _is_missing(seq_value):
                     return False
                 
                 # 清理序号值
@@ -236,9 +1435,9 @@ class ExcelService:
                     return False
             
             # 如果没有序号列，检查是否有内容
-            if "内容" in row.index:
+            if "内容" in row:
                 content = row["内容"]
-                if pd.isna(content) or content is None:
+                if _is_missing(content):
                     return False
                 content_str = str(content).strip()
                 if content_str == "":
@@ -281,5 +1480,55 @@ class ExcelService:
             return str_value
 
 
+def _source_size(source: Source) -> int:
+    """读取源（路径或二进制流）的字节数"""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    position = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def _is_missing(value: Any) -> bool:
+    """判断单元格值是否为空（None、NaN 或 pandas 的 NA）"""
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return value != value
+    return type(value).__name__ in ("NAType", "NaTType")
+
+
+def _prepare_image(image_path: str, size: int, known_fingerprint: Optional[str] = None):
+    """
+    计算图片指纹并生成缩略图
+
+    返回 (指纹, 图片数据, 显示宽度, 显示高度)；指纹未变化时图片数据为None
+    """
+    from PIL import Image as PILImage
+
+    with open(image_path, "rb") as f:
+        raw = f.read()
+    fingerprint = hashlib.sha1(raw + str(size).encode()).hexdigest()
+    if fingerprint == known_fingerprint:
+        return fingerprint, None, 0, 0
+
+    with PILImage.open(io.BytesIO(raw)) as im:
+        im.load()
+        # 按2倍显示尺寸缩小，兼顾高分屏清晰度和文件体积
+        im.thumbnail((size * 2, size * 2))
+        has_alpha = im.mode in ("RGBA", "LA", "P")
+        out = io.BytesIO()
+        if has_alpha:
+            im.save(out, format="PNG", optimize=True)
+        else:
+            im.convert("RGB").save(out, format="JPEG", quality=85)
+        # 等比缩放到显示尺寸
+        scale = size / max(im.width, im.height)
+        width = max(1, round(im.width * scale))
+        height = max(1, round(im.height * scale))
+    return fingerprint, out.getvalue(), width, height
+
+
 # 创建全局服务实例
 excel_service = ExcelService()
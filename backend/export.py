@@ -0,0 +1,51 @@
+"""
+数据导出
+
+将记录流序列化为 CSV / TSV / JSON Lines 字节块，供 StreamingResponse 使用。
+逐行处理，输出按块缓冲，内存占用与数据量无关。
+"""
+
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+
+# 格式 -> (媒体类型, 扩展名)
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "tsv": ("text/tab-separated-values; charset=utf-8", "tsv"),
+    "jsonl": ("application/x-ndjson; charset=utf-8", "jsonl"),
+}
+
+# 输出缓冲块大小
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_export(records: Iterable[Dict[str, Any]], fmt: str, columns: List[str]) -> Iterator[bytes]:
+    """按指定格式和列序列化记录"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+    buffer = io.StringIO()
+    if fmt == "jsonl":
+        def write(record):
+            buffer.write(json.dumps({c: record.get(c) for c in columns}, ensure_ascii=False))
+            buffer.write("\n")
+    else:
+        # CSV带BOM，Excel打开时中文不乱码
+        buffer.write("\ufeff")
+        writer = csv.writer(buffer, delimiter="," if fmt == "csv" else "\t", lineterminator="\n")
+        writer.writerow(columns)
+
+        def write(record):
+            writer.writerow(["" if record.get(c) is None else record.get(c) for c in columns])
+
+    for record in records:
+        write(record)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,84 @@
+"""
+行过滤条件
+
+条件格式为 `列名 运算符 值`，例如 `数量>=10`、`材料~PVC`、`经办人=张三`。
+支持的运算符：= != > >= < <= ~（包含）。
+只允许报价表中的已知列，数值列按数值比较，其他列按字符串比较。
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# 报价表列（与 ExcelItem 字段一致）
+COLUMNS = ["序号", "内容", "材料", "规格尺寸", "数量", "价格", "总价", "项目图片", "经办人", "备注"]
+NUMERIC_COLUMNS = {"序号", "数量", "价格", "总价"}
+
+OPERATORS = [">=", "<=", "!=", "=", ">", "<", "~"]
+
+Condition = Tuple[str, str, Any]
+
+
+def parse_condition(expr: str) -> Condition:
+    """解析单个过滤条件，格式错误时抛出 ValueError"""
+    # 以第一个运算符字符为界，列名中不能包含运算符
+    idx = next((i for i, ch in enumerate(expr) if ch in "=!<>~"), -1)
+    op = expr[idx:idx + 2] if expr[idx:idx + 2] in OPERATORS else expr[idx:idx + 1]
+    if idx <= 0 or op not in OPERATORS:
+        raise ValueError(f"过滤条件格式错误: {expr}")
+    
+    column = expr[:idx].strip()
+    value = expr[idx + len(op):].strip()
+    if column not in COLUMNS:
+        raise ValueError(f"不支持的列: {column}")
+    if column in NUMERIC_COLUMNS and op != "~":
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"列 {column} 的值必须是数字: {value}")
+    elif op in (">", ">=", "<", "<="):
+        raise ValueError(f"列 {column} 不支持运算符 {op}")
+    return column, op, value
+
+
+def parse_conditions(exprs: Optional[List[str]]) -> List[Condition]:
+    """解析多个过滤条件（逻辑与）"""
+    return [parse_condition(e) for e in exprs or []]
+
+
+def parse_columns(spec: Optional[str]) -> List[str]:
+    """解析逗号分隔的列投影，为空时返回全部列"""
+    if not spec:
+        return list(COLUMNS)
+    columns = [c.strip() for c in spec.split(",") if c.strip()]
+    for column in columns:
+        if column not in COLUMNS:
+            raise ValueError(f"不支持的列: {column}")
+    return columns
+
+
+def matches(record: Dict[str, Any], conditions: List[Condition]) -> bool:
+    """检查记录是否满足全部条件"""
+    for column, op, expected in conditions:
+        actual = record.get(column)
+        if op == "~":
+            if actual is None or str(expected) not in str(actual):
+                return False
+            continue
+        if actual is None:
+            if op != "!=":
+                return False
+            continue
+        if column not in NUMERIC_COLUMNS:
+            actual = str(actual)
+        if op == "=" and not actual == expected:
+            return False
+        if op == "!=" and not actual != expected:
+            return False
+        if op == ">" and not actual > expected:
+            return False
+        if op == ">=" and not actual >= expected:
+            return False
+        if op == "<" and not actual < expected:
+            return False
+        if op == "<=" and not actual <= expected:
+            return False
+    return True
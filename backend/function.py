@@ -1,8 +1,6 @@
 import os
 import pandas as pd
 import shutil
-from openpyxl import load_workbook
-from openpyxl.drawing.image import Image as XLImage
 
 def list_excel_files():
     return [
@@ -45,20 +43,6 @@ def undo(file_name):
         return True
     return False
 
-def insert_images(file_name):
-    path = f"data/excel_files/{file_name}"
-    wb = load_workbook(path)
-    ws = wb.active
-    for row in range(2, ws.max_row + 1):
-        image_path = ws[f"J{row}"].value  # 假设图片路径
-
-        if image_path and os.path.exists(image_path):
-            img = XLImage(image_path)
-            img.width = 80
-            img.height = 80
-            ws.add_image(img, f"J{row}")
-    wb.save(path)
-
 def validate(records):
     for r in records:
         if not r["内容"]:
@@ -0,0 +1,291 @@
+"""
+后台任务管理
+
+耗时操作（导入、重建索引、图片嵌入、跨文件汇总）提交到有界线程池执行，
+接口立即返回任务ID，客户端通过 /jobs/{job_id} 查询状态、进度和结果。
+
+任务函数通过关键字参数 progress 接收进度回调 progress(比例, 消息)；
+任务被取消后，下一次调用回调会抛出 JobCancelled，从而协作式地结束任务。
+
+多个 worker 进程共享 job_dir：任务状态在每次状态变化（排队、开始、结束）时写入 {任务ID}.json，
+运行中的进度至多每 PERSIST_INTERVAL 秒写入一次，其他进程查询时从该文件读取。
+其他进程取消任务时写入 {任务ID}.cancel，执行任务的进程在下次报告进度时发现并结束任务。
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# 运行中任务的进度写入 job_dir 的最小间隔（秒）
+PERSIST_INTERVAL = 1.0
+
+# 已结束的任务状态
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class JobQueueFull(RuntimeError):
+    """任务队列已满"""
+
+
+class Job:
+    """后台任务"""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        # pending / running / succeeded / failed / cancelled
+        self.status = "pending"
+        self.progress = 0.0
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = datetime.now()
+        self.started: Optional[datetime] = None
+        self.finished: Optional[datetime] = None
+        self.cancel_requested = False
+        self.future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        """任务是否已结束"""
+        return self.status in FINISHED
+
+    def report(self, progress: float, message: str = ""):
+        """进度回调，任务被取消时抛出 JobCancelled"""
+        if self.cancel_requested:
+            raise JobCancelled()
+        self.progress = max(0.0, min(1.0, float(progress)))
+        if message:
+            self.message = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished
+        }
+
+
+class JobManager:
+    """
+    后台任务管理器
+
+    - max_workers: 同时执行的任务数
+    - max_pending: 排队中任务数上限，超过时拒绝提交
+    - job_dir: 任务状态和结果的持久化目录（多个进程共享）
+    - max_history: 内存中和持久化目录中各保留的已结束任务数
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32,
+                 job_dir: str = os.path.join("data", "jobs"), max_history: int = 200):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self.job_dir = job_dir
+        os.makedirs(job_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        """提交后台任务，fn 需接受 progress 关键字参数"""
+        job = Job(kind)
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j.status == "pending")
+            if pending >= self.max_pending:
+                raise JobQueueFull("后台任务队列已满，请稍后重试")
+            self._jobs[job.id] = job
+            self._prune()
+        self._save(job)
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务信息（内存中没有时从持久化目录读取，如其他进程中的任务）"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self._load(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """列出内存中的任务，最新的在前"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        jobs.sort(key=lambda j: j.created, reverse=True)
+        return [j.to_dict() for j in jobs]
+
+    def cancel(self, job_id: str) -> bool:
+        """取消任务：排队中的直接取消，运行中的在下次报告进度时结束"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            # 其他进程中的任务：由该进程在下次报告进度时取消
+            saved = self._load(job_id)
+            if saved is None or saved["status"] in FINISHED:
+                return False
+            try:
+                open(self._path(job_id, ".cancel"), "w").close()
+            except OSError as e:
+                print(f"取消任务失败 [{job_id}]: {e}")
+                return False
+            return True
+        if job.done:
+            return False
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            self._finish(job, "cancelled")
+        return True
+
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs):
+        """在工作线程中执行任务"""
+        if job.cancel_requested or os.path.exists(self._path(job.id, ".cancel")):
+            self._finish(job, "cancelled")
+            return
+        job.status = "running"
+        job.started = datetime.now()
+        self._save(job)
+        try:
+            job.result = fn(*args, progress=self._reporter(job), **kwargs)
+            job.progress = 1.0
+            self._finish(job, "succeeded")
+        except JobCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = str(e)
+            print(f"后台任务失败 [{job.kind} {job.id}]: {e}")
+            self._finish(job, "failed")
+
+    def _reporter(self, job: Job) -> Callable[..., None]:
+        """任务的进度回调：定期持久化进度，并检查其他进程的取消请求"""
+        last = time.monotonic()
+
+        def report(progress: float, message: str = ""):
+            nonlocal last
+            now = time.monotonic()
+            persist = now - last >= PERSIST_INTERVAL
+            if persist:
+                last = now
+                if os.path.exists(self._path(job.id, ".cancel")):
+                    job.cancel_requested = True
+            job.report(progress, message)
+            if persist:
+                self._save(job)
+
+        return report
+
+    def _finish(self, job: Job, status: str):
+        """结束任务并持久化结果"""
+        job.status = status
+        job.finished = datetime.now()
+        self._save(job)
+        try:
+            os.remove(self._path(job.id, ".cancel"))
+        except OSError:
+            pass
+        self._prune_files()
+
+    def _path(self, job_id: str, suffix: str = ".json") -> str:
+        return os.path.join(self.job_dir, f"{job_id}{suffix}")
+
+    def _save(self, job: Job):
+        """持久化任务状态（先写临时文件再替换，其他进程不会读到写了一半的文件）"""
+        data = job.to_dict()
+        try:
+            text = json.dumps(data, ensure_ascii=False, default=_json_default)
+        except TypeError as e:
+            # 结果无法序列化时仍然保存状态，其他进程才能知道任务已结束
+            print(f"任务结果无法保存 [{job.id}]: {e}")
+            data["result"] = None
+            text = json.dumps(data, ensure_ascii=False, default=_json_default)
+        path = self._path(job.id)
+        temp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temp, path)
+        except OSError as e:
+            print(f"保存任务状态失败 [{job.id}]: {e}")
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """从持久化目录读取任务状态"""
+        # 任务ID为十六进制字符串，防止路径遍历
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _prune(self):
+        """内存中只保留最近的已结束任务（调用方持有锁）"""
+        finished = [j for j in self._jobs.values() if j.done]
+        if len(self._jobs) <= self.max_history or not finished:
+            return
+        finished.sort(key=lambda j: j.finished or j.created)
+        for job in finished[:len(self._jobs) - self.max_history]:
+            del self._jobs[job.id]
+
+    def _prune_files(self):
+        """持久化目录中只保留最近的 max_history 个任务（按修改时间，未结束的任务不删除）"""
+        try:
+            entries = [e for e in os.scandir(self.job_dir) if e.name.endswith(".json")]
+            if len(entries) <= self.max_history:
+                return
+            entries.sort(key=lambda e: e.stat().st_mtime)
+        except OSError:
+            return
+        for entry in entries[:len(entries) - self.max_history]:
+            job_id = entry.name[:-len(".json")]
+            saved = self._load(job_id)
+            if saved is None or saved.get("status") not in FINISHED:
+                continue
+            for suffix in (".json", ".cancel"):
+                try:
+                    os.remove(self._path(job_id, suffix))
+                except OSError:
+                    pass
+
+    def shutdown(self):
+        """停止任务管理器：排队中的任务直接取消，运行中的任务在下次报告进度时结束"""
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if not j.done]
+        for job in jobs:
+            job.cancel_requested = True
+            # 排队中的任务不会再执行，记为已取消，其他进程才不会一直看到排队中
+            if job.future is not None and job.future.cancel():
+                self._finish(job, "cancelled")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _json_default(value: Any) -> Any:
+    """JSON序列化：日期时间转为ISO格式"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化: {type(value).__name__}")
+
+
+# 创建全局任务管理器
+job_manager = JobManager()
@@ -0,0 +1,204 @@
+"""
+工作表布局识别
+
+实际的结算清单格式不统一：表头上方可能有标题行，数据下方有"合计"、"单位"、说明等页脚行，
+列名也有不同写法（如"单价"、"名称"）。布局识别找出表头所在行、数据行范围并统一列名，
+结果按文件版本（修改时间、大小）缓存并写入 cache/{文件名}.layout.json，
+之后读取同一版本时直接跳到数据范围，数据行连续时不再逐行判断是否为有效行。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .filters import COLUMNS
+except ImportError:
+    from filters import COLUMNS
+
+# 列名别名 -> 标准列名
+ALIASES = {
+    "编号": "序号",
+    "名称": "内容",
+    "项目": "内容",
+    "项目名称": "内容",
+    "图片": "项目图片",
+    "材质": "材料",
+    "规格": "规格尺寸",
+    "尺寸": "规格尺寸",
+    "数目": "数量",
+    "单价": "价格",
+    "金额": "总价",
+    "小计": "总价",
+    "负责人": "经办人",
+    "说明": "备注",
+}
+
+# 在前多少行中查找表头
+HEADER_SCAN_ROWS = 20
+
+Row = Tuple[int, List[Optional[str]]]
+
+
+def normalize_columns(names: Iterable[str]) -> List[str]:
+    """去除列名前后空格并映射别名；映射后与已有列重名时保留原列名"""
+    result = []
+    seen = set()
+    for name in names:
+        name = name.strip()
+        canonical = ALIASES.get(name, name)
+        if canonical in seen:
+            canonical = name
+        seen.add(canonical)
+        result.append(canonical)
+    return result
+
+
+def is_header(values: List[Optional[str]]) -> bool:
+    """是否像表头：包含序号或内容列，且至少有两个已知列"""
+    names = {ALIASES.get(v.strip(), v.strip()) for v in values if isinstance(v, str)}
+    known = names.intersection(COLUMNS)
+    return ("序号" in known or "内容" in known) and len(known) >= 2
+
+
+def find_header(rows: Iterator[Row], scan: int = HEADER_SCAN_ROWS) -> Tuple[Optional[Row], Iterator[Row]]:
+    """
+    在前 scan 行中查找表头，返回 (表头行, 其后各行的迭代器)
+
+    找不到时以第一行为表头（与 pandas 默认行为一致）；工作表为空时表头行为None。
+    """
+    scanned = []
+    for row in rows:
+        if is_header(row[1]):
+            return row, rows
+        scanned.append(row)
+        if len(scanned) >= scan:
+            break
+    if not scanned:
+        return None, iter(())
+    return scanned[0], chain(scanned[1:], rows)
+
+
+class Layout:
+    """一个文件版本的布局"""
+
+    def __init__(self, version: Tuple[int, int], header_row: int, columns: List[str],
+                 data_start: int, data_end: int, contiguous: bool):
+        # 文件版本：(修改时间纳秒, 文件大小)
+        self.version = tuple(version)
+        # 表头所在行（从1开始）
+        self.header_row = header_row
+        # 标准化后的列名
+        self.columns = columns
+        # 第一个和最后一个有效数据行；没有数据时 data_end < data_start
+        self.data_start = data_start
+        self.data_end = data_end
+        # 数据范围内每一行都是有效数据行
+        self.contiguous = contiguous
+
+    @property
+    def fingerprint(self) -> str:
+        """表结构指纹：表头位置和列名相同的文件指纹相同"""
+        text = json.dumps([self.header_row, self.columns], ensure_ascii=False)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def skiprows(self) -> int:
+        """表头之前的行数"""
+        return self.header_row - 1
+
+    @property
+    def nrows(self) -> int:
+        """表头之后需要读取的行数"""
+        return max(0, self.data_end - self.header_row)
+
+    def select(self, rows: Iterator[Row]) -> Iterator[Row]:
+        """只保留数据范围内的行，读到范围末尾即停止"""
+        for row in rows:
+            if row[0] < self.data_start:
+                continue
+            if row[0] > self.data_end:
+                return
+            yield row
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": list(self.version),
+            "header_row": self.header_row,
+            "columns": self.columns,
+            "data_start": self.data_start,
+            "data_end": self.data_end,
+            "contiguous": self.contiguous,
+            "fingerprint": self.fingerprint,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Layout":
+        return cls(
+            data["version"], data["header_row"], data["columns"],
+            data["data_start"], data["data_end"], data["contiguous"],
+        )
+
+
+class RangeTracker:
+    """解析过程中记录有效数据行的范围，解析结束后生成布局"""
+
+    def __init__(self):
+        self.first: Optional[int] = None
+        self.last: Optional[int] = None
+        self.count = 0
+
+    def add(self, row_number: int):
+        if self.first is None:
+            self.first = row_number
+        self.last = row_number
+        self.count += 1
+
+    def layout(self, version: Tuple[int, int], header_row: int, columns: List[str]) -> Layout:
+        if self.first is None:
+            return Layout(version, header_row, columns, header_row + 1, header_row, True)
+        contiguous = self.count == self.last - self.first + 1
+        return Layout(version, header_row, columns, self.first, self.last, contiguous)
+
+
+class LayoutCache:
+    """布局缓存：内存中保存最近的布局，同时写入缓存目录，服务重启后仍可使用"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._layouts: Dict[str, Layout] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.cache_dir, f"{file_name}.layout.json")
+
+    def get(self, file_name: str, version: Tuple[int, int]) -> Optional[Layout]:
+        """获取指定文件版本的布局，版本不一致时返回None"""
+        with self._lock:
+            layout = self._layouts.get(file_name)
+        # 内存中的版本不一致时重新读取缓存文件（可能已由其他进程更新）
+        if layout is None or layout.version != tuple(version):
+            try:
+                with open(self._path(file_name), "r", encoding="utf-8") as f:
+                    layout = Layout.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+            with self._lock:
+                self._layouts[file_name] = layout
+        return layout if layout.version == tuple(version) else None
+
+    def put(self, file_name: str, layout: Layout):
+        with self._lock:
+            self._layouts[file_name] = layout
+        # 先写临时文件再替换，其他进程不会读到写了一半的文件
+        path = self._path(file_name)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(layout.to_dict(), f, ensure_ascii=False)
+            os.replace(temp, path)
+        except OSError as e:
+            print(f"保存布局缓存失败 {file_name}: {e}")
@@ -0,0 +1,130 @@
+"""
+跨进程文件锁与修改代数
+
+多个 worker 进程（uvicorn --workers N）共享数据目录时，保存、撤回、导入等写操作需要跨进程互斥：
+锁文件位于 data/locks/，POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking。
+
+每个文件另有一个修改代数文件（{文件名}.gen）：写操作完成后在持有锁时加一（原子替换），
+各进程读取前比较代数，发现其他进程修改过文件时丢弃自己的缓存。
+文件的修改时间精度不足（如部分网络文件系统）时，代数仍能区分前后两次写入。
+
+最外层 acquire 的等待时间（进程内和跨进程）记入 quote_file_lock_wait_seconds。
+"""
+
+import os
+import threading
+import time
+import uuid
+
+try:
+    from . import metrics, tracing
+except ImportError:
+    import metrics
+    import tracing
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            # LK_LOCK 最多等待约10秒，超时后继续等待
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """
+    可重入的跨进程锁
+
+    同一进程内的线程之间用 RLock 互斥，只有最外层的 acquire 才锁定锁文件。
+    同一进程中同一个锁文件只应对应一个 FileLock 对象。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        start = time.perf_counter()
+        with tracing.span("lock_wait"):
+            self._rlock.acquire()
+            if self._depth == 0:
+                try:
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        _lock(fd)
+                    except BaseException:
+                        os.close(fd)
+                        raise
+                except BaseException:
+                    self._rlock.release()
+                    raise
+                self._fd = fd
+                metrics.LOCK_WAIT_SECONDS.observe(time.perf_counter() - start)
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                _unlock(fd)
+            finally:
+                os.close(fd)
+        self._rlock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def read_generation(path: str) -> int:
+    """读取修改代数，文件不存在时为0"""
+    try:
+        with open(path, "rb") as f:
+            return int(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_generation(path: str) -> int:
+    """修改代数加一并返回新值（调用方需持有对应文件的锁）"""
+    generation = read_generation(path) + 1
+    temp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp, "wb") as f:
+        f.write(str(generation).encode("ascii"))
+    for attempt in range(50):
+        try:
+            os.replace(temp, path)
+            break
+        except PermissionError:
+            # Windows 上其他进程正在读取时不能替换，稍后重试
+            if attempt == 49:
+                os.remove(temp)
+                raise
+            time.sleep(0.01)
+    return generation
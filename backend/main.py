@@ -1,21 +1,77 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from typing import Iterator, List, Optional
+from urllib.parse import quote
+import asyncio
+import hmac
 import os
+import threading
+import time
 
 try:
     # 当作为模块导入时使用相对导入
-    from .models import ExcelData, ExcelFile, SaveRequest, UndoResponse
-    from .excel_service import excel_service
+    from .models import ExcelData, ExcelFile, SaveRequest, UndoResponse, JobInfo, QueryResult
+    from .excel_service import excel_service, SheetNotFound
+    from .versioning import VersionMismatch, parse_etag, format_etag
+    from .merge import MergeConflict
+    from .jobs import job_manager, JobQueueFull
+    from .filters import parse_columns, parse_conditions, matches
+    from .export import FORMATS, iter_export
+    from . import metrics, tracing, profiling
+    from .admission import HEAVY, LIGHT, Lane, Overloaded
 except ImportError:
     # 当直接运行时使用绝对导入
-    from models import ExcelData, ExcelFile, SaveRequest, UndoResponse
-    from excel_service import excel_service
+    from models import ExcelData, ExcelFile, SaveRequest, UndoResponse, JobInfo, QueryResult
+    from excel_service import excel_service, SheetNotFound
+    from versioning import VersionMismatch, parse_etag, format_etag
+    from merge import MergeConflict
+    from jobs import job_manager, JobQueueFull
+    from filters import parse_columns, parse_conditions, matches
+    from export import FORMATS, iter_export
+    import metrics
+    import tracing
+    import profiling
+    from admission import HEAVY, LIGHT, Lane, Overloaded
+
+# 上传文件分块大小和大小上限
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_SIZE = 200 * 1024 * 1024
+
+# 调试接口令牌，未设置时 /debug/profile 不可用
+DEBUG_TOKEN = os.environ.get("QUOTE_DEBUG_TOKEN")
+
+# 启动后预先解析的最近修改文件数，0 表示不预热
+WARMUP_FILES = int(os.environ.get("QUOTE_WARMUP_FILES", "5"))
+
+# 停止时保存解析结果快照、启动时载入，设为0关闭
+SNAPSHOT = os.environ.get("QUOTE_SNAPSHOT", "1") != "0"
+
+# 定期全部同步SQLite镜像的间隔（秒），发现其他程序对文件的修改；0 表示只在启动时同步
+MIRROR_SYNC_INTERVAL = float(os.environ.get("QUOTE_MIRROR_SYNC_INTERVAL", "60"))
+
+# /query 单次返回的最大行数
+MAX_QUERY_LIMIT = 10000
+
+# 直接运行时的 worker 进程数（多个进程共享数据目录，写操作通过锁文件互斥）
+WORKERS = int(os.environ.get("QUOTE_WORKERS", "1"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """服务启动和停止时的处理（见 startup、shutdown）"""
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
 
 app = FastAPI(
     title="报价桌面系统API",
     description="轻量级桌面报价管理系统后端API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -25,8 +81,94 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 客户端需要读取版本令牌
+    expose_headers=["ETag"],
 )
 
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """记录每个接口的请求耗时、并发数和阶段追踪（Server-Timing头）"""
+    metrics.REQUESTS_IN_FLIGHT.inc()
+    trace, token = tracing.start_trace(f"{request.method} {request.url.path}")
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        total = trace.elapsed()
+        response.headers["Server-Timing"] = trace.server_timing(total)
+        return response
+    finally:
+        total = trace.elapsed()
+        tracing.end_trace(token)
+        tracing.log_if_slow(trace, total, status)
+        profiling.request_finished()
+        metrics.REQUESTS_IN_FLIGHT.dec()
+        # 使用路由模板作为标签，避免文件名导致标签数量无限增长
+        route = request.scope.get("route")
+        metrics.REQUEST_SECONDS.observe(
+            total,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status)
+        )
+
+def _check_file_name(file_name: str):
+    """安全检查：防止路径遍历，且只允许.xlsx文件"""
+    if ".." in file_name or "/" in file_name or "\\" in file_name:
+        raise HTTPException(status_code=400, detail="文件名不合法")
+    
+    if not file_name.endswith(".xlsx"):
+        raise HTTPException(status_code=400, detail="文件必须是.xlsx格式")
+
+def _submit_job(kind: str, fn, *args, **kwargs) -> dict:
+    """提交后台任务，队列已满时返回503"""
+    try:
+        job = job_manager.submit(kind, fn, *args, **kwargs)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {"success": True, "job_id": job.id, "kind": kind}
+
+async def _acquire(lane: Lane):
+    """获取准入通道的名额，通道饱和时返回503"""
+    try:
+        await lane.acquire()
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@asynccontextmanager
+async def _admit(lane: Lane):
+    """
+    在准入通道的名额内执行代码块
+    
+    代码块中的阻塞操作需通过 run_in_threadpool 执行，避免阻塞事件循环（/health 等接口）。
+    """
+    await _acquire(lane)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        lane.observe(time.perf_counter() - start)
+        lane.release()
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """
+    持有准入名额的流式响应：内容在线程池中逐块生成
+    
+    名额在响应发送结束、出错或客户端断开后于事件循环中释放（通道只能在事件循环线程中使用）。
+    """
+    
+    def __init__(self, lane: Lane, chunks: Iterator[bytes], **kwargs):
+        super().__init__(chunks, **kwargs)
+        self._lane = lane
+        self._start = time.perf_counter()
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._lane.observe(time.perf_counter() - self._start)
+            self._lane.release()
+
 @app.get("/")
 async def root():
     """根路径，返回API信息"""
@@ -35,9 +177,26 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "GET /files": "获取所有Excel文件列表",
-            "GET /read/{file}": "读取指定Excel文件数据",
-            "POST /save/{file}": "保存数据到指定Excel文件",
-            "POST /undo/{file}": "撤回上次保存操作"
+            "GET /sheets/{file}": "列出指定Excel文件的工作表",
+            "GET /read/{file}": "读取指定Excel文件数据（第一个工作表）",
+            "GET /read/{file}/{sheet}": "读取指定工作表数据",
+            "POST /save/{file}": "保存数据到指定Excel文件（第一个工作表）",
+            "POST /save/{file}/{sheet}": "保存数据到指定工作表，其他工作表保持不变",
+            "POST /save-stream/{file}": "流式保存（NDJSON请求体），内存占用与记录数无关",
+            "GET /versions/{file}": "列出文件的当前版本、备份和历史版本",
+            "GET /diff/{file}?from=&to=": "比较文件的两个版本（行级差异和总价变化）",
+            "POST /undo/{file}": "撤回上次保存操作",
+            "POST /images/{file}": "将图片列中的图片嵌入Excel文件",
+            "POST /upload": "上传Excel文件，后台解析导入",
+            "GET /export/{file}": "流式导出指定Excel文件（csv/tsv/jsonl）",
+            "GET /export": "流式导出所有Excel文件",
+            "GET /query": "跨文件查询记录（SQLite镜像）",
+            "POST /reindex": "后台重新解析所有Excel文件",
+            "POST /aggregate": "后台汇总所有Excel文件",
+            "GET /metrics": "Prometheus格式的运行指标",
+            "GET /jobs": "列出后台任务",
+            "GET /jobs/{id}": "查询后台任务状态和进度",
+            "POST /jobs/{id}/cancel": "取消后台任务"
         }
     }
 
@@ -54,66 +213,253 @@ async def get_files():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取文件列表失败: {str(e)}")
 
-@app.get("/read/{file_name}", response_model=ExcelData)
-async def read_file(file_name: str):
+@app.get("/sheets/{file_name}", response_model=List[str])
+async def get_sheets(file_name: str):
     """
-    读取指定Excel文件数据
+    列出指定Excel文件的工作表（只读取工作簿元数据，不解析工作表内容）
     
     - **file_name**: Excel文件名（需包含.xlsx扩展名）
     """
-    # 安全检查：防止路径遍历
-    if ".." in file_name or "/" in file_name or "\\" in file_name:
-        raise HTTPException(status_code=400, detail="文件名不合法")
+    _check_file_name(file_name)
     
-    if not file_name.endswith(".xlsx"):
-        raise HTTPException(status_code=400, detail="文件必须是.xlsx格式")
+    async with _admit(LIGHT):
+        try:
+            return await run_in_threadpool(excel_service.list_sheets, file_name)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"文件不存在: {file_name}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"读取工作表列表失败: {str(e)}")
+
+def _read_response(file_name: str, sheet: Optional[str] = None,
+                   if_none_match: Optional[str] = None) -> Response:
+    """
+    读取文件（或其中一个工作表）并生成响应
+    
+    ETag 为文件的版本令牌；If-None-Match 与当前版本一致时返回304，不解析文件。
+    """
+    _check_file_name(file_name)
+    
+    known = parse_etag(if_none_match)
+    if known is not None and known == excel_service.current_version(file_name):
+        return Response(status_code=304, headers={"ETag": format_etag(known)})
     
     try:
-        data = excel_service.read_excel(file_name)
-        return ExcelData(
-            file_name=file_name,
-            records=data["records"],
-            total=data["total"]
-        )
+        data = excel_service.read_excel(file_name, sheet)
+        # 直接生成JSON，避免响应模型的二次验证，并计入response阶段
+        with metrics.stage("response"):
+            body = ExcelData(
+                file_name=file_name,
+                sheet=sheet,
+                records=data["records"],
+                total=data["total"],
+                version=data["version"]
+            ).model_dump_json()
+        return Response(content=body, media_type="application/json",
+                        headers={"ETag": format_etag(data["version"])})
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"文件不存在: {file_name}")
+    except SheetNotFound:
+        raise HTTPException(status_code=404, detail=f"工作表不存在: {sheet}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"读取文件失败: {str(e)}")
 
-@app.post("/save/{file_name}")
-async def save_file(file_name: str, request: SaveRequest):
+@app.get("/read/{file_name}", response_model=ExcelData)
+async def read_file(file_name: str, if_none_match: Optional[str] = Header(None)):
     """
-    保存数据到指定Excel文件
+    读取指定Excel文件数据（第一个工作表）
     
     - **file_name**: Excel文件名（需包含.xlsx扩展名）
-    - **request**: 包含要保存的数据记录
     """
-    # 安全检查：防止路径遍历
-    if ".." in file_name or "/" in file_name or "\\" in file_name:
-        raise HTTPException(status_code=400, detail="文件名不合法")
+    async with _admit(HEAVY):
+        return await run_in_threadpool(_read_response, file_name, None, if_none_match)
+
+@app.get("/read/{file_name}/{sheet}", response_model=ExcelData)
+async def read_sheet(file_name: str, sheet: str, if_none_match: Optional[str] = Header(None)):
+    """
+    读取指定工作表数据，只解析该工作表
     
-    if not file_name.endswith(".xlsx"):
-        raise HTTPException(status_code=400, detail="文件必须是.xlsx格式")
+    - **file_name**: Excel文件名（需包含.xlsx扩展名）
+    - **sheet**: 工作表名称
+    """
+    async with _admit(HEAVY):
+        return await run_in_threadpool(_read_response, file_name, sheet, if_none_match)
+
+@app.get("/versions/{file_name}")
+async def list_versions(file_name: str):
+    """
+    列出文件的版本：当前版本、撤回用备份的版本和保存的历史版本（最新的在前）
+    
+    - **file_name**: Excel文件名（需包含.xlsx扩展名）
+    """
+    _check_file_name(file_name)
+    
+    async with _admit(LIGHT):
+        try:
+            versions = await run_in_threadpool(excel_service.list_versions, file_name)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"文件不存在: {file_name}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"读取版本列表失败: {str(e)}")
+    return {"file_name": file_name, **versions}
+
+@app.get("/diff/{file_name}")
+async def diff_versions(
+    file_name: str,
+    from_version: str = Query(..., alias="from"),
+    to_version: str = Query(default="current", alias="to"),
+    sheet: Optional[str] = None
+):
+    """
+    比较文件的两个版本：新增、删除的行，修改的单元格和总价合计的变化
+    
+    - **from** / **to**: 版本令牌（见 /versions）、backup（撤回用的备份）或 current（当前文件，to 默认）
+    - **sheet**: 工作表名称，默认第一个工作表
+    
+    行按 内容、材料、规格尺寸 对应，行号从1开始；修改了这几列的行表现为删除一行并新增一行。
+    """
+    _check_file_name(file_name)
+    
+    async with _admit(HEAVY):
+        try:
+            diff = await run_in_threadpool(excel_service.diff_versions, file_name, from_version, to_version, sheet)
+        except SheetNotFound:
+            raise HTTPException(status_code=404, detail=f"工作表不存在: {sheet}")
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"比较版本失败: {str(e)}")
+    return {"file_name": file_name, "sheet": sheet, **diff}
+
+def _save_response(file_name: str, request: SaveRequest, response: Response,
+                   sheet: Optional[str] = None, if_match: Optional[str] = None) -> dict:
+    """
+    保存文件（或其中一个工作表）并生成响应
+    
+    提供 If-Match 时检查版本：文件已被他人修改则自动按行合并，冲突返回409，基础版本已过期返回412。
+    """
+    _check_file_name(file_name)
     
     try:
         # 转换为字典列表
-        records = [item.dict() for item in request.records]
+        with metrics.stage("request"):
+            records = [item.model_dump() for item in request.records]
         
-        success = excel_service.save_excel(file_name, records)
-        
-        if success:
-            return {
-                "success": True,
-                "message": f"文件 {file_name} 保存成功",
-                "file_name": file_name
-            }
+        result = excel_service.save_versioned(file_name, records, sheet, parse_etag(if_match))
+        response.headers["ETag"] = format_etag(result["version"])
+        if result["unchanged"]:
+            message = f"文件 {file_name} 内容未变化，无需保存"
         else:
-            raise HTTPException(status_code=500, detail="保存失败")
+            message = f"文件 {file_name} {'合并并' if result['merged'] else ''}保存成功"
+        return {
+            "success": True,
+            "message": message,
+            "file_name": file_name,
+            "version": result["version"],
+            "merged": result["merged"],
+            "unchanged": result["unchanged"],
+            "changes": result["changes"]
+        }
+    except VersionMismatch as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    except MergeConflict as e:
+        raise HTTPException(status_code=409, detail={
+            "message": f"与其他用户的修改冲突: {e}",
+            "version": excel_service.current_version(file_name),
+            "conflicts": e.conflicts
+        })
+    except SheetNotFound:
+        raise HTTPException(status_code=404, detail=f"工作表不存在: {sheet}")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"文件不存在: {file_name}")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"数据验证失败: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"保存文件失败: {str(e)}")
 
+@app.post("/save/{file_name}")
+async def save_file(file_name: str, request: SaveRequest, response: Response,
+                    if_match: Optional[str] = Header(None)):
+    """
+    保存数据到指定Excel文件（第一个工作表）
+    
+    - **file_name**: Excel文件名（需包含.xlsx扩展名）
+    - **request**: 包含要保存的数据记录
+    - **If-Match**: 读取时返回的版本（ETag），不提供时直接覆盖
+    """
+    async with _admit(HEAVY):
+        return await run_in_threadpool(_save_response, file_name, request, response, None, if_match)
+
+@app.post("/save/{file_name}/{sheet}")
+async def save_sheet(file_name: str, sheet: str, request: SaveRequest, response: Response,
+                     if_match: Optional[str] = Header(None)):
+    """
+    保存数据到指定工作表，只重写该工作表，其他工作表原样保留
+    
+    - **file_name**: Excel文件名（需包含.xlsx扩展名）
+    - **sheet**: 工作表名称
+    - **request**: 包含要保存的数据记录
+    - **If-Match**: 读取时返回的版本（ETag），不提供时直接覆盖
+    """
+    async with _admit(HEAVY):
+        return await run_in_threadpool(_save_response, file_name, request, response, sheet, if_match)
+
+@app.post("/save-stream/{file_name}")
+async def save_file_stream(file_name: str, request: Request, response: Response,
+                           sheet: Optional[str] = None, if_match: Optional[str] = Header(None)):
+    """
+    流式保存数据到指定Excel文件
+    
+    请求体为 NDJSON（每行一个记录，字段同 /save），可分块传输。请求体先分块写入暂存文件，
+    再逐行验证并写入工作簿，内存占用与记录数无关。任何一行验证失败时不修改原文件。
+    
+    - **file_name**: Excel文件名（需包含.xlsx扩展名）
+    - **sheet**: 工作表名称，默认第一个工作表
+    - **If-Match**: 读取时返回的版本（ETag）；与当前版本不一致时返回412（流式保存不合并）
+    """
+    _check_file_name(file_name)
+    
+    spool_path = excel_service.new_upload_path()
+    size = 0
+    try:
+        with metrics.stage("request"):
+            with open(spool_path, "wb") as out:
+                async for chunk in request.stream():
+                    size += len(chunk)
+                    if size > MAX_UPLOAD_SIZE:
+                        raise HTTPException(status_code=413, detail="请求体过大")
+                    out.write(chunk)
+        
+        with open(spool_path, "rb") as lines:
+            async with _admit(HEAVY):
+                count = await run_in_threadpool(
+                    excel_service.save_stream, file_name, lines, sheet, parse_etag(if_match)
+                )
+    except HTTPException:
+        raise
+    except VersionMismatch as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    except SheetNotFound:
+        raise HTTPException(status_code=404, detail=f"工作表不存在: {sheet}")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"文件不存在: {file_name}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证失败: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"保存文件失败: {str(e)}")
+    finally:
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+    
+    version = excel_service.current_version(file_name)
+    response.headers["ETag"] = format_etag(version)
+    return {
+        "success": True,
+        "message": f"文件 {file_name} 保存成功",
+        "file_name": file_name,
+        "records": count,
+        "version": version
+    }
+
 @app.post("/undo/{file_name}", response_model=UndoResponse)
 async def undo_file(file_name: str):
     """
@@ -121,28 +467,332 @@ async def undo_file(file_name: str):
     
     - **file_name**: Excel文件名（需包含.xlsx扩展名）
     """
-    # 安全检查：防止路径遍历
-    if ".." in file_name or "/" in file_name or "\\" in file_name:
-        raise HTTPException(status_code=400, detail="文件名不合法")
+    _check_file_name(file_name)
     
-    if not file_name.endswith(".xlsx"):
-        raise HTTPException(status_code=400, detail="文件必须是.xlsx格式")
+    async with _admit(LIGHT):
+        try:
+            success = await run_in_threadpool(excel_service.undo, file_name)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"撤回操作失败: {str(e)}")
+    
+    if success:
+        return UndoResponse(
+            success=True,
+            message=f"文件 {file_name} 已撤回上次保存"
+        )
+    else:
+        return UndoResponse(
+            success=False,
+            message=f"无法撤回 {file_name}，没有备份文件"
+        )
+
+@app.post("/images/{file_name}")
+async def embed_images(file_name: str, size: int = 80):
+    """
+    将图片列中的图片嵌入Excel文件（后台任务）
+    
+    - **file_name**: Excel文件名（需包含.xlsx扩展名）
+    - **size**: 图片显示尺寸（像素），未变化的图片会被跳过
+    """
+    _check_file_name(file_name)
+    
+    if size <= 0 or size > 1000:
+        raise HTTPException(status_code=400, detail="图片尺寸必须在1到1000之间")
     
+    if not excel_service.storage.exists(file_name):
+        raise HTTPException(status_code=404, detail=f"文件不存在: {file_name}")
+    
+    return _submit_job("images", excel_service.embed_images, file_name, size=size)
+
+async def _export_response(records, fmt: str, columns: List[str], download_name: str) -> StreamingResponse:
+    """构造流式导出响应（导出过程占用 heavy 通道的名额，直到输出结束）"""
+    media_type, ext = FORMATS[fmt]
+    disposition = f"attachment; filename*=UTF-8''{quote(f'{download_name}.{ext}')}"
+    await _acquire(HEAVY)
+    return _AdmittedStreamingResponse(
+        HEAVY, iter_export(records, fmt, columns),
+        media_type=media_type,
+        headers={"Content-Disposition": disposition}
+    )
+
+def _parse_export_params(format: str, columns: Optional[str], where: List[str]):
+    """解析导出参数，格式错误时返回400"""
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
     try:
-        success = excel_service.undo(file_name)
-        
-        if success:
-            return UndoResponse(
-                success=True,
-                message=f"文件 {file_name} 已撤回上次保存"
-            )
-        else:
-            return UndoResponse(
-                success=False,
-                message=f"无法撤回 {file_name}，没有备份文件"
+        return parse_columns(columns), parse_conditions(where)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/export/{file_name}")
+async def export_file(
+    file_name: str,
+    format: str = "csv",
+    columns: Optional[str] = None,
+    where: List[str] = Query(default=[]),
+    sheet: Optional[str] = None
+):
+    """
+    流式导出指定Excel文件
+    
+    - **file_name**: Excel文件名（需包含.xlsx扩展名）
+    - **sheet**: 工作表名称，默认第一个工作表
+    - **format**: 导出格式 csv / tsv / jsonl
+    - **columns**: 逗号分隔的列名，默认导出全部列
+    - **where**: 过滤条件，可重复，如 `数量>=10`、`材料~PVC`
+    """
+    _check_file_name(file_name)
+    selected, conditions = _parse_export_params(format, columns, where)
+    
+    try:
+        # 开始输出之前检查文件和工作表
+        rows = await run_in_threadpool(excel_service.iter_records, file_name, sheet)
+    except SheetNotFound:
+        raise HTTPException(status_code=404, detail=f"工作表不存在: {sheet}")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"文件不存在: {file_name}")
+    
+    records = (r for r in rows if matches(r, conditions))
+    return await _export_response(records, format, selected, os.path.splitext(file_name)[0])
+
+@app.get("/export")
+async def export_all(
+    format: str = "csv",
+    columns: Optional[str] = None,
+    where: List[str] = Query(default=[])
+):
+    """
+    流式导出所有Excel文件，首列为文件名
+    
+    - **format**: 导出格式 csv / tsv / jsonl
+    - **columns**: 逗号分隔的列名，默认导出全部列
+    - **where**: 过滤条件，可重复，如 `数量>=10`、`材料~PVC`
+    """
+    selected, conditions = _parse_export_params(format, columns, where)
+    
+    def records():
+        for file_name in excel_service.list_excel_files():
+            try:
+                for r in excel_service.iter_records(file_name):
+                    if matches(r, conditions):
+                        r["文件"] = file_name
+                        yield r
+            except Exception as e:
+                print(f"导出文件失败 {file_name}: {e}")
+    
+    return await _export_response(records(), format, ["文件"] + selected, "全部报价")
+
+@app.get("/query", response_model=QueryResult)
+async def query_records(
+    where: List[str] = Query(default=[]),
+    columns: Optional[str] = None,
+    file: List[str] = Query(default=[]),
+    order: Optional[str] = None,
+    desc: bool = False,
+    limit: int = Query(default=100, ge=1, le=MAX_QUERY_LIMIT),
+    offset: int = Query(default=0, ge=0)
+):
+    """
+    跨文件查询记录
+    
+    查询所有Excel文件的SQLite镜像。镜像在保存后和定期（QUOTE_MIRROR_SYNC_INTERVAL）同步，
+    指定文件时查询前先同步这些文件。
+    
+    - **where**: 过滤条件，可重复，如 `材料~PVC`、`价格>=100`、`经办人=张三`
+    - **columns**: 逗号分隔的列名，默认返回全部列
+    - **file**: 只查询指定文件，可重复
+    - **order**: 排序列（报价表列或"文件"），默认按文件和行号
+    - **desc**: 是否降序
+    - **limit** / **offset**: 分页
+    """
+    try:
+        conditions = parse_conditions(where)
+        selected = parse_columns(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async with _admit(HEAVY):
+        try:
+            result = await run_in_threadpool(
+                excel_service.query, conditions, selected, file, order, desc, limit, offset
             )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"撤回操作失败: {str(e)}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return QueryResult(rows=result["rows"], count=result["count"], limit=limit, offset=offset)
+
+@app.post("/reindex")
+async def reindex():
+    """重新解析所有Excel文件并刷新缓存和SQLite镜像（后台任务）"""
+    return _submit_job("reindex", excel_service.reindex)
+
+@app.post("/aggregate")
+async def aggregate():
+    """汇总所有Excel文件的合计（后台任务）"""
+    return _submit_job("aggregate", excel_service.aggregate)
+
+@app.post("/upload")
+async def upload_file(file: UploadFile = File(...), overwrite: bool = False):
+    """
+    上传Excel文件
+    
+    文件分块写入暂存目录，随后在后台任务中解析、验证并导入，
+    立即返回任务ID，通过 /jobs/{job_id} 查询导入结果。
+    
+    - **file**: 要上传的.xlsx文件
+    - **overwrite**: 同名文件存在时是否覆盖（覆盖前会备份）
+    """
+    file_name = os.path.basename(file.filename or "")
+    _check_file_name(file_name)
+    
+    if not overwrite and excel_service.storage.exists(file_name):
+        raise HTTPException(status_code=409, detail=f"文件已存在: {file_name}")
+    
+    temp_path = excel_service.new_upload_path()
+    size = 0
+    try:
+        with open(temp_path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail="上传文件过大")
+                out.write(chunk)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        await file.close()
+    
+    try:
+        job = job_manager.submit("import", excel_service.import_excel, temp_path, file_name, overwrite)
+    except JobQueueFull as e:
+        os.remove(temp_path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {
+        "success": True,
+        "message": f"文件 {file_name} 已上传，正在后台导入",
+        "file_name": file_name,
+        "size": size,
+        "job_id": job.id
+    }
+
+@app.get("/jobs", response_model=List[JobInfo])
+async def list_jobs():
+    """列出后台任务，最新的在前"""
+    return [JobInfo(**job) for job in job_manager.list()]
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str):
+    """
+    查询后台任务状态、进度和结果
+    
+    - **job_id**: 任务ID
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    return JobInfo(**job)
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    取消后台任务
+    
+    - **job_id**: 任务ID
+    """
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    if not job_manager.cancel(job_id):
+        return {"success": False, "message": f"任务 {job_id} 已结束，无法取消"}
+    return {"success": True, "message": f"任务 {job_id} 已取消"}
+
+# 通知后台同步线程停止（每次启动时创建）
+_background_stop: Optional[threading.Event] = None
+
+def _warm_up(stop: threading.Event):
+    """预热缓存，然后同步SQLite镜像，之后每隔 MIRROR_SYNC_INTERVAL 秒全部同步一次"""
+    if WARMUP_FILES > 0:
+        excel_service.warm_up(WARMUP_FILES)
+    while not stop.is_set():
+        try:
+            excel_service.sync_mirror()
+        except Exception as e:
+            print(f"同步SQLite镜像失败: {e}")
+        if MIRROR_SYNC_INTERVAL <= 0 or stop.wait(MIRROR_SYNC_INTERVAL):
+            break
+
+async def startup():
+    """载入快照索引，然后在后台线程中预热缓存和同步SQLite镜像，不阻塞服务启动"""
+    global _background_stop
+    if SNAPSHOT:
+        try:
+            count = excel_service.restore_snapshot()
+            if count:
+                print(f"已载入快照索引：{count} 个解析结果")
+        except Exception as e:
+            print(f"载入快照失败: {e}")
+    _background_stop = threading.Event()
+    threading.Thread(target=_warm_up, args=(_background_stop,), name="warmup", daemon=True).start()
+
+async def shutdown():
+    """停止后台任务和定期同步，保存解析结果快照"""
+    if _background_stop is not None:
+        _background_stop.set()
+    job_manager.shutdown()
+    if SNAPSHOT:
+        try:
+            result = await run_in_threadpool(excel_service.save_snapshot)
+            print(f"已保存快照：新写入 {result['written']} 个，保留 {result['kept']} 个，移除 {result['removed']} 个")
+        except Exception as e:
+            print(f"保存快照失败: {e}")
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus文本格式的运行指标"""
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/debug/profile", include_in_schema=False)
+async def debug_profile(
+    request: Request,
+    mode: str = "cpu",
+    seconds: float = 10,
+    requests: int = 0,
+    interval_ms: float = 5,
+    limit: int = 50
+):
+    """
+    对运行中的后端进行性能分析（需设置环境变量 QUOTE_DEBUG_TOKEN，并在 X-Debug-Token 头中提供）
+    
+    - **mode**: cpu（采样调用栈，返回折叠栈格式，可生成火焰图）或 memory（tracemalloc新增分配）
+    - **seconds**: 分析窗口的最长秒数
+    - **requests**: 大于0时，处理完这么多请求后提前结束
+    - **interval_ms**: cpu模式的采样间隔（毫秒）
+    - **limit**: memory模式输出的行数
+    """
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("X-Debug-Token", ""), DEBUG_TOKEN):
+        raise HTTPException(status_code=403, detail="调试令牌无效")
+    if not 0 < seconds <= 300:
+        raise HTTPException(status_code=400, detail="seconds 必须在0到300之间")
+    if not 0.5 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms 必须在0.5到1000之间")
+    
+    try:
+        session = profiling.begin(mode, seconds, requests, interval_ms / 1000, limit)
+    except profiling.ProfileBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        while not session.done:
+            await asyncio.sleep(0.05)
+    finally:
+        result = profiling.end(session)
+    return PlainTextResponse(result)
 
 @app.get("/health")
 async def health_check():
@@ -152,6 +802,7 @@ async def health_check():
 if __name__ == "__main__":
     import sys
     import subprocess
+    from importlib.util import find_spec
     from pathlib import Path
     
     print("=" * 60)
@@ -168,12 +819,11 @@ if __name__ == "__main__":
         "pydantic"
     ]
     
+    # 只检查是否已安装，不实际导入，避免拖慢启动
     missing = []
     for package in required_packages:
         package_name = package.split('[')[0] if '[' in package else package
-        try:
-            __import__(package_name)
-        except ImportError:
+        if find_spec(package_name) is None:
             missing.append(package)
     
     if missing:
@@ -215,10 +865,12 @@ if __name__ == "__main__":
         import uvicorn
         # 直接运行时，不使用reload模式，避免模块导入问题
         uvicorn.run(
-            app,
+            # 多进程时每个 worker 需要自行导入应用
+            "main:app" if WORKERS > 1 else app,
             host="0.0.0.0",
             port=8000,
             reload=False,
+            workers=WORKERS,
             log_level="info"
         )
     except KeyboardInterrupt:
@@ -0,0 +1,158 @@
+"""
+报价记录的三方合并
+
+两个客户端基于同一版本（base）编辑后先后保存时，后保存的一方（ours）与当前文件（theirs）
+按行合并：分别计算 base -> ours、base -> theirs 的行级差异（difflib），
+只有一方修改的区域直接采用该方的结果；双方在同一位置插入新行时两边的行都保留（当前文件的在前），
+双方修改同一区域且结果不同时视为冲突。
+
+行按内容比较：忽略序号（保存时重新编号）和总价（保存时重新计算），空字符串视为空值。
+指定 columns 时只比较这些列（客户端提交的列），客户端没有提交的列（如日期）不产生冲突：
+双方都没有修改的行取当前文件中的行，ours 的行缺少的列取当前文件中对应行的值。
+"""
+
+from difflib import SequenceMatcher
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple
+
+# 比较行内容时忽略的列
+IGNORED_COLUMNS = ("序号", "总价")
+
+Hunk = Tuple[int, int, int, int, str]
+
+
+class MergeConflict(Exception):
+    """双方修改了同一区域"""
+
+    def __init__(self, conflicts: List[Dict[str, Any]]):
+        super().__init__(f"{len(conflicts)}处修改冲突")
+        self.conflicts = conflicts
+
+
+def row_key(record: Dict[str, Any], columns: Optional[Collection[str]] = None) -> tuple:
+    """行内容的比较键，指定 columns 时只包含这些列"""
+    return tuple(sorted(
+        (k, v) for k, v in record.items()
+        if k not in IGNORED_COLUMNS and (columns is None or k in columns) and v is not None and v != ""
+    ))
+
+
+Opcodes = List[Tuple[str, int, int, int, int]]
+
+
+def _opcodes(base_keys: List[tuple], keys: List[tuple]) -> Opcodes:
+    return SequenceMatcher(None, base_keys, keys, autojunk=False).get_opcodes()
+
+
+def _hunks(opcodes: Opcodes, side: str) -> List[Hunk]:
+    """base 到另一方的修改区域：(base起, base止, 对方起, 对方止, 哪一方)"""
+    return [(i1, i2, j1, j2, side) for tag, i1, i2, j1, j2 in opcodes if tag != "equal"]
+
+
+def _matches(opcodes: Opcodes, modified: bool = False) -> Dict[int, int]:
+    """base 行号 -> 对方行号：未修改的行；modified 为True时还包括修改区域中按位置对应的行"""
+    matches: Dict[int, int] = {}
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal" or (modified and tag == "replace"):
+            matches.update(zip(range(i1, i2), range(j1, j2)))
+    return matches
+
+
+def _overlaps(start: int, end: int, group_start: int, group_end: int) -> bool:
+    """修改区域是否与已有区域重叠；在同一位置的插入也视为重叠"""
+    return start == group_start or (start < group_end and group_start < end)
+
+
+def _apply(start: int, end: int, hunks: List[Hunk], base_row: Callable[[int], Dict[str, Any]],
+           rows: Dict[str, Callable[[int], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """对 base[start:end] 应用一方的修改"""
+    result = []
+    pos = start
+    for i1, i2, j1, j2, side in hunks:
+        result.extend(base_row(i) for i in range(pos, i1))
+        result.extend(rows[side](j) for j in range(j1, j2))
+        pos = i2
+    result.extend(base_row(i) for i in range(pos, end))
+    return result
+
+
+def merge_records(base: List[Dict[str, Any]], ours: List[Dict[str, Any]],
+                  theirs: List[Dict[str, Any]],
+                  columns: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+    """
+    三方合并，返回合并后的记录（columns 为比较行内容时使用的列，默认所有列）
+
+    有冲突时抛出 MergeConflict，conflicts 中每项包含基础版本的行范围（从1开始，包含两端）
+    和双方在该范围的记录。
+    """
+    if columns is not None:
+        columns = set(columns)
+    base_keys = [row_key(r, columns) for r in base]
+    ours_keys = [row_key(r, columns) for r in ours]
+    theirs_keys = [row_key(r, columns) for r in theirs]
+    if ours_keys == base_keys:
+        return theirs
+    if columns is None and (ours_keys == theirs_keys or theirs_keys == base_keys):
+        return ours
+
+    ours_opcodes = _opcodes(base_keys, ours_keys)
+    theirs_opcodes = _opcodes(base_keys, theirs_keys)
+    # 双方都没有修改的行取当前文件中的行（只比较部分列时，当前文件可能修改了其他列）
+    unchanged = _matches(theirs_opcodes)
+    theirs_of_base = _matches(theirs_opcodes, modified=True)
+    base_of_ours = {j: i for i, j in _matches(ours_opcodes, modified=True).items()}
+
+    def base_row(i: int) -> Dict[str, Any]:
+        return theirs[unchanged[i]] if i in unchanged else base[i]
+
+    def ours_row(j: int) -> Dict[str, Any]:
+        row = ours[j]
+        i = base_of_ours.get(j)
+        if columns is None or i is None:
+            return row
+        # 客户端没有提交的列取当前文件（或基础版本）中对应行的值
+        match = theirs[theirs_of_base[i]] if i in theirs_of_base else base[i]
+        filled = dict(row)
+        for k, v in match.items():
+            filled.setdefault(k, v)
+        return filled
+
+    rows = {"ours": ours_row, "theirs": theirs.__getitem__}
+    hunks = sorted(_hunks(ours_opcodes, "ours") + _hunks(theirs_opcodes, "theirs"), key=lambda h: (h[0], h[1]))
+    result: List[Dict[str, Any]] = []
+    conflicts: List[Dict[str, Any]] = []
+    pos = 0
+    i = 0
+    while i < len(hunks):
+        start, end = hunks[i][0], hunks[i][1]
+        group = [hunks[i]]
+        i += 1
+        while i < len(hunks) and _overlaps(hunks[i][0], hunks[i][1], start, end):
+            end = max(end, hunks[i][1])
+            group.append(hunks[i])
+            i += 1
+
+        result.extend(base_row(k) for k in range(pos, start))
+        if len({h[4] for h in group}) == 1:
+            result.extend(_apply(start, end, group, base_row, rows))
+        else:
+            mine = _apply(start, end, [h for h in group if h[4] == "ours"], base_row, rows)
+            other = _apply(start, end, [h for h in group if h[4] == "theirs"], base_row, rows)
+            if [row_key(r, columns) for r in mine] == [row_key(r, columns) for r in other]:
+                result.extend(mine)
+            elif all(h[0] == h[1] for h in group):
+                # 双方都只是插入新行（如同时在末尾追加）
+                result.extend(other)
+                result.extend(mine)
+            else:
+                conflicts.append({
+                    "base_start": start + 1,
+                    "base_end": end,
+                    "ours": mine,
+                    "theirs": other,
+                })
+        pos = end
+    result.extend(base_row(k) for k in range(pos, len(base)))
+
+    if conflicts:
+        raise MergeConflict(conflicts)
+    return result
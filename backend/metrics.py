@@ -0,0 +1,224 @@
+"""
+运行指标
+
+轻量的 Prometheus 指标实现（计数器、仪表盘、直方图），通过 /metrics 以文本格式输出。
+不依赖第三方库，记录一次指标只需一次加锁和几次加法。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+try:
+    from . import tracing
+except ImportError:
+    import tracing
+
+# 默认直方图桶（秒）：覆盖亚毫秒到数十秒
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """格式化标签：{a="1",b="2"}"""
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """格式化数值，整数不带小数点"""
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """可增可减的仪表盘"""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items()) or ([((), 0)] if not self.labelnames else [])
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """直方图：按桶统计观测值分布"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签 -> [各桶计数..., 总和, 总数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+                    break
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """记录代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {_format_value(cumulative)}")
+            le = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {_format_value(data[-1])}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(data[-1])}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Prometheus 文本格式的媒体类型
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "quote_http_request_duration_seconds", "HTTP请求耗时（秒）", ["method", "route", "status"]))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "quote_http_requests_in_flight", "正在处理的HTTP请求数"))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "quote_stage_duration_seconds", "处理阶段耗时（秒）", ["stage"]))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "quote_cache_requests_total", "缓存查询次数", ["cache", "result"]))
+LOCK_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "quote_file_lock_wait_seconds", "等待文件解锁的耗时（秒）"))
+BYTES_READ = REGISTRY.register(Counter(
+    "quote_file_bytes_read_total", "解析的Excel文件字节数"))
+BYTES_WRITTEN = REGISTRY.register(Counter(
+    "quote_file_bytes_written_total", "写入的Excel文件字节数"))
+SAVES = REGISTRY.register(Counter(
+    "quote_saves_total", "保存请求数（written 写入文件，unchanged 内容未变化未写入）", ["result"]))
+ADMISSION = REGISTRY.register(Counter(
+    "quote_admission_total", "准入控制结果（admitted 立即执行，queued 排队后执行，rejected 队列已满，timeout 排队超时）",
+    ["lane", "result"]))
+ADMISSION_QUEUE = REGISTRY.register(Gauge(
+    "quote_admission_queue_depth", "准入通道中排队的请求数", ["lane"]))
+ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "quote_admission_wait_seconds", "准入通道中的排队时间（秒）", ["lane"]))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """记录处理阶段耗时（同时写入当前请求的追踪）：with stage("parse"): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, stage=name)
+        trace = tracing.current_trace()
+        if trace is not None:
+            trace.add(name, start, duration)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Any, Dict
 from datetime import datetime
 
 class ExcelItem(BaseModel):
@@ -25,8 +25,10 @@ class ExcelFile(BaseModel):
 class ExcelData(BaseModel):
     """Excel数据响应"""
     file_name: str = Field(..., description="文件名")
+    sheet: Optional[str] = Field(None, description="工作表名称，为空表示第一个工作表")
     records: List[ExcelItem] = Field(..., description="数据记录")
     total: float = Field(..., description="总价合计")
+    version: Optional[str] = Field(None, description="版本令牌（同ETag），保存时通过If-Match提交")
 
 class SaveRequest(BaseModel):
     """保存请求"""
@@ -36,3 +38,23 @@ class UndoResponse(BaseModel):
     """撤回响应"""
     success: bool = Field(..., description="是否成功")
     message: str = Field(..., description="消息")
+
+class JobInfo(BaseModel):
+    """后台任务信息"""
+    id: str = Field(..., description="任务ID")
+    kind: str = Field(..., description="任务类型")
+    status: str = Field(..., description="任务状态：pending/running/succeeded/failed/cancelled")
+    progress: float = Field(0.0, description="进度（0到1）")
+    message: str = Field("", description="当前进度说明")
+    result: Optional[Any] = Field(None, description="任务结果")
+    error: Optional[str] = Field(None, description="错误信息")
+    created: datetime = Field(..., description="创建时间")
+    started: Optional[datetime] = Field(None, description="开始时间")
+    finished: Optional[datetime] = Field(None, description="结束时间")
+
+class QueryResult(BaseModel):
+    """跨文件查询结果"""
+    rows: List[Dict[str, Any]] = Field(..., description="查询到的记录，包含文件列")
+    count: int = Field(..., description="满足条件的总行数")
+    limit: int = Field(..., description="本次返回的最大行数")
+    offset: int = Field(..., description="跳过的行数")
@@ -0,0 +1,169 @@
+"""
+运行时性能分析
+
+供 /debug/profile 使用的两种分析模式：
+- cpu: 采样分析器，定期采集所有线程的调用栈，输出折叠栈格式（每行 `栈;帧;帧 次数`），
+  可直接用 flamegraph.pl、speedscope 等工具生成火焰图
+- memory: tracemalloc 快照，按代码行汇总分析窗口内新增的内存分配
+
+同一时间只允许一个分析会话，会话在指定秒数或处理完指定数量的请求后结束。
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+MODES = ("cpu", "memory")
+
+
+class ProfileBusy(RuntimeError):
+    """已有分析会话在运行"""
+
+
+def _frame_label(frame) -> str:
+    """帧名称：文件名:函数名（去掉分号，避免破坏折叠栈格式）"""
+    code = frame.f_code
+    name = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+    return name.replace(";", ",")
+
+
+class SamplingProfiler:
+    """采样分析器：在后台线程中定期采集所有线程的调用栈"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """停止采样，返回折叠栈文本"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        lines = [f"{stack} {count}" for stack, count in self.samples.most_common()]
+        return "\n".join(lines) + "\n"
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)).replace(";", ","))
+                self.samples[";".join(reversed(stack))] += 1
+
+
+class MemoryProfiler:
+    """内存分析：对比窗口开始和结束时的 tracemalloc 快照"""
+
+    def __init__(self, limit: int = 50, frames: int = 10):
+        self.limit = limit
+        self.frames = frames
+        self._started_tracing = False
+        self._before = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._before = tracemalloc.take_snapshot()
+
+    def stop(self) -> str:
+        """停止分析，返回按代码行汇总的新增分配"""
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self._started_tracing:
+            tracemalloc.stop()
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ]
+        stats = after.filter_traces(filters).compare_to(self._before.filter_traces(filters), "lineno")
+        lines = [f"# 窗口内峰值 {peak / 1024:.1f} KiB；按新增内存排序的前 {self.limit} 行"]
+        lines.append("# 新增KiB\t新增块数\t当前KiB\t位置")
+        for stat in stats[:self.limit]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"{stat.size_diff / 1024:.1f}\t{stat.count_diff}\t{stat.size / 1024:.1f}\t"
+                f"{frame.filename}:{frame.lineno}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+class ProfileSession:
+    """一次分析会话：按时间或请求数界定窗口"""
+
+    def __init__(self, mode: str, seconds: float, requests: int, interval: float, limit: int):
+        if mode == "cpu":
+            self.profiler = SamplingProfiler(interval)
+        else:
+            self.profiler = MemoryProfiler(limit)
+        self.deadline = time.monotonic() + seconds
+        self.remaining = requests
+        self._lock = threading.Lock()
+
+    def request_finished(self):
+        with self._lock:
+            if self.remaining > 0:
+                self.remaining -= 1
+
+    @property
+    def done(self) -> bool:
+        with self._lock:
+            reached = self.remaining == 0
+        return reached or time.monotonic() >= self.deadline
+
+
+_session: Optional[ProfileSession] = None
+_session_lock = threading.Lock()
+
+
+def begin(mode: str = "cpu", seconds: float = 10, requests: int = 0,
+          interval: float = 0.005, limit: int = 50) -> ProfileSession:
+    """
+    开始分析会话
+
+    requests 大于0时，处理完这么多请求后结束（最多等待 seconds 秒）；否则按 seconds 结束。
+    """
+    global _session
+    if mode not in MODES:
+        raise ValueError(f"不支持的分析模式: {mode}")
+    with _session_lock:
+        if _session is not None:
+            raise ProfileBusy("已有分析会话在运行")
+        _session = ProfileSession(mode, seconds, requests if requests > 0 else -1, interval, limit)
+    _session.profiler.start()
+    return _session
+
+
+def end(session: ProfileSession) -> str:
+    """结束分析会话，返回分析结果文本"""
+    global _session
+    try:
+        return session.profiler.stop()
+    finally:
+        with _session_lock:
+            _session = None
+
+
+def request_finished():
+    """由请求中间件在每个请求结束时调用"""
+    session = _session
+    if session is not None:
+        session.request_finished()
@@ -0,0 +1,282 @@
+"""
+列式报价表
+
+解析结果按列存储，替代"每行一个字典"的列表：
+- 序号使用 array('q')，数量/价格/总价使用 array('d')，空值分别用哨兵值和 NaN 表示
+- 其他文本列按列字典编码：每行只存一个 int32 编号，相同的文本（材料、经办人等）只保存一份
+- 行视图 QuoteRow 使用 __slots__，只保存表和行号，按需取值
+
+列中出现不符合预期类型的值时（如数值列中的文本），该列退化为普通列表，保证取出的值与写入时一致。
+表构造完成后视为只读，可在多个请求之间共享；需要字典时调用 to_records() 生成。
+行哈希（row_hashes）计算后保存在表中，与解析结果一起缓存。
+"""
+
+import hashlib
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+INT_COLUMNS = {"序号"}
+FLOAT_COLUMNS = {"数量", "价格", "总价"}
+
+# 整数列的空值哨兵
+_NULL_INT = -(2 ** 63)
+
+
+def hash_row(values: tuple) -> str:
+    """一行值的内容哈希（值的类型与解析结果一致时，相同内容的哈希相同）"""
+    return hashlib.blake2b(repr(values).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class _IntColumn:
+    """整数列"""
+
+    __slots__ = ("data",)
+
+    def __init__(self):
+        self.data = array("q")
+
+    def append(self, value) -> bool:
+        if value is None:
+            self.data.append(_NULL_INT)
+        elif type(value) is int and value != _NULL_INT:
+            self.data.append(value)
+        else:
+            return False
+        return True
+
+    def get(self, i: int):
+        value = self.data[i]
+        return None if value == _NULL_INT else value
+
+    def tolist(self) -> List[Optional[int]]:
+        return [None if v == _NULL_INT else v for v in self.data]
+
+
+class _FloatColumn:
+    """浮点数列，空值为 NaN"""
+
+    __slots__ = ("data",)
+
+    def __init__(self):
+        self.data = array("d")
+
+    def append(self, value) -> bool:
+        if value is None:
+            self.data.append(float("nan"))
+        elif type(value) is float and value == value:
+            self.data.append(value)
+        else:
+            return False
+        return True
+
+    def get(self, i: int):
+        value = self.data[i]
+        return None if value != value else value
+
+    def tolist(self) -> List[Optional[float]]:
+        return [None if v != v else v for v in self.data]
+
+
+class _StringColumn:
+    """字典编码的文本列：编号 -1 表示空值"""
+
+    __slots__ = ("codes", "values", "_index")
+
+    def __init__(self):
+        self.codes = array("i")
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def append(self, value) -> bool:
+        if value is None:
+            self.codes.append(-1)
+        elif type(value) is str:
+            code = self._index.get(value)
+            if code is None:
+                code = self._index[value] = len(self.values)
+                self.values.append(value)
+            self.codes.append(code)
+        else:
+            return False
+        return True
+
+    def get(self, i: int):
+        code = self.codes[i]
+        return None if code < 0 else self.values[code]
+
+    def tolist(self) -> List[Optional[str]]:
+        # 编号 -1 正好取到末尾追加的 None
+        lookup = self.values + [None]
+        return [lookup[c] for c in self.codes]
+
+
+class _ObjectColumn:
+    """普通列表列，用于类型不一致的列"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Optional[List[Any]] = None):
+        self.data = data if data is not None else []
+
+    def append(self, value) -> bool:
+        self.data.append(value)
+        return True
+
+    def get(self, i: int):
+        return self.data[i]
+
+    def tolist(self) -> List[Any]:
+        return list(self.data)
+
+
+def _new_column(name: str):
+    if name in INT_COLUMNS:
+        return _IntColumn()
+    if name in FLOAT_COLUMNS:
+        return _FloatColumn()
+    return _StringColumn()
+
+
+class QuoteRow(Mapping):
+    """报价表中一行的只读视图"""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "QuoteTable", index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, column: str):
+        return self._table._columns[column].get(self._index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table._columns)
+
+    def __len__(self) -> int:
+        return len(self._table._columns)
+
+    def to_dict(self) -> Dict[str, Any]:
+        i = self._index
+        return {name: col.get(i) for name, col in self._table._columns.items()}
+
+    def __repr__(self) -> str:
+        return f"QuoteRow({self.to_dict()!r})"
+
+
+class QuoteTable:
+    """列式存储的报价记录"""
+
+    __slots__ = ("_columns", "_length", "total", "_hashes")
+
+    def __init__(self):
+        # 列名 -> 列数据，保持列的出现顺序
+        self._columns: Dict[str, Any] = {}
+        self._length = 0
+        # 合计（由解析过程计算）
+        self.total = 0.0
+        # 行哈希缓存：列名元组 -> 每行的哈希
+        self._hashes: Dict[tuple, List[str]] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], total: float = 0.0) -> "QuoteTable":
+        table = cls()
+        for record in records:
+            table.append(record)
+        table.total = total
+        return table
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List[Any]], total: float = 0.0) -> "QuoteTable":
+        """由 to_columns() 的结果重建表"""
+        table = cls()
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("各列长度不一致")
+        for name, values in columns.items():
+            column = _new_column(name)
+            for value in values:
+                if not column.append(value):
+                    column = _ObjectColumn(list(values))
+                    break
+            table._columns[name] = column
+        table._length = lengths.pop() if lengths else 0
+        table.total = total
+        return table
+
+    def append(self, record: Dict[str, Any]):
+        """追加一行；新出现的列在之前的行中为空，行中缺少的列记为空"""
+        columns = self._columns
+        for name in record:
+            if name not in columns:
+                column = _new_column(name)
+                for _ in range(self._length):
+                    column.append(None)
+                columns[name] = column
+        for name, column in columns.items():
+            value = record.get(name)
+            if not column.append(value):
+                column = columns[name] = _ObjectColumn(column.tolist())
+                column.append(value)
+        self._length += 1
+        self._hashes.clear()
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[QuoteRow]:
+        for i in range(self._length):
+            yield QuoteRow(self, i)
+
+    def row(self, index: int) -> QuoteRow:
+        if not -self._length <= index < self._length:
+            raise IndexError(index)
+        return QuoteRow(self, index % self._length)
+
+    def column(self, name: str) -> List[Any]:
+        """整列的值，列不存在时全部为None"""
+        column = self._columns.get(name)
+        return column.tolist() if column is not None else [None] * self._length
+
+    def to_columns(self) -> Dict[str, List[Any]]:
+        """按列导出（列名 -> 值列表），可用 from_columns() 重建"""
+        return {name: col.tolist() for name, col in self._columns.items()}
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """生成字典列表（每次调用返回新的字典，可由调用方修改）"""
+        names = list(self._columns)
+        if not names:
+            return [{} for _ in range(self._length)]
+        values = [col.tolist() for col in self._columns.values()]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def rows(self, columns: Sequence[str]) -> List[tuple]:
+        """按指定列排列的各行值（列不存在时为None）"""
+        if not columns:
+            return [() for _ in range(self._length)]
+        return list(zip(*[self.column(name) for name in columns]))
+
+    def row_hashes(self, columns: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        每行的内容哈希（默认包含全部列），用于判断行是否变化
+
+        两行的哈希相同当且仅当指定列的值都相同。结果按列缓存，调用方不应修改。
+        """
+        names = tuple(columns) if columns is not None else tuple(self._columns)
+        hashes = self._hashes.get(names)
+        if hashes is None:
+            if not names:
+                hashes = ["" for _ in range(self._length)]
+            else:
+                hashes = [hash_row(row) for row in self.rows(names)]
+            self._hashes[names] = hashes
+        return hashes
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """逐行生成字典，不一次性生成整个列表"""
+        for i in range(self._length):
+            yield QuoteRow(self, i).to_dict()
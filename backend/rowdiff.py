@@ -0,0 +1,81 @@
+"""
+行级差异
+
+两个版本的行按行键对应：行键为 内容、材料、规格尺寸 的值，键相同的多行按出现顺序区分；
+对应上的两行再比较其余各列（序号除外，保存时会重新编号）判断是否修改。
+按行键建立字典，时间与行数成线性关系，不受插入、删除行导致的行号移动影响。
+修改了行键列（如改了内容）的行表现为删除一行并新增一行。
+"""
+
+from typing import Any, Dict, List, Sequence
+
+# 用于对应两个版本中同一行的列
+KEY_COLUMNS = ("内容", "材料", "规格尺寸")
+
+# 比较时忽略的列
+IGNORED_COLUMNS = ("序号",)
+
+
+def _row_keys(rows: Sequence[tuple], key_index: List[int]) -> List[tuple]:
+    """每行的行键：(行键列的值, 相同值的第几次出现)"""
+    seen: Dict[tuple, int] = {}
+    keys = []
+    for row in rows:
+        key = tuple(row[i] for i in key_index)
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        keys.append((key, n))
+    return keys
+
+
+def diff_rows(columns: Sequence[str], old: Sequence[tuple], new: Sequence[tuple],
+              cells: bool = False) -> Dict[str, Any]:
+    """
+    比较两个版本的行（每行为按 columns 顺序排列的值）
+
+    返回 {"added": 新版本中的行号, "removed": 旧版本中的行号, "modified": 修改的行}，行号从1开始。
+    cells 为False时 modified 为新版本中的行号；为True时每项为
+    {"row": 新行号, "old_row": 旧行号, "cells": {列名: [旧值, 新值]}}。
+    """
+    key_index = [i for i, c in enumerate(columns) if c in KEY_COLUMNS]
+    value_index = [i for i, c in enumerate(columns) if c not in IGNORED_COLUMNS]
+
+    old_positions = {key: i for i, key in enumerate(_row_keys(old, key_index))}
+    added: List[int] = []
+    modified: List[Any] = []
+    matched = set()
+    for j, key in enumerate(_row_keys(new, key_index)):
+        i = old_positions.get(key)
+        if i is None:
+            added.append(j + 1)
+            continue
+        matched.add(i)
+        old_row, new_row = old[i], new[j]
+        changed = [k for k in value_index if old_row[k] != new_row[k]]
+        if not changed:
+            continue
+        if cells:
+            modified.append({
+                "row": j + 1,
+                "old_row": i + 1,
+                "cells": {columns[k]: [old_row[k], new_row[k]] for k in changed},
+            })
+        else:
+            modified.append(j + 1)
+    removed = [i + 1 for i in range(len(old)) if i not in matched]
+    return {"added": added, "removed": removed, "modified": modified}
+
+
+def align(columns: Sequence[str], rows: Sequence[Dict[str, Any]]) -> List[tuple]:
+    """字典形式的行转为按 columns 排列的元组"""
+    return [tuple(r.get(c) for c in columns) for r in rows]
+
+
+def union_columns(*groups: Sequence[str]) -> List[str]:
+    """按出现顺序合并多组列名"""
+    columns: List[str] = []
+    for group in groups:
+        for c in group:
+            if c not in columns:
+                columns.append(c)
+    return columns
@@ -0,0 +1,63 @@
+"""
+重复调用合并（single-flight）
+
+多个线程同时请求同一个键（如同一文件的同一版本）时，只有第一个线程执行计算，
+其余线程等待并共享其结果（或异常）。计算结束后键即被移除，之后的调用重新计算，
+因此只合并同时进行的调用，结果的缓存由调用方负责。
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """进行中的一次计算"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """按键合并同时进行的调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行 fn()，同一个键已有计算在进行时等待其结果
+
+        返回 (结果, 是否共享了其他线程的结果)；计算抛出异常时所有等待者都抛出同一个异常。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """正在进行的计算数"""
+        with self._lock:
+            return len(self._calls)
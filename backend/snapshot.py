@@ -0,0 +1,186 @@
+"""
+解析结果快照
+
+服务正常停止时，将内存中的解析结果（QuoteTable）和工作表名称写入 data/cache/snapshot/，
+重启后不必重新解析用户再次打开的文件：
+
+- manifest.json：快照格式版本、各条目对应的文件/工作表/文件版本，以及各文件的工作表名称
+- {文件名和工作表的哈希}.{版本令牌}.json：一个工作表的解析结果（按列存储，同 QuoteTable.to_columns()）
+
+启动时只读取 manifest.json（毫秒级），解析结果在首次读取该文件时才加载，
+并且只有文件的当前版本（修改时间、大小）与快照中的一致时才使用，否则照常解析。
+快照格式（SNAPSHOT_FORMAT）或列式结构变化时旧快照整体作废。
+布局缓存和SQLite镜像本身已持久化，不包含在快照中。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .locks import FileLock
+    from .quote_table import QuoteTable
+    from .versioning import version_token
+except ImportError:
+    from locks import FileLock
+    from quote_table import QuoteTable
+    from versioning import version_token
+
+# 快照格式版本，不一致的快照被忽略
+SNAPSHOT_FORMAT = 1
+
+MANIFEST = "manifest.json"
+
+Version = Tuple[int, int]
+
+
+class Snapshot:
+    """快照目录（多个进程停止时通过锁文件依次写入）"""
+
+    def __init__(self, root: str, lock_path: str):
+        self.root = root
+        self._file_lock = FileLock(lock_path)
+        self._lock = threading.Lock()
+        # 启动时读取的 manifest：条目名 -> {"file", "sheet", "version"}；文件名 -> (版本, 工作表名称)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._sheets: Dict[str, Tuple[Version, List[str]]] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_name(self, file_name: str, sheet: Optional[str], version: Version) -> str:
+        digest = hashlib.sha1(json.dumps([file_name, sheet]).encode("utf-8")).hexdigest()[:16]
+        return f"{digest}.{version_token(version)}.json"
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.root, MANIFEST), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get("format") != SNAPSHOT_FORMAT:
+            return {}
+        return manifest
+
+    def restore(self) -> int:
+        """读取 manifest（不加载解析结果），返回快照中的条目数"""
+        manifest = self._read_manifest()
+        entries = manifest.get("entries", {})
+        sheets = {
+            file_name: (tuple(value["version"]), list(value["names"]))
+            for file_name, value in manifest.get("sheets", {}).items()
+        }
+        with self._lock:
+            self._entries = entries
+            self._sheets = sheets
+        return len(entries)
+
+    def table(self, file_name: str, sheet: Optional[str], version: Version) -> Optional[QuoteTable]:
+        """快照中该工作表指定版本的解析结果，没有时返回None（只加载一次，之后由调用方缓存）"""
+        name = self._entry_name(file_name, sheet, version)
+        with self._lock:
+            if self._entries.pop(name, None) is None:
+                return None
+        try:
+            with open(os.path.join(self.root, name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if (data.get("format") != SNAPSHOT_FORMAT or data.get("file") != file_name
+                    or data.get("sheet") != sheet or tuple(data.get("version", ())) != tuple(version)):
+                return None
+            return QuoteTable.from_columns(data["columns"], data.get("total", 0.0))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"读取快照失败 {file_name}: {e}")
+            return None
+
+    def pending(self) -> List[Tuple[str, Optional[str], Version]]:
+        """快照中尚未加载的 (文件名, 工作表, 文件版本)"""
+        with self._lock:
+            return [(e["file"], e["sheet"], tuple(e["version"])) for e in self._entries.values()]
+
+    def sheet_names(self, file_name: str, version: Version) -> Optional[List[str]]:
+        """快照中该文件指定版本的工作表名称，没有时返回None"""
+        with self._lock:
+            cached = self._sheets.get(file_name)
+        if cached is None or cached[0] != tuple(version):
+            return None
+        return list(cached[1])
+
+    def save(self, tables: Iterable[Tuple[str, Optional[str], Version, QuoteTable]],
+             sheets: Dict[str, Tuple[Version, List[str]]],
+             current: Callable[[str], Optional[Version]]) -> Dict[str, int]:
+        """
+        保存快照
+
+        tables 为 (文件名, 工作表, 文件版本, 解析结果)，sheets 为 文件名 -> (文件版本, 工作表名称)，
+        current(文件名) 返回文件的当前版本（不存在时为None）。之前的快照中仍然有效的条目予以保留，
+        文件已修改或删除的条目被移除。返回 {"written": 新写入, "kept": 保留, "removed": 移除} 的条目数。
+        """
+        versions: Dict[str, Optional[Version]] = {}
+
+        def is_current(file_name: str, version) -> bool:
+            if file_name not in versions:
+                versions[file_name] = current(file_name)
+            return versions[file_name] == tuple(version)
+
+        written = 0
+        with self._file_lock:
+            # 以磁盘上最新的 manifest 为基础（可能由其他进程刚刚写入）
+            manifest = self._read_manifest()
+            entries: Dict[str, Dict[str, Any]] = manifest.get("entries", {})
+            sheet_names: Dict[str, Dict[str, Any]] = manifest.get("sheets", {})
+
+            for file_name, sheet, version, table in tables:
+                if not is_current(file_name, version):
+                    continue
+                name = self._entry_name(file_name, sheet, version)
+                if name not in entries or not os.path.exists(os.path.join(self.root, name)):
+                    if not self._write(name, {
+                        "format": SNAPSHOT_FORMAT,
+                        "file": file_name,
+                        "sheet": sheet,
+                        "version": list(version),
+                        "total": table.total,
+                        "columns": table.to_columns(),
+                    }):
+                        continue
+                    written += 1
+                entries[name] = {"file": file_name, "sheet": sheet, "version": list(version)}
+            for file_name, (version, names) in sheets.items():
+                sheet_names[file_name] = {"version": list(version), "names": list(names)}
+
+            entries = {name: e for name, e in entries.items() if is_current(e["file"], e["version"])}
+            sheet_names = {f: s for f, s in sheet_names.items() if is_current(f, s["version"])}
+            self._write(MANIFEST, {
+                "format": SNAPSHOT_FORMAT,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "entries": entries,
+                "sheets": sheet_names,
+            })
+
+            removed = 0
+            for name in os.listdir(self.root):
+                if name != MANIFEST and name not in entries:
+                    try:
+                        os.remove(os.path.join(self.root, name))
+                        removed += 1
+                    except OSError:
+                        pass
+        return {"written": written, "kept": len(entries) - written, "removed": removed}
+
+    def _write(self, name: str, data: Dict[str, Any]) -> bool:
+        # 先写临时文件再替换，中途停止不会留下写了一半的文件
+        path = os.path.join(self.root, name)
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp, path)
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            print(f"保存快照失败 {name}: {e}")
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            return False
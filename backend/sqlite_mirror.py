@@ -0,0 +1,197 @@
+"""
+SQLite 镜像
+
+把所有Excel文件的报价记录同步到一个 SQLite 数据库（data/cache/quotes.sqlite3），
+用于跨文件查询（某材料的历史价格、每个经办人金额最大的项目、超预算的项目等），
+查询无需逐个解析xlsx文件。Excel文件仍是唯一的数据来源，镜像随时可以删除重建。
+
+- 数据库使用 WAL 模式，查询与同步互不阻塞
+- 按文件版本（修改时间、大小）判断是否需要同步；同步时按行哈希比较，只写入变化的行
+- 查询条件使用 filters.py 的格式，编译为参数化 SQL，列名只允许报价表中的已知列
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .filters import COLUMNS, NUMERIC_COLUMNS, Condition
+except ImportError:
+    from filters import COLUMNS, NUMERIC_COLUMNS, Condition
+
+# 查询结果中的文件名和工作表列
+FILE_COLUMN = "文件"
+SHEET_COLUMN = "工作表"
+
+# 表结构版本，与数据库中的 user_version 不一致时重建（镜像可随时重建）
+SCHEMA_VERSION = 2
+
+# 建立索引的列
+INDEXED_COLUMNS = ["内容", "材料", "经办人", "价格"]
+
+_SQL_TYPES = {"序号": "INTEGER", "数量": "REAL", "价格": "REAL", "总价": "REAL"}
+
+
+def _quote(name: str) -> str:
+    """SQL 标识符（列名来自白名单，仍按标识符规则加引号）"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def compile_conditions(conditions: List[Condition]) -> Tuple[str, List[Any]]:
+    """将过滤条件编译为 WHERE 子句和参数，语义与 filters.matches 一致"""
+    clauses = []
+    params: List[Any] = []
+    for column, op, value in conditions:
+        if column not in COLUMNS:
+            raise ValueError(f"不支持的列: {column}")
+        col = _quote(column)
+        if op == "~":
+            # 包含：数值列按其文本形式匹配
+            target = f"CAST({col} AS TEXT)" if column in NUMERIC_COLUMNS else col
+            clauses.append(f"instr({target}, ?) > 0")
+            params.append(str(value))
+        elif op == "!=":
+            # 空值视为不等于任何值
+            clauses.append(f"({col} IS NULL OR {col} != ?)")
+            params.append(value)
+        elif op in ("=", ">", ">=", "<", "<="):
+            clauses.append(f"{col} {op} ?")
+            params.append(value)
+        else:
+            raise ValueError(f"不支持的运算符: {op}")
+    return (" AND ".join(clauses) or "1"), params
+
+
+class QuoteMirror:
+    """报价记录的 SQLite 镜像"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # 写入串行执行
+        self._write_lock = threading.Lock()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程使用独立的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        columns = ", ".join(f"{_quote(c)} {_SQL_TYPES.get(c, 'TEXT')}" for c in COLUMNS)
+        conn = self._connect()
+        with self._write_lock, conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS quotes")
+                conn.execute("DROP TABLE IF EXISTS files")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "name TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+                "records INTEGER, total REAL, synced REAL)"
+            )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS quotes ("
+                f"file TEXT NOT NULL, sheet TEXT NOT NULL, row INTEGER NOT NULL, "
+                f"hash TEXT NOT NULL, {columns}, PRIMARY KEY (file, sheet, row))"
+            )
+            for column in INDEXED_COLUMNS:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_quotes_{column} ON quotes ({_quote(column)})"
+                )
+
+    def versions(self) -> Dict[str, Tuple[int, int]]:
+        """已同步的文件及其版本"""
+        rows = self._connect().execute("SELECT name, mtime_ns, size FROM files").fetchall()
+        return {name: (mtime_ns, size) for name, mtime_ns, size in rows}
+
+    def sync_file(self, file_name: str, version: Tuple[int, int], sheets: Dict[str, Any]) -> Dict[str, int]:
+        """
+        同步一个文件的记录（sheets 为 工作表名称 -> QuoteTable）
+
+        按行号比较行哈希，只写入变化的行，删除多余的行和已不存在的工作表。返回写入和删除的行数。
+        """
+        placeholders = ", ".join("?" for _ in range(len(COLUMNS) + 4))
+        insert = f"INSERT OR REPLACE INTO quotes (file, sheet, row, hash, " \
+                 f"{', '.join(_quote(c) for c in COLUMNS)}) VALUES ({placeholders})"
+        written = deleted = 0
+        conn = self._connect()
+        with self._write_lock, conn:
+            existing = {
+                (sheet, row): h for sheet, row, h in
+                conn.execute("SELECT sheet, row, hash FROM quotes WHERE file = ?", (file_name,))
+            }
+            for sheet, table in sheets.items():
+                hashes = table.row_hashes(COLUMNS)
+                changed = [i for i, h in enumerate(hashes) if existing.get((sheet, i)) != h]
+                if changed:
+                    columns = [table.column(c) for c in COLUMNS]
+                    conn.executemany(insert, (
+                        (file_name, sheet, i, hashes[i], *(col[i] for col in columns)) for i in changed
+                    ))
+                written += len(changed)
+                deleted += conn.execute(
+                    "DELETE FROM quotes WHERE file = ? AND sheet = ? AND row >= ?",
+                    (file_name, sheet, len(hashes)),
+                ).rowcount
+            removed = {sheet for sheet, _ in existing} - set(sheets)
+            for sheet in removed:
+                deleted += conn.execute(
+                    "DELETE FROM quotes WHERE file = ? AND sheet = ?", (file_name, sheet)
+                ).rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO files (name, mtime_ns, size, records, total, synced) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (file_name, version[0], version[1], sum(len(t) for t in sheets.values()),
+                 sum(t.total for t in sheets.values()), time.time()),
+            )
+        return {"written": written, "deleted": deleted}
+
+    def remove_file(self, file_name: str):
+        """删除已不存在的文件"""
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute("DELETE FROM quotes WHERE file = ?", (file_name,))
+            conn.execute("DELETE FROM files WHERE name = ?", (file_name,))
+
+    def query(self, conditions: List[Condition], columns: Optional[List[str]] = None,
+              files: Optional[List[str]] = None, order_by: Optional[str] = None,
+              descending: bool = False, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        """
+        查询记录
+
+        返回 {"rows": [...], "count": 满足条件的总行数}；每行包含"文件"、"工作表"列和选择的列。
+        """
+        columns = list(columns or COLUMNS)
+        for column in columns:
+            if column not in COLUMNS:
+                raise ValueError(f"不支持的列: {column}")
+        where, params = compile_conditions(conditions)
+        if files:
+            where += f" AND file IN ({', '.join('?' for _ in files)})"
+            params.extend(files)
+
+        if order_by is None:
+            order = "file, sheet, row"
+        elif order_by == FILE_COLUMN:
+            order = f"file {'DESC' if descending else 'ASC'}, sheet, row"
+        elif order_by in COLUMNS:
+            order = f"{_quote(order_by)} {'DESC' if descending else 'ASC'}, file, sheet, row"
+        else:
+            raise ValueError(f"不支持的排序列: {order_by}")
+
+        conn = self._connect()
+        select = ", ".join(_quote(c) for c in columns)
+        rows = conn.execute(
+            f"SELECT file, sheet, {select} FROM quotes WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        ).fetchall()
+        count = conn.execute(f"SELECT COUNT(*) FROM quotes WHERE {where}", params).fetchone()[0]
+        names = [FILE_COLUMN, SHEET_COLUMN] + columns
+        return {"rows": [dict(zip(names, row)) for row in rows], "count": count}
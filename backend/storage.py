@@ -0,0 +1,351 @@
+"""
+工作簿存储
+
+ExcelService 通过 Storage 访问报价文件、撤回用的备份、写锁和修改代数，不直接调用 os/shutil：
+
+- LocalStorage：本地目录（默认即数据目录 data/，可用 QUOTE_EXCEL_DIR 指向其他目录，如 data/excel_files）
+- MemoryStorage：所有文件保存在内存中，用于测试和基准测试（不受磁盘IO干扰），也可作为内存盘使用
+
+文件版本统一为 (修改时间纳秒, 文件大小)。source() 返回的读取源可直接交给 zipfile、openpyxl、pandas：
+本地存储为文件路径，内存存储为 BytesIO。写入时先生成本地临时文件，再由 replace() 替换原文件。
+
+解析缓存、布局、历史版本、SQLite镜像和上传暂存等辅助数据不属于工作簿存储，仍位于服务的数据目录。
+"""
+
+import io
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import BinaryIO, ContextManager, Dict, List, Optional, Tuple, Union
+
+try:
+    from . import metrics, tracing
+    from .locks import FileLock, read_generation, bump_generation
+except ImportError:
+    import metrics
+    import tracing
+    from locks import FileLock, read_generation, bump_generation
+
+# 存储类型（环境变量 QUOTE_STORAGE）
+STORAGES = ("local", "memory")
+
+Source = Union[str, BinaryIO]
+Version = Tuple[int, int]
+
+
+def is_workbook_name(name: str) -> bool:
+    """是否为报价文件：.xlsx，排除旧版临时文件和Excel的锁文件（~$开头）"""
+    return name.endswith(".xlsx") and name != "temp.xlsx" and not name.startswith("~$")
+
+
+class Storage:
+    """工作簿存储接口"""
+
+    def list(self) -> List[str]:
+        """所有报价文件名"""
+        raise NotImplementedError
+
+    def stat(self, name: str) -> Version:
+        """文件版本 (修改时间纳秒, 大小)，文件不存在时抛出 FileNotFoundError"""
+        raise NotImplementedError
+
+    def exists(self, name: str) -> bool:
+        try:
+            self.stat(name)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def source(self, name: str) -> Source:
+        """读取源（文件路径或 BytesIO），文件不存在时抛出 FileNotFoundError"""
+        raise NotImplementedError
+
+    def location(self, name: str) -> str:
+        """文件位置的说明（用于显示）"""
+        raise NotImplementedError
+
+    def replace(self, name: str, temp_path: str):
+        """用写好的本地临时文件替换（或创建）文件，临时文件被移走"""
+        raise NotImplementedError
+
+    def write_bytes(self, name: str, data: bytes):
+        """写入整个文件"""
+        raise NotImplementedError
+
+    def backup(self, name: str):
+        """将文件复制为撤回用的备份（覆盖之前的备份）"""
+        raise NotImplementedError
+
+    def backup_stat(self, name: str) -> Optional[Version]:
+        """备份的版本，没有备份时返回None；备份保留原文件的修改时间"""
+        raise NotImplementedError
+
+    def backup_source(self, name: str) -> Source:
+        """备份的读取源，没有备份时抛出 FileNotFoundError"""
+        raise NotImplementedError
+
+    def restore(self, name: str) -> bool:
+        """用备份替换文件（备份随之移除），没有备份时返回False"""
+        raise NotImplementedError
+
+    def lock(self, name: str) -> ContextManager:
+        """文件的写锁（可重入）"""
+        raise NotImplementedError
+
+    def generation(self, name: str) -> int:
+        """文件的修改代数，其他进程修改文件后会变化"""
+        raise NotImplementedError
+
+    def bump_generation(self, name: str) -> int:
+        """修改代数加一并返回新值（调用方持有文件的写锁）"""
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    """本地目录中的工作簿；写锁和修改代数使用锁目录中的文件，多个进程可以共享"""
+
+    def __init__(self, root: str, backup_dir: str, lock_dir: str,
+                 max_retries: int = 3, retry_delay: float = 0.5):
+        self.root = root
+        self.backup_dir = backup_dir
+        self.lock_dir = lock_dir
+        # 文件被其他程序（如Excel）占用时的重试次数和间隔
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        for directory in (root, backup_dir, lock_dir):
+            os.makedirs(directory, exist_ok=True)
+        self._locks: Dict[str, FileLock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _backup_path(self, name: str) -> str:
+        # 备份放到备份目录，保留原始文件名并添加 .bak 后缀
+        return os.path.join(self.backup_dir, f"{name}.bak")
+
+    def list(self) -> List[str]:
+        try:
+            return [f for f in os.listdir(self.root) if is_workbook_name(f)]
+        except FileNotFoundError:
+            return []
+
+    def stat(self, name: str) -> Version:
+        stat = os.stat(self._path(name))
+        return stat.st_mtime_ns, stat.st_size
+
+    def source(self, name: str) -> Source:
+        path = self._path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"文件不存在: {name}")
+        return path
+
+    def location(self, name: str) -> str:
+        return self._path(name)
+
+    def _wait_for_file_unlock(self, file_path: str) -> bool:
+        """等待文件解锁"""
+        with metrics.LOCK_WAIT_SECONDS.time(), tracing.span("lock_wait"):
+            for _ in range(self.max_retries):
+                try:
+                    # 尝试以只读模式打开文件，检查是否被锁定
+                    with open(file_path, 'rb'):
+                        pass
+                    return True
+                except (PermissionError, IOError):
+                    time.sleep(self.retry_delay)
+            return False
+
+    def _move(self, src: str, path: str):
+        """
+        用 src 原子替换 path（os.replace），其他进程不会看到文件不存在的中间状态
+
+        Windows 上其他进程正在读取文件时不能替换，稍后重试；仍然失败时抛出异常，原文件保持不变。
+        """
+        for attempt in range(self.max_retries):
+            try:
+                os.replace(src, path)
+                return
+            except PermissionError:
+                if os.name != "nt" or attempt == self.max_retries - 1:
+                    raise
+                with metrics.LOCK_WAIT_SECONDS.time(), tracing.span("lock_wait"):
+                    time.sleep(self.retry_delay)
+
+    def replace(self, name: str, temp_path: str):
+        try:
+            self._move(temp_path, self._path(name))
+        except OSError as e:
+            print(f"替换文件失败 {name}: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def write_bytes(self, name: str, data: bytes):
+        temp_path = f"{self._path(name)}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        self.replace(name, temp_path)
+
+    def backup(self, name: str):
+        path = self._path(name)
+        if not os.path.exists(path):
+            return
+        if not self._wait_for_file_unlock(path):
+            raise RuntimeError(f"文件 {name} 被占用，无法访问")
+        try:
+            shutil.copy2(path, self._backup_path(name))
+        except Exception as e:
+            print(f"备份文件失败: {e}")
+
+    def backup_stat(self, name: str) -> Optional[Version]:
+        try:
+            stat = os.stat(self._backup_path(name))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def backup_source(self, name: str) -> Source:
+        path = self._backup_path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"文件没有可撤回的备份: {name}")
+        return path
+
+    def restore(self, name: str) -> bool:
+        backup_path = self._backup_path(name)
+        if not os.path.exists(backup_path):
+            return False
+        self._move(backup_path, self._path(name))
+        return True
+
+    def lock(self, name: str) -> FileLock:
+        # 同一进程中同一个锁文件只对应一个 FileLock 对象
+        with self._locks_lock:
+            lock = self._locks.get(name)
+            if lock is None:
+                lock = self._locks[name] = FileLock(os.path.join(self.lock_dir, f"{name}.lock"))
+            return lock
+
+    def _generation_path(self, name: str) -> str:
+        return os.path.join(self.lock_dir, f"{name}.gen")
+
+    def generation(self, name: str) -> int:
+        return read_generation(self._generation_path(name))
+
+    def bump_generation(self, name: str) -> int:
+        return bump_generation(self._generation_path(name))
+
+
+class MemoryStorage(Storage):
+    """内存中的工作簿（只在单个进程内共享）"""
+
+    def __init__(self):
+        # 文件名 -> (内容, 修改时间纳秒)
+        self._files: Dict[str, Tuple[bytes, int]] = {}
+        self._backups: Dict[str, Tuple[bytes, int]] = {}
+        self._generations: Dict[str, int] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+        self._last_mtime = 0
+
+    def load_directory(self, directory: str) -> int:
+        """载入目录中的所有报价文件，返回文件数"""
+        names = [f for f in os.listdir(directory) if is_workbook_name(f)]
+        for name in names:
+            with open(os.path.join(directory, name), "rb") as f:
+                self.write_bytes(name, f.read())
+        return len(names)
+
+    def _now(self) -> int:
+        """修改时间：严格递增，连续两次写入的版本也不相同"""
+        mtime = max(time.time_ns(), self._last_mtime + 1)
+        self._last_mtime = mtime
+        return mtime
+
+    def _get(self, name: str) -> Tuple[bytes, int]:
+        with self._lock:
+            entry = self._files.get(name)
+        if entry is None:
+            raise FileNotFoundError(f"文件不存在: {name}")
+        return entry
+
+    def list(self) -> List[str]:
+        with self._lock:
+            return [name for name in self._files if is_workbook_name(name)]
+
+    def stat(self, name: str) -> Version:
+        data, mtime = self._get(name)
+        return mtime, len(data)
+
+    def source(self, name: str) -> Source:
+        return io.BytesIO(self._get(name)[0])
+
+    def location(self, name: str) -> str:
+        return f"memory:{name}"
+
+    def replace(self, name: str, temp_path: str):
+        with open(temp_path, "rb") as f:
+            data = f.read()
+        self.write_bytes(name, data)
+        os.remove(temp_path)
+
+    def write_bytes(self, name: str, data: bytes):
+        with self._lock:
+            self._files[name] = (bytes(data), self._now())
+
+    def backup(self, name: str):
+        with self._lock:
+            if name in self._files:
+                self._backups[name] = self._files[name]
+
+    def backup_stat(self, name: str) -> Optional[Version]:
+        with self._lock:
+            entry = self._backups.get(name)
+        return (entry[1], len(entry[0])) if entry is not None else None
+
+    def backup_source(self, name: str) -> Source:
+        with self._lock:
+            entry = self._backups.get(name)
+        if entry is None:
+            raise FileNotFoundError(f"文件没有可撤回的备份: {name}")
+        return io.BytesIO(entry[0])
+
+    def restore(self, name: str) -> bool:
+        with self._lock:
+            entry = self._backups.pop(name, None)
+            if entry is None:
+                return False
+            self._files[name] = entry
+            return True
+
+    def lock(self, name: str) -> ContextManager:
+        with self._lock:
+            lock = self._locks.get(name)
+            if lock is None:
+                lock = self._locks[name] = threading.RLock()
+            return lock
+
+    def generation(self, name: str) -> int:
+        with self._lock:
+            return self._generations.get(name, 0)
+
+    def bump_generation(self, name: str) -> int:
+        with self._lock:
+            generation = self._generations[name] = self._generations.get(name, 0) + 1
+            return generation
+
+
+def create_storage(kind: str, root: str, backup_dir: str, lock_dir: str) -> Storage:
+    """按类型创建存储；内存存储启动时载入 root 中已有的文件"""
+    if kind == "local":
+        return LocalStorage(root, backup_dir, lock_dir)
+    if kind == "memory":
+        storage = MemoryStorage()
+        if os.path.isdir(root):
+            storage.load_directory(root)
+        return storage
+    raise ValueError(f"不支持的存储类型: {kind}")
@@ -0,0 +1,98 @@
+"""
+请求阶段追踪
+
+每个HTTP请求创建一个 Trace，处理过程中的各阶段（解析、清洗、验证、序列化等）
+记录为 span，响应时通过 Server-Timing 头返回；超过阈值的慢请求打印完整的阶段明细。
+
+追踪对象保存在 contextvar 中，不在请求上下文中（如后台任务）时记录操作为空操作。
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+# 慢请求阈值（毫秒），通过环境变量 QUOTE_SLOW_REQUEST_MS 配置，0 表示不记录
+SLOW_REQUEST_MS = float(os.environ.get("QUOTE_SLOW_REQUEST_MS", "2000"))
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("quote_trace", default=None)
+
+
+class Trace:
+    """一次请求的阶段记录"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        # (阶段名, 相对请求开始的偏移, 耗时)，单位秒
+        self.spans: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float):
+        with self._lock:
+            self.spans.append((name, start - self.start, duration))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """生成 Server-Timing 头：同名阶段耗时合并"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for name, _, duration in self.spans:
+                totals[name] = totals.get(name, 0.0) + duration
+        parts = [f"{name};dur={duration * 1000:.1f}" for name, duration in totals.items()]
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """按开始时间排列的阶段明细（毫秒）"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s[1])
+        return [
+            {"stage": name, "offset_ms": round(offset * 1000, 1), "duration_ms": round(duration * 1000, 1)}
+            for name, offset, duration in spans
+        ]
+
+
+def start_trace(name: str):
+    """开始追踪，返回 (trace, token)，结束时调用 end_trace(token)"""
+    trace = Trace(name)
+    return trace, _current.set(trace)
+
+
+def end_trace(token):
+    """结束追踪"""
+    _current.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    """当前请求的追踪对象"""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """记录一个阶段：with span("parse"): ..."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter() - start)
+
+
+def log_if_slow(trace: Trace, total: float, status: int):
+    """超过阈值时打印请求的阶段明细"""
+    if SLOW_REQUEST_MS <= 0 or total * 1000 < SLOW_REQUEST_MS:
+        return
+    stages = ", ".join(
+        f"{s['stage']}@{s['offset_ms']}ms={s['duration_ms']}ms" for s in trace.breakdown()
+    )
+    print(f"慢请求 {trace.name} -> {status} 耗时 {total * 1000:.1f}ms [{stages or '无阶段记录'}]")
@@ -0,0 +1,171 @@
+"""
+文件版本令牌与历史版本
+
+版本令牌由文件的修改时间（纳秒）和大小生成：/read 在 ETag 和 version 字段中返回，
+/save 通过 If-Match 提交客户端读取时的版本。每次保存、撤回、覆盖导入前，被替换的文件以硬链接
+（不支持时复制）保存到 backups/versions/{文件名}/{令牌}.xlsx，版本不一致时作为三方合并的基础版本。
+每个文件只保留最近的若干个版本。
+
+历史版本的解析结果可以保存为旁路文件（{令牌}.rows.json，按列存储），
+比较版本差异时直接读取，不需要再次解析xlsx。版本内容不会改变，旁路文件不会过期。
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+
+# 每个文件保留的历史版本数
+HISTORY_KEEP = 20
+
+_TOKEN = re.compile(r"^[0-9a-f]+-[0-9a-f]+$")
+
+
+class VersionMismatch(Exception):
+    """客户端提交的版本不是当前版本，且找不到对应的历史版本"""
+
+
+def version_token(version: Tuple[int, int]) -> str:
+    """(修改时间纳秒, 文件大小) -> 版本令牌"""
+    return f"{version[0]:x}-{version[1]:x}"
+
+
+def parse_etag(header: Optional[str]) -> Optional[str]:
+    """解析 If-Match / If-None-Match 请求头（只取第一个值），去掉 W/ 前缀和引号"""
+    if header is None:
+        return None
+    value = header.split(",")[0].strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    return value.strip('"') or None
+
+
+def format_etag(token: str) -> str:
+    return f'"{token}"'
+
+
+class VersionHistory:
+    """被替换的文件版本"""
+
+    def __init__(self, root: str, keep: int = HISTORY_KEEP):
+        self.root = root
+        self.keep = keep
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, file_name: str) -> str:
+        return os.path.join(self.root, file_name)
+
+    def path(self, file_name: str, token: str) -> Optional[str]:
+        """历史版本的路径，不存在时返回None"""
+        if not _TOKEN.match(token):
+            return None
+        path = os.path.join(self._dir(file_name), f"{token}.xlsx")
+        return path if os.path.exists(path) else None
+
+    def versions(self, file_name: str) -> List[Dict[str, Any]]:
+        """已保存的历史版本，最新的在前"""
+        try:
+            names = os.listdir(self._dir(file_name))
+        except FileNotFoundError:
+            return []
+        result = []
+        for name in names:
+            token = name[:-len(".xlsx")]
+            if not name.endswith(".xlsx") or not _TOKEN.match(token):
+                continue
+            try:
+                stat = os.stat(os.path.join(self._dir(file_name), name))
+            except OSError:
+                continue
+            result.append({
+                "version": token,
+                "modified": datetime.fromtimestamp(stat.st_mtime),
+                "size": stat.st_size,
+            })
+        result.sort(key=lambda v: v["modified"], reverse=True)
+        return result
+
+    def _rows_path(self, file_name: str, token: str, sheet: Optional[str]) -> str:
+        suffix = "" if sheet is None else "@" + hashlib.sha1(sheet.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self._dir(file_name), f"{token}{suffix}.rows.json")
+
+    def load_rows(self, file_name: str, token: str, sheet: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """读取版本的解析结果旁路文件：{"columns": {列名: 值列表}, "total": 合计}，不存在时返回None"""
+        if not _TOKEN.match(token):
+            return None
+        try:
+            with open(self._rows_path(file_name, token, sheet), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_rows(self, file_name: str, token: str, sheet: Optional[str], data: Dict[str, Any]):
+        """保存版本的解析结果旁路文件（只为已保存的历史版本保存）"""
+        if self.path(file_name, token) is None:
+            return
+        path = self._rows_path(file_name, token, sheet)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp, path)
+        except OSError as e:
+            print(f"保存版本旁路文件失败 {file_name}: {e}")
+
+    def archive(self, source: Union[str, BinaryIO], file_name: str, version: Tuple[int, int]) -> Optional[str]:
+        """
+        保存文件的当前版本（文件即将被替换），返回其版本令牌
+
+        source 为文件路径（本地存储）或可读的二进制流（内存存储），version 为其 (修改时间纳秒, 大小)。
+        """
+        token = version_token(version)
+        directory = self._dir(file_name)
+        target = os.path.join(directory, f"{token}.xlsx")
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            if not os.path.exists(target):
+                try:
+                    if isinstance(source, str):
+                        self._link(source, target)
+                    else:
+                        with open(target, "wb") as f:
+                            shutil.copyfileobj(source, f)
+                        # 与本地文件一致，历史版本的修改时间即其版本
+                        os.utime(target, ns=(version[0], version[0]))
+                except OSError as e:
+                    print(f"保存历史版本失败 {file_name}: {e}")
+                    return None
+            self._prune(directory)
+        return token
+
+    def _link(self, path: str, target: str):
+        try:
+            # 原文件随后被删除或重命名覆盖，硬链接保留旧内容且不需要复制
+            os.link(path, target)
+        except OSError:
+            shutil.copy2(path, target)
+
+    def _prune(self, directory: str):
+        """只保留最近的 keep 个版本（连同其旁路文件）"""
+        entries = []
+        names = os.listdir(directory)
+        for name in names:
+            if not name.endswith(".xlsx"):
+                continue
+            try:
+                entries.append((os.stat(os.path.join(directory, name)).st_mtime_ns, name[:-len(".xlsx")]))
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+        for _, token in entries[self.keep:]:
+            for name in names:
+                if name == f"{token}.xlsx" or (name.startswith((f"{token}.", f"{token}@")) and name.endswith(".rows.json")):
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
@@ -0,0 +1,282 @@
+"""
+轻量xlsx读取器
+
+不依赖 pandas / openpyxl，直接从 zip 中流式读取 sharedStrings.xml 和工作表 XML（iterparse），
+逐行产出单元格的字符串值。值的转换规则与 pandas.read_excel(dtype=str) 保持一致：
+整数值的数字不带小数点、布尔值为 True/False、错误值视为空、日期格式的数字转为日期时间字符串。
+
+遇到不支持的文件（如 Strict OOXML、缺少工作簿结构）时抛出 UnsupportedWorkbook，
+调用方应回退到 pandas 读取。
+"""
+
+import posixpath
+import re
+import zipfile
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from xml.etree.ElementTree import iterparse, ParseError
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# 内置的日期/时间数字格式编号
+_BUILTIN_DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+# 去掉引号内文字、方括号（颜色/条件）和转义字符后，仍包含这些字母则视为日期格式
+_DATE_TOKENS = re.compile(r"[ymdhs]", re.IGNORECASE)
+_FORMAT_NOISE = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.|_.|\*.')
+
+
+class UnsupportedWorkbook(Exception):
+    """轻量读取器不支持的文件"""
+
+
+def _is_date_format(code: str) -> bool:
+    return bool(_DATE_TOKENS.search(_FORMAT_NOISE.sub("", code)))
+
+
+def _column_index(ref: str) -> int:
+    """单元格引用的列号（从0开始），如 C5 -> 2"""
+    index = 0
+    for ch in ref:
+        if "A" <= ch <= "Z":
+            index = index * 26 + (ord(ch) - 64)
+        else:
+            break
+    return index - 1
+
+
+class XlsxReader:
+    """xlsx文件读取器，使用后需调用 close() 或用 with 语句"""
+
+    def __init__(self, path):
+        try:
+            self._zip = zipfile.ZipFile(path)
+        except zipfile.BadZipFile as e:
+            raise UnsupportedWorkbook(f"不是有效的xlsx文件: {e}")
+        names = set(self._zip.namelist())
+        if "xl/workbook.xml" not in names:
+            raise UnsupportedWorkbook("缺少 xl/workbook.xml")
+        self._names = names
+        self._date1904 = False
+        self._sheets = self._read_workbook()
+        self._shared: Optional[List[str]] = None
+        self._date_styles: Optional[Set[int]] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    def _parse(self, name: str, events=("end",)):
+        try:
+            return iterparse(self._zip.open(name), events=events)
+        except KeyError:
+            raise UnsupportedWorkbook(f"缺少 {name}")
+
+    def _read_workbook(self) -> List[Tuple[str, str]]:
+        """读取工作表名称和对应的 XML 路径（按工作簿中的顺序）"""
+        targets: Dict[str, str] = {}
+        rels = "xl/_rels/workbook.xml.rels"
+        if rels in self._names:
+            for _, el in self._parse(rels):
+                if el.tag == f"{NS_PKG_REL}Relationship":
+                    target = el.get("Target", "")
+                    if target.startswith("/"):
+                        target = target[1:]
+                    else:
+                        target = posixpath.normpath(posixpath.join("xl", target))
+                    targets[el.get("Id")] = target
+
+        sheets = []
+        try:
+            for _, el in self._parse("xl/workbook.xml"):
+                if el.tag == f"{NS_MAIN}workbookPr":
+                    self._date1904 = el.get("date1904") in ("1", "true")
+                elif el.tag == f"{NS_MAIN}sheet":
+                    target = targets.get(el.get(f"{NS_REL}id"))
+                    if target is None or target not in self._names:
+                        raise UnsupportedWorkbook(f"找不到工作表: {el.get('name')}")
+                    sheets.append((el.get("name"), target))
+        except ParseError as e:
+            raise UnsupportedWorkbook(f"workbook.xml 格式错误: {e}")
+        if not sheets:
+            # 例如 Strict OOXML 使用不同的命名空间
+            raise UnsupportedWorkbook("没有找到工作表")
+        return sheets
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return [name for name, _ in self._sheets]
+
+    def sheet_path(self, sheet: Optional[str] = None) -> str:
+        """工作表在 zip 中的路径，默认第一个工作表；不存在时抛出 KeyError"""
+        if sheet is None:
+            return self._sheets[0][1]
+        target = dict(self._sheets).get(sheet)
+        if target is None:
+            raise KeyError(f"工作表不存在: {sheet}")
+        return target
+
+    def _shared_strings(self) -> List[str]:
+        """读取共享字符串表（富文本拼接各段文字，忽略注音）"""
+        if self._shared is not None:
+            return self._shared
+        shared = []
+        name = "xl/sharedStrings.xml"
+        if name in self._names:
+            si_tag, t_tag, rph_tag = f"{NS_MAIN}si", f"{NS_MAIN}t", f"{NS_MAIN}rPh"
+            root = None
+            for event, el in self._parse(name, ("start", "end")):
+                if root is None:
+                    root = el
+                if event != "end":
+                    continue
+                if el.tag == si_tag:
+                    parts = []
+                    for child in el:
+                        if child.tag == t_tag:
+                            parts.append(child.text or "")
+                        elif child.tag != rph_tag:
+                            parts.extend(t.text or "" for t in child.iter(t_tag))
+                    shared.append("".join(parts))
+                    # 清空根节点，已处理的元素不再保留在树中
+                    root.clear()
+        self._shared = shared
+        return shared
+
+    def _date_style_ids(self) -> Set[int]:
+        """日期格式的单元格样式编号"""
+        if self._date_styles is not None:
+            return self._date_styles
+        custom: Dict[int, str] = {}
+        xf_formats: List[int] = []
+        name = "xl/styles.xml"
+        if name in self._names:
+            in_cell_xfs = False
+            for event, el in iterparse(self._zip.open(name), events=("start", "end")):
+                if el.tag == f"{NS_MAIN}numFmt" and event == "end":
+                    custom[int(el.get("numFmtId", "0"))] = el.get("formatCode", "")
+                elif el.tag == f"{NS_MAIN}cellXfs":
+                    in_cell_xfs = event == "start"
+                elif el.tag == f"{NS_MAIN}xf" and event == "end" and in_cell_xfs:
+                    xf_formats.append(int(el.get("numFmtId", "0")))
+        self._date_styles = {
+            i for i, fmt_id in enumerate(xf_formats)
+            if fmt_id in _BUILTIN_DATE_FORMATS or (fmt_id in custom and _is_date_format(custom[fmt_id]))
+        }
+        return self._date_styles
+
+    def _to_datetime(self, value: str) -> str:
+        serial = float(value)
+        epoch = datetime(1904, 1, 1) if self._date1904 else datetime(1899, 12, 30)
+        moment = epoch + timedelta(days=serial)
+        if 0 <= serial < 1 and not self._date1904:
+            return str(moment.time())
+        return str(moment)
+
+    def iter_rows(self, sheet: Optional[str] = None) -> Iterator[Tuple[int, List[Optional[str]]]]:
+        """
+        逐行产出 (行号, 值列表)，行号从1开始，空单元格为None
+
+        - sheet: 工作表名称，默认第一个工作表
+        """
+        target = self.sheet_path(sheet)
+        shared = self._shared_strings()
+        date_styles = self._date_style_ids()
+        row_tag, c_tag = f"{NS_MAIN}row", f"{NS_MAIN}c"
+        v_tag, is_tag, t_tag = f"{NS_MAIN}v", f"{NS_MAIN}is", f"{NS_MAIN}t"
+
+        sheet_data_tag = f"{NS_MAIN}sheetData"
+        sheet_data = None
+        row_number = 0
+        try:
+            for event, el in self._parse(target, ("start", "end")):
+                if event == "start":
+                    if el.tag == sheet_data_tag:
+                        sheet_data = el
+                    continue
+                if el.tag != row_tag:
+                    continue
+                row_number = int(el.get("r") or row_number + 1)
+                values: List[Optional[str]] = []
+                for c in el.iter(c_tag):
+                    ref = c.get("r")
+                    index = _column_index(ref) if ref else len(values)
+                    if index > len(values):
+                        values.extend([None] * (index - len(values)))
+                    values.append(self._cell_value(c, shared, date_styles, v_tag, is_tag, t_tag))
+                # 清空已处理的行，内存占用与行数无关
+                if sheet_data is not None:
+                    sheet_data.clear()
+                else:
+                    el.clear()
+                yield row_number, values
+        except ParseError as e:
+            raise UnsupportedWorkbook(f"工作表格式错误: {e}")
+
+    def _cell_value(self, c, shared, date_styles, v_tag, is_tag, t_tag) -> Optional[str]:
+        """单元格的字符串值"""
+        cell_type = c.get("t", "n")
+        if cell_type == "inlineStr":
+            node = c.find(is_tag)
+            return "".join(t.text or "" for t in node.iter(t_tag)) if node is not None else None
+        v = c.find(v_tag)
+        if v is None or v.text is None:
+            return None
+        text = v.text
+        if cell_type == "s":
+            return shared[int(text)]
+        if cell_type == "n":
+            style = c.get("s")
+            if style is not None and int(style) in date_styles:
+                return self._to_datetime(text)
+            # 与 openpyxl + pandas 一致：无小数点和指数的按整数处理，整数值的浮点数去掉小数部分
+            if "." in text or "E" in text or "e" in text:
+                number = float(text)
+                return str(int(number)) if number.is_integer() else str(number)
+            return str(int(text))
+        if cell_type == "b":
+            return "True" if text == "1" else "False"
+        if cell_type == "e":
+            return None
+        # str（公式字符串）、d（ISO日期）等
+        return text
+
+
+def iter_records(path, sheet: Optional[str] = None) -> Iterator[Dict[str, Optional[str]]]:
+    """
+    逐行产出以表头为键的字典（表头为第一行）
+
+    列名规则与 pandas 一致：空表头为 "Unnamed: 序号"，重复列名追加 ".1"、".2"。
+    """
+    with XlsxReader(path) as reader:
+        rows = reader.iter_rows(sheet)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = column_names(header[1])
+        width = len(columns)
+        for _, values in rows:
+            if len(values) < width:
+                values = values + [None] * (width - len(values))
+            yield dict(zip(columns, values))
+
+
+def column_names(header: List[Optional[str]]) -> List[str]:
+    """生成列名：空表头和重复列名的处理方式与 pandas 一致"""
+    columns = []
+    seen: Dict[str, int] = {}
+    for i, value in enumerate(header):
+        name = value if value is not None else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
@@ -0,0 +1,301 @@
+"""
+xlsx工作表写入
+
+- replace_sheet：在不加载整个工作簿的情况下替换其中一个工作表的数据：复制 zip 中的其他所有部件
+  （其他工作表、样式、图片、共享字符串等），只重新生成目标工作表 XML 中的 <sheetData>；
+  可以只替换其中一段行（如数据行），之前的行（标题、表头）原样保留，之后的行（合计等）顺移到新数据之后
+- write_workbook：生成只有一个工作表的新工作簿，逐行写入
+
+- 新写入的文本使用内联字符串（inlineStr），不需要改写其他工作表共用的 sharedStrings.xml
+- 保留目标工作表的列宽、视图、页面设置、图片引用等，删除不再对应的 <dimension> 和被替换行中的 <mergeCell>
+  （顺移的行中公式的引用不调整，打开时按原公式重新计算）
+- 目标工作表含有按行列范围引用数据的部件（表格、条件格式、数据验证、筛选，或引用该工作表的定义名称）时
+  抛出 UnsupportedWorkbook，由调用方回退到 openpyxl
+- 删除计算链 calcChain.xml 并设置打开时重新计算，避免引用被改写单元格的公式使用旧的缓存值
+- 行数据流式写入 zip，不在内存中生成整个工作表
+"""
+
+import re
+import zipfile
+from typing import Any, Iterable, List, Optional, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    from .xlsx_reader import UnsupportedWorkbook, XlsxReader
+except ImportError:
+    from xlsx_reader import UnsupportedWorkbook, XlsxReader
+
+# XML 1.0 不允许的控制字符
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_SHEET_DATA = re.compile(rb"<((?:\w+:)?)sheetData\b[^>]*?(/?)>")
+_DIMENSION = re.compile(rb"<(?:\w+:)?dimension\b[^>]*/>")
+_MERGE_CELLS = re.compile(rb"<((?:\w+:)?)mergeCells\b.*?</\1mergeCells>", re.S)
+_MERGE_CELL = re.compile(rb"<(?:\w+:)?mergeCell\b[^>]*?\bref=\"([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?\"[^>]*/>")
+# sheetData 中的一行（属性值中可能含有 /，按引号匹配）
+_ROW = re.compile(rb'<((?:\w+:)?)row\b((?:[^>"/]|"[^"]*")*)(?:/>|>.*?</\1row>)', re.S)
+_ROW_START = re.compile(rb"<(?:\w+:)?row\b")
+_ROW_NUMBER = re.compile(rb'(\br=")(\d+)(")')
+_CELL_REF = re.compile(rb'(<(?:\w+:)?c\b[^>]*?\br="[A-Z]+)(\d+)(")')
+# 引用原数据行列范围的部件，替换数据后会指向错误的范围
+_RANGE_PARTS = re.compile(rb"<(?:\w+:)?(tableParts|conditionalFormatting|dataValidations|autoFilter)\b")
+_DEFINED_NAME = re.compile(rb"<(?:\w+:)?definedName\b([^>]*)>(.*?)</(?:\w+:)?definedName>", re.S)
+_LOCAL_SHEET_ID = re.compile(rb"\blocalSheetId=\"(\d+)\"")
+_CALC_CHAIN_OVERRIDE = re.compile(rb"<Override\b[^>]*PartName=\"/xl/calcChain\.xml\"[^>]*/>")
+_CALC_CHAIN_REL = re.compile(rb"<Relationship\b[^>]*Target=\"[^\"]*calcChain\.xml\"[^>]*/>")
+_CALC_PR = re.compile(rb"<((?:\w+:)?)calcPr\b")
+
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_CT = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+
+# 新工作簿的固定部件
+_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        f'<Override PartName="/xl/workbook.xml" ContentType="{_CT}.sheet.main+xml"/>'
+        f'<Override PartName="/xl/worksheets/sheet1.xml" ContentType="{_CT}.worksheet+xml"/>'
+        f'<Override PartName="/xl/styles.xml" ContentType="{_CT}.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        f'<Relationships xmlns="{_NS_PKG_REL}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        f'<Relationships xmlns="{_NS_PKG_REL}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_NS_REL}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/styles.xml": (
+        f'<styleSheet xmlns="{_NS_MAIN}">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+
+def column_letter(index: int) -> str:
+    """列号（从0开始）转为列字母，如 0 -> A、27 -> AB"""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def cell_xml(ref: str, value: Any, prefix: str = "") -> str:
+    """单个单元格的 XML，空值返回空字符串"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<{prefix}c r="{ref}" t="b"><{prefix}v>{int(value)}</{prefix}v></{prefix}c>'
+    if isinstance(value, (int, float)):
+        if value != value or value in (float("inf"), float("-inf")):
+            return ""
+        return f'<{prefix}c r="{ref}"><{prefix}v>{value!r}</{prefix}v></{prefix}c>'
+    text = escape(_ILLEGAL_XML.sub("", str(value)))
+    return (f'<{prefix}c r="{ref}" t="inlineStr"><{prefix}is>'
+            f'<{prefix}t xml:space="preserve">{text}</{prefix}t></{prefix}is></{prefix}c>')
+
+
+def row_xml(row_number: int, values: Sequence[Any], letters: List[str], prefix: str = "") -> str:
+    """一行的 XML"""
+    cells = "".join(cell_xml(f"{letters[i]}{row_number}", v, prefix) for i, v in enumerate(values))
+    return f'<{prefix}row r="{row_number}">{cells}</{prefix}row>'
+
+
+def replace_sheet(src: str, dst: str, sheet: Optional[str], columns: Sequence[str],
+                  rows: Iterable[Sequence[Any]], first_row: int = 1, last_row: Optional[int] = None,
+                  header: bool = True) -> int:
+    """
+    复制工作簿 src 到 dst，并将工作表 sheet（默认第一个）的数据替换为表头 columns 和各行 rows
+
+    默认替换整个工作表。指定 first_row、last_row 时只替换这一段行（last_row 为None时到最后一行），
+    新内容从 first_row 开始写入；header 为False时不写表头（columns 只决定列数）。
+    返回写入的数据行数。
+    """
+    with XlsxReader(src) as reader:
+        target = reader.sheet_path(sheet)
+        sheet_name = sheet if sheet is not None else reader.sheet_names[0]
+        sheet_index = reader.sheet_names.index(sheet_name)
+
+    letters = [column_letter(i) for i in range(len(columns))]
+    count = 0
+    with zipfile.ZipFile(src) as zin:
+        # 先检查是否支持，再打开 dst 和读取 rows：抛出 UnsupportedWorkbook 时 rows 还没有被消耗，
+        # 调用方可以用同一个 rows 回退到 openpyxl
+        _check_defined_names(zin.read("xl/workbook.xml"), sheet_name, sheet_index)
+        before, body, after, prefix = _split_sheet(zin.read(target))
+        if first_row == 1 and last_row is None:
+            kept, moved = b"", []
+        else:
+            kept, moved = _split_rows(body, first_row, last_row)
+        with zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                name = info.filename
+                if name == "xl/calcChain.xml":
+                    continue
+                if name == target:
+                    row_number = first_row
+                    with zout.open(_new_info(info), "w") as f:
+                        f.write(before + kept)
+                        if header:
+                            f.write(row_xml(row_number, columns, letters, prefix).encode("utf-8"))
+                            row_number += 1
+                        for values in rows:
+                            count += 1
+                            f.write(row_xml(row_number, values, letters, prefix).encode("utf-8"))
+                            row_number += 1
+                        # 之后的行顺移到新内容之后
+                        shift = row_number - (last_row + 1) if last_row is not None else 0
+                        f.write(b"".join(_shift_row(row, shift) for row in moved))
+                        f.write(b"</" + prefix.encode("ascii") + b"sheetData>")
+                        f.write(_keep_merges(after, first_row, last_row, shift))
+                    continue
+                data = zin.read(name)
+                if name == "[Content_Types].xml":
+                    data = _CALC_CHAIN_OVERRIDE.sub(b"", data)
+                elif name == "xl/_rels/workbook.xml.rels":
+                    data = _CALC_CHAIN_REL.sub(b"", data)
+                elif name == "xl/workbook.xml" and b"fullCalcOnLoad" not in data:
+                    data = _CALC_PR.sub(lambda m: m.group(0) + b' fullCalcOnLoad="1"', data, count=1)
+                zout.writestr(_new_info(info), data)
+    return count
+
+
+def write_workbook(dst: str, sheet: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """
+    生成只有一个工作表 sheet 的新工作簿 dst，第一行为表头 columns，其后为各行 rows
+
+    返回写入的数据行数。
+    """
+    letters = [column_letter(i) for i in range(len(columns))]
+    count = 0
+    with zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zout:
+        for name, xml in _STATIC_PARTS.items():
+            zout.writestr(name, _XML_DECL + xml)
+        zout.writestr("xl/workbook.xml", (
+            f'{_XML_DECL}<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}"><sheets>'
+            f'<sheet name={quoteattr(sheet)} sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        with zout.open("xl/worksheets/sheet1.xml", "w") as f:
+            f.write(f'{_XML_DECL}<worksheet xmlns="{_NS_MAIN}"><sheetData>'.encode("utf-8"))
+            if columns:
+                f.write(row_xml(1, columns, letters).encode("utf-8"))
+            for values in rows:
+                count += 1
+                f.write(row_xml(count + 1, values, letters).encode("utf-8"))
+            f.write(b"</sheetData></worksheet>")
+    return count
+
+
+def _new_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    """复制部件名称和时间，使用压缩存储"""
+    new = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    new.compress_type = zipfile.ZIP_DEFLATED
+    new.external_attr = info.external_attr
+    return new
+
+
+def _split_sheet(xml: bytes):
+    """
+    将工作表 XML 拆成 <sheetData> 之前（含开始标签）、其中的行、之后（不含结束标签）三部分
+
+    返回 (之前, 行, 之后, 命名空间前缀)，之前的部分已删除 <dimension>。
+    """
+    match = _SHEET_DATA.search(xml)
+    if match is None:
+        raise UnsupportedWorkbook("工作表缺少 sheetData")
+    prefix = match.group(1)
+    tag = b"<" + prefix + b"sheetData>"
+    if match.group(2):
+        # <sheetData/>：没有数据行
+        body = b""
+        rest = xml[match.end():]
+    else:
+        end_tag = b"</" + prefix + b"sheetData>"
+        end = xml.find(end_tag, match.end())
+        if end < 0:
+            raise UnsupportedWorkbook("工作表 sheetData 未结束")
+        body = xml[match.end():end]
+        rest = xml[end + len(end_tag):]
+    part = _RANGE_PARTS.search(rest)
+    if part is not None:
+        raise UnsupportedWorkbook(f"工作表含有 {part.group(1).decode('ascii')}")
+    return _DIMENSION.sub(b"", xml[:match.start()]) + tag, body, rest, prefix.decode("ascii")
+
+
+def _split_rows(body: bytes, first_row: int, last_row: Optional[int]):
+    """返回 (first_row 之前的行, last_row 之后的各行)，行必须带有行号"""
+    rows = list(_ROW.finditer(body))
+    if len(rows) != len(_ROW_START.findall(body)):
+        raise UnsupportedWorkbook("工作表中有无法识别的行")
+    kept, moved = [], []
+    for match in rows:
+        number = _ROW_NUMBER.search(match.group(2))
+        if number is None:
+            raise UnsupportedWorkbook("工作表中的行没有行号")
+        row_number = int(number.group(2))
+        if row_number < first_row:
+            kept.append(match.group(0))
+        elif last_row is not None and row_number > last_row:
+            moved.append(match.group(0))
+    return b"".join(kept), moved
+
+
+def _shift_row(row: bytes, shift: int) -> bytes:
+    """行及其单元格的行号加 shift"""
+    if shift == 0:
+        return row
+    renumber = lambda m: m.group(1) + str(int(m.group(2)) + shift).encode("ascii") + m.group(3)
+    end = row.index(b">")
+    return _ROW_NUMBER.sub(renumber, row[:end], count=1) + _CELL_REF.sub(renumber, row[end:])
+
+
+def _keep_merges(after: bytes, first_row: int, last_row: Optional[int], shift: int) -> bytes:
+    """只保留完全在被替换行之前或之后的合并单元格（之后的顺移），没有时删除 <mergeCells>"""
+    block = _MERGE_CELLS.search(after)
+    if block is None:
+        return after
+    kept = []
+    for match in _MERGE_CELL.finditer(block.group(0)):
+        start, end = int(match.group(2)), int(match.group(4) or match.group(2))
+        if end < first_row:
+            kept.append(match.group(0))
+        elif last_row is not None and start > last_row:
+            ref = f"{match.group(1).decode()}{start + shift}"
+            if match.group(3):
+                ref += f":{match.group(3).decode()}{end + shift}"
+            kept.append(f'<{block.group(1).decode()}mergeCell ref="{ref}"/>'.encode("utf-8"))
+    if not kept:
+        return after[:block.start()] + after[block.end():]
+    prefix = block.group(1)
+    merged = (b"<" + prefix + b'mergeCells count="' + str(len(kept)).encode("ascii") + b'">'
+              + b"".join(kept) + b"</" + prefix + b"mergeCells>")
+    return after[:block.start()] + merged + after[block.end():]
+
+
+def _check_defined_names(workbook_xml: bytes, sheet: str, index: int):
+    """工作簿中有引用该工作表（或局部于该工作表）的定义名称时抛出 UnsupportedWorkbook"""
+    quoted = "'" + sheet.replace("'", "''") + "'!"
+    refs = [quoted.encode("utf-8"), escape(quoted, {"'": "&apos;"}).encode("utf-8")]
+    if re.fullmatch(r"[^\W\d]\w*", sheet):
+        refs.append(f"{sheet}!".encode("utf-8"))
+    for match in _DEFINED_NAME.finditer(workbook_xml):
+        local = _LOCAL_SHEET_ID.search(match.group(1))
+        if (local is not None and int(local.group(1)) == index) or any(r in match.group(2) for r in refs):
+            raise UnsupportedWorkbook("工作簿中有引用该工作表的定义名称")
@@ -0,0 +1,8 @@
+"""
+报价桌面系统性能基准测试
+
+- generator: 合成报价表生成器
+- runner: 测量 ExcelService 方法和接口的延迟、吞吐量、峰值内存，并与基线比较
+
+用法：python -m benchmarks --rows 1000,10000
+"""
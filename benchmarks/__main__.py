@@ -0,0 +1,65 @@
+"""
+基准测试命令行入口
+
+示例：
+    python -m benchmarks                          # 运行并与基线比较
+    python -m benchmarks --rows 1000,100000       # 指定行数
+    python -m benchmarks --only read_excel        # 只运行名称包含 read_excel 的项目
+    python -m benchmarks --save-baseline          # 将本次结果保存为基线
+    python -m benchmarks --storage memory         # 使用内存存储，排除磁盘IO
+"""
+
+import argparse
+import os
+import sys
+
+try:
+    from . import runner
+except ImportError:
+    import runner
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="报价桌面系统性能基准测试")
+    parser.add_argument("--rows", default="1000,10000", help="逗号分隔的数据行数，如 1000,10000,1000000")
+    parser.add_argument("--repeat", type=int, default=3, help="每个项目的计时次数")
+    parser.add_argument("--only", help="只运行名称包含该字符串的项目")
+    parser.add_argument("--storage", choices=("local", "memory"), default="local", help="工作簿存储类型")
+    parser.add_argument("--workdir", help="工作目录（默认使用临时目录并在结束后删除）")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"), help="结果输出文件")
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"), help="基线文件")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的性能回退比例")
+    args = parser.parse_args(argv)
+
+    rows_list = [int(r) for r in args.rows.split(",") if r.strip()]
+    print(f"{'项目':<42} {'延迟':>12} {'吞吐量':>16} {'峰值内存':>10}")
+    results = runner.run(rows_list, repeat=args.repeat, only=args.only, workdir=args.workdir,
+                         storage=args.storage)
+    runner.save(results, args.output)
+    print(f"\n结果已保存: {args.output}")
+
+    if args.save_baseline:
+        runner.save(results, args.baseline)
+        print(f"基线已保存: {args.baseline}")
+        return 0
+
+    baseline = runner.load(args.baseline)
+    if baseline is None:
+        print("没有基线文件，使用 --save-baseline 保存")
+        return 0
+
+    regressions = runner.compare(results, baseline, tolerance=args.tolerance)
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项性能回退（容差 {args.tolerance:.0%}）:")
+        for line in regressions:
+            print(f"  ✗ {line}")
+        return 1
+    print(f"\n与基线相比没有性能回退（容差 {args.tolerance:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+合成报价表生成器
+
+生成与真实报价表结构一致的工作簿：中文内容、规格尺寸字符串、
+末尾的合计/单位行，以及可选的项目图片。使用固定随机种子，结果可复现。
+"""
+
+import os
+import random
+from typing import Optional
+
+HEADER = ["序号", "内容", "项目图片", "材料", "规格尺寸", "数量", "价格", "总价", "经办人", "备注"]
+
+_ITEMS = ["海报", "宣传栏", "贴画", "横幅", "喷画", "展架", "灯箱", "易拉宝", "背景板", "指示牌", "桌卡", "吊旗"]
+_TITLES = ["春日影", "壱雫空", "超诗绊", "碧天伴走", "迷星叫", "影色舞", "潜在表明", "栞", "回层浮", "歌いましょう鳴らしましょう"]
+_MATERIALS = [
+    "高清相纸、覆膜层", "加厚PVC板+UV+安装", "焊铁牌+贴画\n+安装", "横额（含棍子、绳子）+安装",
+    "灯布喷画+安装", "KT板+写真", "亚克力+丝印", "铝合金框+灯片", "雪弗板雕刻", "户外车贴"
+]
+_HANDLERS = ["高松灯", "长崎素世", "千早爱音", "椎名立希", "要乐奈", "丰川祥子", "若叶睦"]
+_REMARKS = [None, None, None, "开场白", "加急", "含运费", "客户自提", "需复核尺寸"]
+
+
+def _size_spec(rng: random.Random) -> str:
+    """生成规格尺寸字符串，如 40*60*120厘米、9米*0.7米"""
+    kind = rng.random()
+    if kind < 0.5:
+        return f"{rng.randint(20, 500)}*{rng.randint(20, 300)}厘米"
+    if kind < 0.8:
+        return f"{rng.randint(20, 200)}*{rng.randint(20, 200)}*{rng.randint(20, 200)}厘米"
+    return f"{rng.randint(1, 20)}米*{rng.randint(1, 20) / 10}米"
+
+
+def generate_images(directory: str, count: int, seed: int = 0, size: int = 1200) -> list:
+    """生成项目图片，返回相对于 directory 父目录的路径列表"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        path = os.path.join(directory, f"img_{i:04d}.jpg")
+        Image.new("RGB", (size, size * 3 // 4), color).save(path, quality=90)
+        paths.append(os.path.join(os.path.basename(directory), os.path.basename(path)))
+    return paths
+
+
+def generate_workbook(path: str, rows: int, seed: int = 0, images: Optional[list] = None,
+                      image_ratio: float = 0.1) -> float:
+    """
+    生成合成报价表，返回总价合计
+
+    - rows: 数据行数
+    - images: 可选的图片路径列表，按 image_ratio 比例填入项目图片列
+    """
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(HEADER)
+
+    total = 0.0
+    for i in range(1, rows + 1):
+        quantity = rng.randint(1, 50)
+        price = rng.choice([rng.randint(10, 2000), round(rng.uniform(5, 500), 2)])
+        image = None
+        if images and rng.random() < image_ratio:
+            image = rng.choice(images)
+        total += quantity * price
+        ws.append([
+            i,
+            f"《{rng.choice(_TITLES)}》{rng.choice(_ITEMS)}",
+            image,
+            rng.choice(_MATERIALS),
+            _size_spec(rng),
+            quantity,
+            price,
+            quantity * price,
+            rng.choice(_HANDLERS),
+            rng.choice(_REMARKS),
+        ])
+
+    # 末尾的合计和单位行，读取时应被过滤
+    ws.append([None] * len(HEADER))
+    ws.append(["合计", None, None, None, None, None, None, total, None, None])
+    ws.append(["单位", "某某广告有限公司", None, None, None, None, None, None, None, None])
+
+    wb.save(path)
+    return total
+
+
+def generate_records(rows: int, seed: int = 0) -> list:
+    """生成用于保存接口的记录列表"""
+    rng = random.Random(seed)
+    return [
+        {
+            "内容": f"《{rng.choice(_TITLES)}》{rng.choice(_ITEMS)}",
+            "材料": rng.choice(_MATERIALS),
+            "规格尺寸": _size_spec(rng),
+            "数量": float(rng.randint(1, 50)),
+            "价格": float(rng.randint(10, 2000)),
+            "经办人": rng.choice(_HANDLERS),
+            "备注": rng.choice(_REMARKS),
+        }
+        for _ in range(rows)
+    ]
@@ -0,0 +1,288 @@
+"""
+HTTP 负载测试
+
+模拟多个桌面客户端并发访问后端，按权重混合调用 /files、/read、/save、/undo，
+统计每个接口的 p50/p95/p99 延迟、错误率和吞吐量，并按 SLO 判断是否通过。
+
+未指定 --url 时，在临时目录中生成测试文件并在本地启动 uvicorn 服务。
+
+示例：
+    python -m benchmarks.loadtest --clients 50 --duration 30
+    python -m benchmarks.loadtest --mix files=1,read=6,save=2,undo=1 --slo read.p95=500 --slo error_rate=0.01
+    python -m benchmarks.loadtest --url http://localhost:8000 --clients 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+try:
+    from .generator import generate_workbook
+except ImportError:
+    from generator import generate_workbook
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DEFAULT_MIX = "files=1,read=6,save=2,undo=1"
+
+
+class Stats:
+    """单个接口的统计"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def add(self, latency: float, ok: bool):
+        self.latencies.append(latency)
+        if not ok:
+            self.errors += 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        count = len(self.latencies)
+        ordered = sorted(self.latencies)
+        return {
+            "count": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "throughput": count / duration if duration > 0 else 0.0,
+            "p50": _percentile(ordered, 50) * 1000,
+            "p95": _percentile(ordered, 95) * 1000,
+            "p99": _percentile(ordered, 99) * 1000,
+        }
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    """解析操作权重，如 files=1,read=6,save=2,undo=1"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("files", "read", "save", "undo"):
+            raise ValueError(f"未知操作: {name}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def parse_slos(specs: List[str]) -> Dict[str, float]:
+    """解析 SLO，如 read.p95=500（毫秒）、error_rate=0.01"""
+    slos = {}
+    for spec in specs:
+        key, _, value = spec.partition("=")
+        slos[key.strip()] = float(value)
+    return slos
+
+
+def check_slos(report: Dict[str, Any], slos: Dict[str, float]) -> List[str]:
+    """检查 SLO，返回违反项说明"""
+    breaches = []
+    for key, limit in slos.items():
+        if key == "error_rate":
+            actual = report["overall"]["error_rate"]
+        else:
+            endpoint, _, metric = key.partition(".")
+            stats = report["endpoints"].get(endpoint)
+            if stats is None or metric not in stats:
+                continue
+            actual = stats[metric]
+        if actual > limit:
+            breaches.append(f"{key}: {actual:.3f} > {limit}")
+    return breaches
+
+
+class Client:
+    """模拟的桌面客户端"""
+
+    def __init__(self, http, files: List[str], mix: Dict[str, int], stats: Dict[str, Stats],
+                 seed: int, think_time: float):
+        self.http = http
+        self.files = files
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.stats = stats
+        self.rng = random.Random(seed)
+        self.think_time = think_time
+        self.opened: Dict[str, list] = {}
+
+    async def call(self, endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except Exception:
+            response, ok = None, False
+        self.stats[endpoint].add(time.perf_counter() - start, ok)
+        return response if ok else None
+
+    async def step(self):
+        op = self.rng.choices(self.ops, self.weights)[0]
+        file_name = self.rng.choice(self.files)
+        path = quote(file_name)
+        if op == "files":
+            await self.call("files", "GET", "/files")
+        elif op == "read" or (op == "save" and file_name not in self.opened):
+            response = await self.call("read", "GET", f"/read/{path}")
+            if response is not None:
+                self.opened[file_name] = response.json()["records"]
+        elif op == "save":
+            records = self.opened[file_name]
+            if records:
+                # 模拟估价员修改一个价格
+                row = self.rng.choice(records)
+                row["价格"] = float(self.rng.randint(10, 2000))
+            await self.call("save", "POST", f"/save/{path}", json={"records": records})
+        elif op == "undo":
+            await self.call("undo", "POST", f"/undo/{path}")
+
+    async def run(self, deadline: float):
+        while time.perf_counter() < deadline:
+            await self.step()
+            if self.think_time:
+                await asyncio.sleep(self.rng.uniform(0, self.think_time))
+
+
+async def run_load(url: str, clients: int, duration: float, mix: Dict[str, int],
+                   think_time: float = 0.0, seed: int = 0) -> Dict[str, Any]:
+    """对指定服务执行负载测试"""
+    import httpx
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as http:
+        files = (await http.get("/files")).json()
+        if not files:
+            raise RuntimeError("服务端没有可用的Excel文件")
+        stats = {op: Stats() for op in ("files", "read", "save", "undo")}
+        workers = [Client(http, files, mix, stats, seed + i, think_time) for i in range(clients)]
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(w.run(deadline) for w in workers))
+        elapsed = time.perf_counter() - start
+
+    overall = Stats()
+    for s in stats.values():
+        overall.latencies.extend(s.latencies)
+        overall.errors += s.errors
+    return {
+        "clients": clients,
+        "duration": elapsed,
+        "endpoints": {op: s.summary(elapsed) for op, s in stats.items() if s.latencies},
+        "overall": overall.summary(elapsed),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir: str, files: int, rows: int, extra_args: Optional[List[str]] = None):
+    """在工作目录中生成测试文件并启动本地服务，返回 (进程, 地址)"""
+    data_dir = os.path.join(workdir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(files):
+        generate_workbook(os.path.join(data_dir, f"负载测试_{i:02d}.xlsx"), rows, seed=i)
+
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    cmd = [sys.executable, "-m", "uvicorn", "backend.main:app",
+           "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    process = subprocess.Popen(cmd + (extra_args or []), cwd=workdir, env=env)
+    url = f"http://127.0.0.1:{port}"
+
+    import httpx
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("服务启动失败")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("等待服务启动超时")
+
+
+def print_report(report: Dict[str, Any]):
+    """打印负载测试报告"""
+    print(f"\n{report['clients']} 个客户端，持续 {report['duration']:.1f} 秒")
+    print(f"{'接口':<8} {'请求数':>8} {'错误率':>8} {'吞吐量/秒':>10} {'p50':>9} {'p95':>9} {'p99':>9}")
+    rows = list(report["endpoints"].items()) + [("合计", report["overall"])]
+    for name, s in rows:
+        print(
+            f"{name:<8} {s['count']:>8} {s['error_rate']:>8.2%} {s['throughput']:>10.1f}"
+            f" {s['p50']:>7.1f}ms {s['p95']:>7.1f}ms {s['p99']:>7.1f}ms"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="报价桌面系统HTTP负载测试")
+    parser.add_argument("--url", help="已运行服务的地址（默认在本地启动服务）")
+    parser.add_argument("--clients", type=int, default=50, help="并发客户端数")
+    parser.add_argument("--duration", type=float, default=30, help="持续时间（秒）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"操作权重，默认 {DEFAULT_MIX}")
+    parser.add_argument("--think-time", type=float, default=0.0, help="两次操作之间的最大随机等待（秒）")
+    parser.add_argument("--files", type=int, default=5, help="本地服务的测试文件数")
+    parser.add_argument("--rows", type=int, default=200, help="本地服务测试文件的行数")
+    parser.add_argument("--slo", action="append", default=[],
+                        help="SLO，可重复：接口.p50/p95/p99=毫秒、接口.error_rate=比例、error_rate=比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", help="将报告保存为JSON文件")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    slos = parse_slos(args.slo)
+
+    process = workdir = None
+    url = args.url
+    try:
+        if url is None:
+            workdir = tempfile.mkdtemp(prefix="quote-load-")
+            print(f"生成 {args.files} 个 {args.rows} 行的测试文件并启动本地服务...")
+            process, url = start_server(workdir, args.files, args.rows)
+        report = asyncio.run(run_load(url, args.clients, args.duration, mix, args.think_time, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    breaches = check_slos(report, slos)
+    if breaches:
+        print(f"\n违反 {len(breaches)} 项SLO:")
+        for line in breaches:
+            print(f"  ✗ {line}")
+        return 1
+    if slos:
+        print("\n所有SLO均满足")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+基准测试执行器
+
+对 ExcelService 的各个方法和 FastAPI 接口测量延迟、吞吐量和峰值内存，
+结果与保存的基线比较，超过容差的项目标记为性能回退。
+
+后端使用相对路径 data/ 作为数据目录，因此执行器先切换到临时工作目录
+再导入后端模块，基准测试不会读写项目自身的 data/ 目录。
+"""
+
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from .generator import generate_images, generate_records, generate_workbook
+except ImportError:
+    from generator import generate_images, generate_records, generate_workbook
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 图片嵌入只在较小的文件上测量
+MAX_IMAGE_ROWS = 10000
+
+
+class Case:
+    """一个基准测试项目"""
+
+    def __init__(self, name: str, rows: int, fn: Callable[[Any], Any],
+                 setup: Optional[Callable[[], Any]] = None):
+        self.name = name
+        self.rows = rows
+        self.fn = fn
+        self.setup = setup
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.rows}]"
+
+
+def measure(case: Case, repeat: int) -> Dict[str, Any]:
+    """测量延迟（多次取中位数）和峰值内存（单独一次，避免追踪开销影响计时）"""
+    timings = []
+    for _ in range(repeat):
+        arg = case.setup() if case.setup else None
+        gc.collect()
+        start = time.perf_counter()
+        case.fn(arg)
+        timings.append(time.perf_counter() - start)
+
+    arg = case.setup() if case.setup else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        case.fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median = statistics.median(timings)
+    return {
+        "rows": case.rows,
+        "median_s": median,
+        "min_s": min(timings),
+        "rows_per_s": case.rows / median if median > 0 else None,
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def build_cases(workdir: str, rows: int, images: List[str]) -> List[Case]:
+    """为指定行数构造基准测试项目"""
+    from backend.excel_service import ExcelService, excel_service as service
+    from backend.main import app
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    data_dir = service.base_dir
+    # 与轻量读取器对比的 pandas 解析路径
+    pandas_service = ExcelService(base_dir=data_dir, reader="pandas", storage=service.storage)
+    name = f"bench_{rows}.xlsx"
+    pristine = os.path.join(workdir, f"pristine_{rows}.xlsx")
+    generate_workbook(pristine, rows, seed=rows, images=images)
+    records = generate_records(rows, seed=rows)
+
+    def restore():
+        """恢复原始文件并清除缓存"""
+        with open(pristine, "rb") as f:
+            service.storage.write_bytes(name, f.read())
+        service._invalidate(name)
+        sidecar = os.path.join(service.cache_dir, f"{name}.images.json")
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+
+    def cold():
+        service._invalidate(name)
+
+    def fresh_records():
+        return [dict(r) for r in records]
+
+    def saved():
+        restore()
+        service.save_excel(name, fresh_records())
+
+    def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"接口返回 {response.status_code}: {response.text[:200]}")
+        return response
+
+    restore()
+    cases = [
+        Case("service.read_excel.cold", rows, lambda _: service.read_excel(name), cold),
+        Case("service.read_excel.cold.pandas", rows, lambda _: pandas_service.read_excel(name),
+             lambda: pandas_service._invalidate(name)),
+        Case("service.read_excel.warm", rows, lambda _: service.read_excel(name)),
+        Case("service.read_table.cold", rows, lambda _: service.read_table(name), cold),
+        Case("service.iter_records", rows, lambda _: sum(1 for _ in service.iter_records(name)), cold),
+        Case("service.save_excel", rows, lambda recs: service.save_excel(name, recs), fresh_records),
+        Case("service.undo", rows, lambda _: service.undo(name), saved),
+        Case("api.read", rows, lambda _: check(client.get(f"/read/{name}")), cold),
+        Case("api.save", rows, lambda recs: check(client.post(f"/save/{name}", json={"records": recs})),
+             fresh_records),
+        Case("api.undo", rows, lambda _: check(client.post(f"/undo/{name}")), saved),
+        Case("api.export.csv", rows, lambda _: check(client.get(f"/export/{name}?format=csv")), cold),
+    ]
+    if images and rows <= MAX_IMAGE_ROWS:
+        cases.append(Case("service.embed_images", rows, lambda _: service.embed_images(name), restore))
+    return cases
+
+
+def run(rows_list: List[int], repeat: int = 3, only: Optional[str] = None,
+        workdir: Optional[str] = None, log: Callable[[str], None] = print,
+        storage: str = "local") -> Dict[str, Any]:
+    """
+    执行基准测试，返回结果字典
+
+    storage 为工作簿存储类型：memory 时读写不经过磁盘，用于区分解析开销和磁盘IO开销。
+    """
+    import tempfile
+
+    # 服务单例在首次导入 backend 时按环境变量创建存储
+    os.environ["QUOTE_STORAGE"] = storage
+
+    cleanup = workdir is None
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix="quote-bench-"))
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    previous_cwd = os.getcwd()
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    os.chdir(workdir)
+    try:
+        images = generate_images(os.path.join(workdir, "data", "pics"), 20)
+        results = {}
+        for rows in rows_list:
+            log(f"生成 {rows} 行测试文件...")
+            for case in build_cases(workdir, rows, images):
+                if only and only not in case.name:
+                    continue
+                result = measure(case, repeat)
+                results[case.key] = result
+                log(_format_result(case.key, result))
+    finally:
+        os.chdir(previous_cwd)
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "storage": storage,
+        },
+        "results": results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25,
+            min_time_delta: float = 0.005, min_memory_delta: float = 1.0) -> List[str]:
+    """
+    与基线比较，返回性能回退说明列表
+
+    延迟或峰值内存超过基线的 (1 + tolerance) 倍，且绝对差值超过噪声下限时视为回退。
+    """
+    regressions = []
+    base_results = baseline.get("results", {})
+    for key, current in results.get("results", {}).items():
+        base = base_results.get(key)
+        if base is None:
+            continue
+        if (current["median_s"] > base["median_s"] * (1 + tolerance)
+                and current["median_s"] - base["median_s"] > min_time_delta):
+            regressions.append(
+                f"{key}: 延迟 {base['median_s'] * 1000:.1f}ms -> {current['median_s'] * 1000:.1f}ms"
+            )
+        if (current["peak_mb"] > base["peak_mb"] * (1 + tolerance)
+                and current["peak_mb"] - base["peak_mb"] > min_memory_delta):
+            regressions.append(
+                f"{key}: 峰值内存 {base['peak_mb']:.1f}MB -> {current['peak_mb']:.1f}MB"
+            )
+    return regressions
+
+
+def load(path: str) -> Optional[Dict[str, Any]]:
+    """读取结果文件，不存在时返回None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save(results: Dict[str, Any], path: str):
+    """保存结果文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def _format_result(key: str, result: Dict[str, Any]) -> str:
+    """格式化单条结果"""
+    throughput = result["rows_per_s"]
+    return (
+        f"  {key:<40} {result['median_s'] * 1000:>10.1f}ms"
+        f" {throughput or 0:>12.0f} 行/秒 {result['peak_mb']:>9.1f}MB"
+    )
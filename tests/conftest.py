@@ -0,0 +1,97 @@
+"""
+后端测试的公共夹具
+
+每个测试使用临时数据目录中的独立 ExcelService，不会修改项目的 data/。
+"""
+
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+HEADER = ["序号", "内容", "材料", "规格尺寸", "数量", "价格", "总价", "经办人", "备注"]
+
+
+def quote_rows(count, start=1, price=10.0):
+    """生成报价表数据行（与 HEADER 对应）"""
+    return [
+        [i, f"项目{i}", "钢" if i % 2 else "木", f"{i}*10厘米", i % 5 + 1, price + i,
+         (i % 5 + 1) * (price + i), "张三" if i % 3 else "李四", None]
+        for i in range(start, start + count)
+    ]
+
+
+def write_workbook(path, sheets, title=None):
+    """
+    写入报价工作簿
+
+    sheets 为 工作表名称 -> 数据行（第一行为表头）；title 不为None时在第一个工作表的表头前加一行标题。
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    for index, (name, rows) in enumerate(sheets.items()):
+        ws = wb.create_sheet(name)
+        if title is not None and index == 0:
+            ws.append([title])
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+    return path
+
+
+def bump_mtime(path, seconds=5):
+    """将文件的修改时间推后，确保版本（修改时间、大小）一定变化"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv("QUOTE_STORAGE", raising=False)
+    monkeypatch.delenv("QUOTE_EXCEL_DIR", raising=False)
+    path = tmp_path / "data"
+    path.mkdir()
+    return str(path)
+
+
+@pytest.fixture
+def service(data_dir):
+    from backend.excel_service import ExcelService
+
+    return ExcelService(base_dir=data_dir)
+
+
+@pytest.fixture
+def make_quote(data_dir):
+    """在数据目录中写入报价文件，返回文件名"""
+
+    def make(name, rows=None, sheets=None, title=None):
+        if sheets is None:
+            sheets = {"报价": [HEADER] + (rows if rows is not None else quote_rows(10))}
+        write_workbook(os.path.join(data_dir, name), sheets, title=title)
+        return name
+
+    return make
+
+
+@pytest.fixture
+def client(service, tmp_path, monkeypatch):
+    """使用临时数据目录中的服务的 API 客户端"""
+    monkeypatch.chdir(tmp_path)
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    monkeypatch.setattr(main, "excel_service", service)
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def anyio_backend():
+    # 准入通道基于 asyncio
+    return "asyncio"
@@ -0,0 +1,44 @@
+"""准入通道"""
+
+import pytest
+
+from conftest import quote_rows
+
+
+def test_export_releases_heavy_slot(client, make_quote):
+    from backend.admission import HEAVY
+
+    make_quote("a.xlsx", quote_rows(20))
+    response = client.get("/export/a.xlsx?format=csv")
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 21
+    assert HEAVY.running == 0 and HEAVY.waiting == 0
+
+
+def test_export_releases_heavy_slot_when_stream_fails(client, make_quote, monkeypatch):
+    from backend import main
+    from backend.admission import HEAVY
+
+    def failing_export(records, fmt, columns):
+        yield b"partial\n"
+        raise RuntimeError("导出中断")
+
+    monkeypatch.setattr(main, "iter_export", failing_export)
+    make_quote("a.xlsx", quote_rows(5))
+    with pytest.raises(RuntimeError):
+        client.get("/export/a.xlsx?format=csv")
+    assert HEAVY.running == 0
+
+
+@pytest.mark.anyio
+async def test_lane_queues_and_rejects():
+    from backend.admission import Lane, Overloaded
+
+    lane = Lane("test", concurrency=1, queue_size=1, max_wait=0.05)
+    await lane.acquire()
+    with pytest.raises(Overloaded) as timeout:
+        await lane.acquire()
+    assert timeout.value.retry_after >= 1
+    assert lane.waiting == 0
+    lane.release()
+    assert lane.running == 0
@@ -0,0 +1,57 @@
+"""
+批量维护命令行工具：重新计算总价只重写数据行
+"""
+
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+from backend import cli
+from conftest import HEADER, quote_rows, write_workbook
+
+
+def _stale_quote(data_dir, name, merged=True):
+    """标题行 + 表头 + 5行数据（前两行总价过期）+ 合计行"""
+    rows = quote_rows(5)
+    rows[0][6] = rows[1][6] = 1
+    path = os.path.join(data_dir, name)
+    write_workbook(path, {"报价": [HEADER] + rows + [["合计", None, None, None, None, None, 999]]},
+                   title="某某项目结算清单")
+    if merged:
+        wb = load_workbook(path)
+        wb["报价"].merge_cells("A1:I1")
+        wb.save(path)
+    return path, quote_rows(5)
+
+
+@pytest.mark.parametrize("merged", [True, False], ids=["merged_title", "plain"])
+def test_recompute_keeps_title_and_footer_rows(service, data_dir, merged):
+    path, expected = _stale_quote(data_dir, "结算.xlsx", merged)
+    result = service.recompute_sheet("结算.xlsx")
+    assert result["records"] == 5
+
+    ws = load_workbook(path)["报价"]
+    assert ws["A1"].value == "某某项目结算清单"
+    assert [c.value for c in ws[2]] == HEADER
+    assert [ws.cell(row, 7).value for row in range(3, 8)] == [row[6] for row in expected]
+    assert ws["A8"].value == "合计"
+    assert ws["G8"].value == 999
+    assert ws.max_row == 8
+    if merged:
+        assert [str(r) for r in ws.merged_cells.ranges] == ["A1:I1"]
+
+    table = service.read_table("结算.xlsx")
+    assert [r["总价"] for r in table.to_records()] == [row[6] for row in expected]
+
+
+def test_cli_recompute(data_dir):
+    path, expected = _stale_quote(data_dir, "结算.xlsx")
+    summary = cli.run("recompute", base_dir=data_dir, workers=1, log=lambda line: None)
+    assert summary["errors"] == {}
+    assert summary["rewritten"] == 1
+
+    ws = load_workbook(path)["报价"]
+    assert ws["A1"].value == "某某项目结算清单"
+    assert ws["A8"].value == "合计"
+    assert ws["G3"].value == expected[0][6]
@@ -0,0 +1,28 @@
+"""
+版本比较接口 /diff
+"""
+
+import pytest
+
+
+def test_diff_endpoint(client, service, make_quote):
+    name = make_quote("比较.xlsx")
+    old_version = service.current_version(name)
+    records = service.read_table(name).to_records()
+    records[1]["数量"] = 100
+    del records[4]
+    records.append({"内容": "新增项目", "材料": "铝", "规格尺寸": "1*1", "数量": 2, "价格": 3})
+    service.save_excel(name, records)
+
+    response = client.get(f"/diff/{name}", params={"from": old_version})
+    assert response.status_code == 200, response.text
+    diff = response.json()
+    assert diff["from"] == old_version
+    assert diff["to"] == service.current_version(name)
+    assert [a["record"]["内容"] for a in diff["added"]] == ["新增项目"]
+    assert [r["record"]["内容"] for r in diff["removed"]] == ["项目5"]
+    assert len(diff["modified"]) == 1
+    assert diff["modified"][0]["cells"]["数量"][1] == 100
+    assert diff["total"]["change"] == pytest.approx(diff["total"]["to"] - diff["total"]["from"])
+
+    assert client.get(f"/diff/{name}", params={"from": "0-0"}).status_code == 404
@@ -0,0 +1,60 @@
+"""
+流式导出：工作表参数、轻量读取器中途失败时的回退、其他进程修改后的缓存
+"""
+
+import csv
+import io
+
+import pytest
+
+from backend import xlsx_reader
+from backend.excel_service import ExcelService, SheetNotFound
+from backend.quote_table import QuoteTable
+from backend.xlsx_reader import UnsupportedWorkbook
+from conftest import HEADER, quote_rows
+
+
+def _csv(response):
+    assert response.status_code == 200, response.text
+    return list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+
+
+def test_export_sheet(client, make_quote):
+    name = make_quote("导出.xlsx", sheets={"报价": [HEADER] + quote_rows(4), "追加": [HEADER] + quote_rows(2, start=9)})
+    assert [r["内容"] for r in _csv(client.get(f"/export/{name}"))] == [f"项目{i}" for i in range(1, 5)]
+    assert [r["内容"] for r in _csv(client.get(f"/export/{name}", params={"sheet": "追加"}))] == ["项目9", "项目10"]
+    assert client.get(f"/export/{name}", params={"sheet": "没有"}).status_code == 404
+    assert client.get("/export/没有.xlsx").status_code == 404
+
+
+def test_lean_failure_midway_falls_back_without_duplicates(service, make_quote, monkeypatch):
+    name = make_quote("中途失败.xlsx", rows=quote_rows(8))
+    iter_rows = xlsx_reader.XlsxReader.iter_rows
+
+    def broken(self, sheet=None):
+        for number, (row_number, values) in enumerate(iter_rows(self, sheet)):
+            if number == 4:
+                raise UnsupportedWorkbook("工作表格式错误")
+            yield row_number, values
+
+    monkeypatch.setattr(xlsx_reader.XlsxReader, "iter_rows", broken)
+    records = list(service.iter_records(name))
+    assert [r["内容"] for r in records] == [f"项目{i}" for i in range(1, 9)]
+
+
+def test_missing_sheet_is_reported_before_iteration(service, make_quote):
+    name = make_quote("工作表.xlsx")
+    with pytest.raises(SheetNotFound):
+        service.iter_records(name, "没有")
+
+
+def test_iter_records_drops_cache_changed_by_other_worker(service, make_quote, data_dir):
+    name = make_quote("代数.xlsx")
+    key = service._stat(name)
+    service.read_table(name)
+    # 缓存中放入不同的内容：修改时间不变时只有修改代数能发现其他进程的写入
+    service._cache[(name, None)] = (key, QuoteTable())
+    assert list(service.iter_records(name)) == []
+
+    ExcelService(base_dir=data_dir).storage.bump_generation(name)
+    assert len(list(service.iter_records(name))) == 10
@@ -0,0 +1,71 @@
+"""图片嵌入"""
+
+import os
+
+import pytest
+
+from conftest import HEADER, quote_rows
+
+
+@pytest.fixture
+def image_quote(make_quote, data_dir):
+    from PIL import Image
+
+    rows = quote_rows(3)
+    for i, row in enumerate(rows):
+        path = os.path.join(data_dir, f"pic{i}.png")
+        Image.new("RGB", (200, 120), (40 * i, 100, 200)).save(path)
+        row[HEADER.index("备注")] = None
+    header = HEADER + ["项目图片"]
+    rows = [row + [f"pic{i}.png"] for i, row in enumerate(rows)]
+    return make_quote("img.xlsx", sheets={"报价": [header] + rows})
+
+
+def _image_count(service, file_name):
+    from openpyxl import load_workbook
+
+    return len(load_workbook(service.storage.source(file_name)).active._images)
+
+
+def test_embed_images_is_incremental(service, image_quote):
+    first = service.embed_images(image_quote)
+    assert first["embedded"] == 3
+    assert _image_count(service, image_quote) == 3
+
+    version = service.current_version(image_quote)
+    second = service.embed_images(image_quote)
+    assert second["embedded"] == 0 and second["skipped"] == 3
+    assert service.current_version(image_quote) == version
+
+
+def test_save_during_embedding_is_not_overwritten(service, image_quote):
+    saved = []
+
+    def progress(fraction, message):
+        # 图片处理期间（未持有写锁）有其他请求保存了文件
+        if not saved:
+            records = service.read_table(image_quote).to_records()
+            records[0]["数量"] = 99
+            service.save_excel(image_quote, records)
+            saved.append(True)
+
+    service.embed_images(image_quote, progress=progress)
+    assert saved
+    assert service.read_table(image_quote).to_records()[0]["数量"] == 99
+
+
+def test_embedding_gives_up_when_file_keeps_changing(service, image_quote):
+    from backend.versioning import VersionMismatch
+
+    count = [0]
+
+    def progress(fraction, message):
+        if message.startswith("已处理图片 1/"):
+            count[0] += 1
+            records = service.read_table(image_quote).to_records()
+            records[0]["数量"] = 10 + count[0]
+            service.save_excel(image_quote, records)
+
+    with pytest.raises(VersionMismatch):
+        service.embed_images(image_quote, progress=progress)
+    assert service.read_table(image_quote).to_records()[0]["数量"] == 10 + count[0]
@@ -0,0 +1,57 @@
+"""上传文件导入"""
+
+import os
+import shutil
+import threading
+
+from conftest import HEADER, quote_rows, write_workbook
+
+
+def _upload(service, tmp_path, rows):
+    source = write_workbook(str(tmp_path / "upload.xlsx"), {"报价": [HEADER] + rows})
+    temp_path = service.new_upload_path()
+    shutil.copy(source, temp_path)
+    return temp_path
+
+
+def test_import_seeds_cache(service, tmp_path):
+    result = service.import_excel(_upload(service, tmp_path, quote_rows(4)), "new.xlsx")
+    assert result["records"] == 4 and result["warning_count"] == 0
+    assert "new.xlsx" in service.list_excel_files()
+    cached = service._cache[("new.xlsx", None)]
+    assert cached[0] == service.storage.stat("new.xlsx")
+    assert len(service.read_table("new.xlsx")) == 4
+
+
+def test_save_right_after_import_is_not_shadowed_by_stale_cache(service, tmp_path, monkeypatch):
+    temp_path = _upload(service, tmp_path, quote_rows(4))
+    replaced = threading.Event()
+    saved = threading.Event()
+    publish_change, stat = service._publish_change, service._stat
+
+    def save():
+        service.save_excel("new.xlsx", service.read_table("new.xlsx").to_records()[:2])
+        saved.set()
+
+    saver = threading.Thread(target=save)
+
+    def patched_publish(file_name):
+        publish_change(file_name)
+        replaced.set()
+
+    def patched_stat(file_name):
+        # 导入替换文件后读取版本以写入缓存：此时另一个线程发起保存
+        if replaced.is_set() and threading.current_thread() is not saver and not saver.is_alive() \
+                and not saved.is_set():
+            saver.start()
+            saved.wait(0.5)
+        return stat(file_name)
+
+    monkeypatch.setattr(service, "_publish_change", patched_publish)
+    monkeypatch.setattr(service, "_stat", patched_stat)
+    service.import_excel(temp_path, "new.xlsx")
+    saver.join()
+
+    assert saved.is_set()
+    assert len(service.read_table("new.xlsx")) == 2
+    assert not os.path.exists(temp_path)
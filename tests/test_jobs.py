@@ -0,0 +1,91 @@
+"""
+后台任务在多个进程之间共享状态（共用 job_dir）
+"""
+
+import threading
+import time
+
+import pytest
+
+from backend import jobs
+from backend.jobs import JobManager
+
+
+@pytest.fixture
+def managers(tmp_path):
+    """共用同一个 job_dir 的两个任务管理器，相当于两个 worker 进程"""
+    job_dir = str(tmp_path / "jobs")
+    owner, other = JobManager(job_dir=job_dir), JobManager(job_dir=job_dir)
+    yield owner, other
+    owner.shutdown()
+    other.shutdown()
+
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.01)
+
+
+def test_job_state_is_visible_from_other_process(managers):
+    owner, other = managers
+    started, release = threading.Event(), threading.Event()
+
+    def work(progress):
+        started.set()
+        release.wait(5)
+        return {"rows": 3}
+
+    job = owner.submit("test", work)
+    assert other.get(job.id)["status"] in ("pending", "running")
+    started.wait(5)
+    _wait(lambda: other.get(job.id)["status"] == "running")
+
+    release.set()
+    _wait(lambda: other.get(job.id)["status"] == "succeeded")
+    assert other.get(job.id)["result"] == {"rows": 3}
+
+
+def test_cancel_from_other_process(managers, monkeypatch):
+    monkeypatch.setattr(jobs, "PERSIST_INTERVAL", 0.0)
+    owner, other = managers
+
+    def work(progress):
+        for i in range(500):
+            progress(i / 500, f"第{i}步")
+            time.sleep(0.01)
+
+    job = owner.submit("test", work)
+    _wait(lambda: other.get(job.id)["progress"] > 0)
+    assert other.cancel(job.id)
+    _wait(lambda: other.get(job.id)["status"] == "cancelled")
+    assert not other.cancel(job.id)
+
+
+def test_job_files_are_pruned(tmp_path):
+    manager = JobManager(job_dir=str(tmp_path / "jobs"), max_history=3)
+    try:
+        for i in range(6):
+            job = manager.submit("test", lambda progress, i=i: i)
+            job.future.result(5)
+            _wait(lambda: job.done)
+    finally:
+        manager.shutdown()
+    assert len(list((tmp_path / "jobs").glob("*.json"))) == 3
+    assert manager.get(job.id)["result"] == 5
+
+
+def test_shutdown_cancels_pending_jobs(managers):
+    owner, other = managers
+    release = threading.Event()
+    running = [owner.submit("test", lambda progress: release.wait(5)) for _ in range(owner.max_workers)]
+    pending = owner.submit("test", lambda progress: None)
+    assert other.get(pending.id)["status"] == "pending"
+
+    owner.shutdown()
+    release.set()
+    assert other.get(pending.id)["status"] == "cancelled"
+    assert not other.cancel(pending.id)
+    for job in running:
+        job.future.result(5)
@@ -0,0 +1,69 @@
+"""
+布局识别：表头上方的标题行、数据下方的页脚行、列名别名
+"""
+
+import os
+
+import pytest
+
+from backend.excel_service import ExcelService
+from backend.layout import find_header, normalize_columns
+from conftest import write_workbook
+
+LEGACY_HEADER = ["编号", "名称", "材质", "规格", "数目", "单价", "金额", "负责人", "说明"]
+
+
+def _legacy_quote(data_dir, name="旧格式.xlsx"):
+    """两行标题 + 别名表头 + 3行数据 + 空行和合计、落款等页脚行"""
+    rows = [
+        ["某某项目结算清单"],
+        ["日期：2024年1月"],
+        LEGACY_HEADER,
+        [1, "展板", "PVC", "1*2米", 2, 50, 100, "张三", None],
+        [2, "灯箱", "铝", "2*3米", 1, 300, 300, "李四", "加急"],
+        [3, "海报", "纸", "A1", 10, 5, 50, "张三", None],
+        [],
+        ["合计", None, None, None, None, None, 450],
+        ["落款：某某公司"],
+    ]
+    write_workbook(os.path.join(data_dir, name), {"报价": rows})
+    return name
+
+
+def test_normalize_columns_maps_aliases():
+    assert normalize_columns([" 名称 ", "单价", "金额"]) == ["内容", "价格", "总价"]
+    # 映射后与已有列重名时保留原列名
+    assert normalize_columns(["内容", "名称"]) == ["内容", "名称"]
+
+
+def test_find_header_skips_title_rows():
+    rows = iter([(1, ["结算清单"]), (2, [None]), (3, LEGACY_HEADER), (4, ["1", "展板"])])
+    header, rest = find_header(rows)
+    assert header == (3, LEGACY_HEADER)
+    assert [row[0] for row in rest] == [4]
+
+
+@pytest.mark.parametrize("reader", ["lean", "pandas"])
+def test_title_and_footer_rows_are_not_records(data_dir, reader):
+    name = _legacy_quote(data_dir)
+    service = ExcelService(base_dir=data_dir, reader=reader)
+    table = service.read_table(name)
+    records = table.to_records()
+    assert [r["内容"] for r in records] == ["展板", "灯箱", "海报"]
+    assert records[1]["价格"] == 300 and records[1]["备注"] == "加急"
+    assert table.total == 450
+
+    layout = service.layouts.get(service._layout_key(name), service._stat(name))
+    assert (layout.header_row, layout.data_start, layout.data_end) == (3, 4, 6)
+    assert layout.columns == normalize_columns(LEGACY_HEADER)
+
+
+def test_layout_is_reused_after_restart(data_dir, monkeypatch):
+    name = _legacy_quote(data_dir)
+    ExcelService(base_dir=data_dir).read_table(name)
+
+    # 新的服务实例从缓存目录读取布局，不再查找表头
+    from backend import excel_service
+    monkeypatch.setattr(excel_service, "find_header", lambda *args, **kwargs: pytest.fail("重新查找了表头"))
+    records = ExcelService(base_dir=data_dir).read_table(name).to_records()
+    assert [r["内容"] for r in records] == ["展板", "灯箱", "海报"]
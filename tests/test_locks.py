@@ -0,0 +1,21 @@
+"""
+跨进程文件锁：等待时间的指标
+"""
+
+from backend import metrics
+from backend.locks import FileLock
+
+
+def _lock_wait_count() -> int:
+    line = [l for l in metrics.LOCK_WAIT_SECONDS.render() if l.startswith("quote_file_lock_wait_seconds_count")]
+    return int(float(line[0].split()[-1])) if line else 0
+
+
+def test_file_lock_records_wait_time(tmp_path):
+    lock = FileLock(str(tmp_path / "a.lock"))
+    before = _lock_wait_count()
+    with lock:
+        # 重入不计入
+        with lock:
+            pass
+    assert _lock_wait_count() == before + 1
@@ -0,0 +1,137 @@
+"""
+带版本检查的保存：三方合并、冲突（409）和基础版本不可用（412）
+"""
+
+import os
+
+import pytest
+
+from backend.excel_service import VersionMismatch
+from backend.merge import MergeConflict, merge_records
+from conftest import HEADER, bump_mtime, quote_rows, write_workbook
+
+
+def _edit(records, index, **values):
+    records = [dict(r) for r in records]
+    records[index].update(values)
+    return records
+
+
+def _external_edit(data_dir, name, sheets):
+    """其他程序直接修改文件（不经过服务）"""
+    path = os.path.join(data_dir, name)
+    write_workbook(path, sheets)
+    bump_mtime(path)
+
+
+def _api_records(records):
+    """客户端提交的记录：只包含 ExcelItem 的字段"""
+    return [{k: r.get(k) for k in HEADER if k not in ("序号", "总价")} for r in records]
+
+
+def test_merge_records_keeps_both_edits():
+    base = [{"内容": "a"}, {"内容": "b"}, {"内容": "c"}]
+    ours = [{"内容": "A"}, {"内容": "b"}, {"内容": "c"}]
+    theirs = [{"内容": "a"}, {"内容": "b"}, {"内容": "C"}]
+    assert merge_records(base, ours, theirs) == [{"内容": "A"}, {"内容": "b"}, {"内容": "C"}]
+
+
+def test_merge_records_conflict():
+    base = [{"内容": "a"}, {"内容": "b"}]
+    with pytest.raises(MergeConflict) as e:
+        merge_records(base, [{"内容": "x"}, {"内容": "b"}], [{"内容": "y"}, {"内容": "b"}])
+    assert e.value.conflicts[0]["base_start"] == 1
+
+
+def test_merge_ignores_columns_not_submitted():
+    base = [{"内容": "a", "日期": "1"}, {"内容": "b", "日期": "1"}]
+    theirs = [{"内容": "a", "日期": "1"}, {"内容": "B", "日期": "2"}]
+    ours = [{"内容": "A"}, {"内容": "b"}]
+    with pytest.raises(MergeConflict):
+        merge_records(base, ours, theirs)
+    merged = merge_records(base, ours, theirs, columns={"内容"})
+    assert merged == [{"内容": "A", "日期": "1"}, {"内容": "B", "日期": "2"}]
+
+
+def test_merge_keeps_current_values_of_columns_not_submitted():
+    base = [{"内容": "a", "日期": "1月"}, {"内容": "b", "日期": "1月"}]
+    theirs = [{"内容": "a", "日期": "2月"}, {"内容": "b", "日期": "2月"}]
+    ours = [{"内容": "a"}, {"内容": "B"}]
+    merged = merge_records(base, ours, theirs, columns={"内容"})
+    assert merged == [{"内容": "a", "日期": "2月"}, {"内容": "B", "日期": "2月"}]
+
+    # 只有当前文件修改了未提交的列
+    assert merge_records(base, [{"内容": "a"}, {"内容": "b"}], theirs, columns={"内容"}) == theirs
+
+
+def test_save_merges_concurrent_edits(service, make_quote, data_dir):
+    name = make_quote("合并.xlsx")
+    base_version = service.current_version(name)
+    records = service.read_table(name).to_records()
+
+    theirs = service.save_versioned(name, _edit(records, 0, 内容="他们的修改"), base_version=base_version)
+    assert not theirs["merged"]
+
+    result = service.save_versioned(name, _edit(records, 8, 备注="我的修改"), base_version=base_version)
+    assert result["merged"]
+    saved = service.read_table(name).to_records()
+    assert saved[0]["内容"] == "他们的修改"
+    assert saved[8]["备注"] == "我的修改"
+
+
+def test_save_with_extra_column_does_not_conflict(client, service, data_dir):
+    header = HEADER + ["日期"]
+    rows = [row + ["2024-01-01"] for row in quote_rows(6)]
+    write_workbook(os.path.join(data_dir, "日期.xlsx"), {"报价": [header] + rows})
+    base_version = service.current_version("日期.xlsx")
+    records = service.read_table("日期.xlsx").to_records()
+    assert records[0]["日期"] == "2024-01-01"
+
+    # 其他用户修改了最后一行的日期；客户端不提交日期列，只修改了第一行
+    service.save_versioned("日期.xlsx", _edit(records, 5, 日期="2024-02-01"), base_version=base_version)
+
+    body = {"records": _api_records(_edit(records, 0, 内容="修改"))}
+    response = client.post("/save/日期.xlsx", json=body, headers={"If-Match": f'"{base_version}"'})
+    assert response.status_code == 200, response.text
+    assert response.json()["merged"]
+    saved = service.read_table("日期.xlsx").to_records()
+    assert saved[0]["内容"] == "修改"
+    assert [r["日期"] for r in saved] == ["2024-01-01"] * 5 + ["2024-02-01"]
+
+
+def test_save_conflict_returns_409(client, service, make_quote):
+    name = make_quote("冲突.xlsx")
+    base_version = service.current_version(name)
+    records = service.read_table(name).to_records()
+    service.save_versioned(name, _edit(records, 2, 内容="他们的修改"), base_version=base_version)
+
+    body = {"records": _api_records(_edit(records, 2, 内容="我的修改"))}
+    response = client.post(f"/save/{name}", json=body, headers={"If-Match": f'"{base_version}"'})
+    assert response.status_code == 409
+    detail = response.json()["detail"]
+    assert detail["version"] == service.current_version(name)
+    assert detail["conflicts"][0]["base_start"] == 3
+
+
+def test_save_unknown_base_version_returns_412(client, make_quote):
+    name = make_quote("过期.xlsx")
+    body = {"records": _api_records([dict(zip(HEADER, row)) for row in quote_rows(2)])}
+    response = client.post(f"/save/{name}", json=body, headers={"If-Match": '"0-0"'})
+    assert response.status_code == 412
+
+
+@pytest.mark.parametrize("reader", ["lean", "pandas"])
+def test_base_version_without_sheet_returns_412(client, service, make_quote, data_dir, reader):
+    service.reader = reader
+    name = make_quote("工作表.xlsx")
+    base_version = service.current_version(name)
+    records = service.read_table(name).to_records()
+    # 保存一次，基础版本进入历史；之后其他程序添加了工作表
+    service.save_versioned(name, _edit(records, 0, 内容="修改"))
+    _external_edit(data_dir, name, {"报价": [HEADER] + quote_rows(10), "新增": [HEADER] + quote_rows(2)})
+
+    with pytest.raises(VersionMismatch):
+        service.save_versioned(name, records[:2], "新增", base_version)
+    body = {"records": _api_records(records[:2])}
+    response = client.post(f"/save/{name}/新增", json=body, headers={"If-Match": f'"{base_version}"'})
+    assert response.status_code == 412
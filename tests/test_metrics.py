@@ -0,0 +1,45 @@
+"""
+运行指标：Prometheus 文本格式和 /metrics
+"""
+
+from backend import metrics
+
+
+def _sample(text, series):
+    """指标文本中某个序列的值，不存在时为0"""
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_histogram_render():
+    histogram = metrics.Histogram("test_seconds", "测试", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, route='/a"b')
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP test_seconds 测试", "# TYPE test_seconds histogram"]
+    assert lines[2:] == [
+        'test_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'test_seconds_bucket{route="/a\\"b",le="1"} 3',
+        'test_seconds_bucket{route="/a\\"b",le="+Inf"} 4',
+        'test_seconds_sum{route="/a\\"b"} 4.05',
+        'test_seconds_count{route="/a\\"b"} 4',
+    ]
+
+
+def test_metrics_endpoint_counts_requests_by_route(client, make_quote):
+    name = make_quote("指标.xlsx")
+    series = 'quote_http_request_duration_seconds_count{method="GET",route="/read/{file_name}",status="200"}'
+    parse = 'quote_stage_duration_seconds_count{stage="parse"}'
+    before = client.get("/metrics").text
+
+    assert client.get(f"/read/{name}").status_code == 200
+    assert client.get(f"/read/{name}").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+    # 路由模板作为标签，文件名不出现在指标中；第二次读取命中缓存，不再解析
+    assert _sample(response.text, series) - _sample(before, series) == 2
+    assert _sample(response.text, parse) - _sample(before, parse) == 1
+    assert name not in response.text
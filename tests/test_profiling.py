@@ -0,0 +1,45 @@
+"""
+/debug/profile：令牌校验和性能分析输出
+"""
+
+import pytest
+
+from backend import main
+
+TOKEN = "test-debug-token"
+
+
+@pytest.fixture
+def debug_token(monkeypatch):
+    monkeypatch.setattr(main, "DEBUG_TOKEN", TOKEN)
+    return TOKEN
+
+
+def test_profile_is_hidden_without_configured_token(client, monkeypatch):
+    monkeypatch.setattr(main, "DEBUG_TOKEN", None)
+    response = client.get("/debug/profile", params={"seconds": 0.1}, headers={"X-Debug-Token": ""})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Debug-Token": "wrong"}], ids=["missing", "wrong"])
+def test_profile_rejects_invalid_token(client, debug_token, headers):
+    response = client.get("/debug/profile", params={"seconds": 0.1}, headers=headers)
+    assert response.status_code == 403
+
+
+def test_profile_validates_parameters(client, debug_token):
+    headers = {"X-Debug-Token": debug_token}
+    assert client.get("/debug/profile", params={"seconds": 0}, headers=headers).status_code == 400
+    assert client.get("/debug/profile", params={"seconds": 1, "mode": "disk"}, headers=headers).status_code == 400
+
+
+@pytest.mark.parametrize("mode", ["cpu", "memory"])
+def test_profile_returns_text_report(client, debug_token, mode):
+    response = client.get("/debug/profile", params={"mode": mode, "seconds": 0.2, "interval_ms": 1},
+                          headers={"X-Debug-Token": debug_token})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    if mode == "cpu":
+        # 折叠栈格式：每行 "线程;帧;帧 次数"
+        stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+        assert ";" in stack and int(count) > 0
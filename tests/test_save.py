@@ -0,0 +1,18 @@
+"""
+保存：内容未变化时不重写文件
+"""
+
+import os
+
+
+def test_unchanged_save_does_not_touch_file(service, make_quote, data_dir):
+    name = make_quote("未变化.xlsx")
+    path = os.path.join(data_dir, name)
+    before = os.stat(path).st_mtime_ns
+    version = service.current_version(name)
+
+    result = service.save_versioned(name, service.read_table(name).to_records(), base_version=version)
+    assert result["unchanged"]
+    assert result["version"] == version
+    assert os.stat(path).st_mtime_ns == before
+    assert service.list_versions(name)["history"] == []
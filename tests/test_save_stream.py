@@ -0,0 +1,47 @@
+"""
+流式保存（NDJSON请求体）
+"""
+
+import json
+
+
+def _ndjson(records):
+    """逐行生成请求体（分块传输）"""
+    for record in records:
+        yield (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _records(count):
+    return [{"内容": f"项目{i}", "材料": "钢", "数量": i, "价格": 10.0} for i in range(1, count + 1)]
+
+
+def test_save_stream_writes_records(client, service, make_quote):
+    name = make_quote("流式.xlsx")
+    response = client.post(f"/save-stream/{name}", content=_ndjson(_records(3)))
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["records"] == 3
+    assert response.headers["ETag"] == f'"{body["version"]}"'
+
+    records = service.read_table(name).to_records()
+    assert [r["序号"] for r in records] == [1, 2, 3]
+    assert [r["总价"] for r in records] == [10.0, 20.0, 30.0]
+
+
+def test_invalid_line_keeps_original_file(client, service, make_quote):
+    name = make_quote("流式.xlsx")
+    version = service.current_version(name)
+    lines = list(_ndjson(_records(3)))
+    lines[1] = b'{"content": \n'
+    response = client.post(f"/save-stream/{name}", content=iter(lines))
+    assert response.status_code == 400
+    assert "第2行" in response.json()["detail"]
+    assert service.current_version(name) == version
+    assert len(service.read_table(name)) == 10
+
+
+def test_stale_if_match_returns_412(client, service, make_quote):
+    name = make_quote("流式.xlsx")
+    response = client.post(f"/save-stream/{name}", content=_ndjson(_records(2)), headers={"If-Match": '"0-0"'})
+    assert response.status_code == 412
+    assert len(service.read_table(name)) == 10
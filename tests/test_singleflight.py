@@ -0,0 +1,68 @@
+"""
+同时读取同一文件同一版本的请求共用一次解析
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.singleflight import SingleFlight
+
+READERS = 8
+
+
+def _wait(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.01)
+
+
+def test_concurrent_reads_parse_once(service, make_quote, monkeypatch):
+    name = make_quote("并发.xlsx")
+    calls, release = [], threading.Event()
+    parse_excel = service._parse_excel
+
+    def slow_parse(*args, **kwargs):
+        calls.append(threading.get_ident())
+        release.wait(5)
+        return parse_excel(*args, **kwargs)
+
+    monkeypatch.setattr(service, "_parse_excel", slow_parse)
+    with ThreadPoolExecutor(max_workers=READERS) as pool:
+        futures = [pool.submit(service.read_table, name) for _ in range(READERS)]
+        _wait(lambda: calls)
+        # 让其余请求都进入等待后再结束解析
+        time.sleep(0.2)
+        release.set()
+        tables = [f.result(5) for f in futures]
+
+    assert len(calls) == 1
+    assert all(table is tables[0] for table in tables)
+    assert len(tables[0]) == 10
+    assert service._parses.in_flight() == 0
+
+
+def test_waiters_get_the_same_error():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("解析失败")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "key", fail)
+        started.wait(5)
+        follower = pool.submit(flight.do, "key", lambda: pytest.fail("等待者不应再次执行"))
+        time.sleep(0.1)
+        release.set()
+        with pytest.raises(ValueError) as leader_error:
+            leader.result(5)
+        with pytest.raises(ValueError) as follower_error:
+            follower.result(5)
+    assert follower_error.value is leader_error.value
+    assert flight.in_flight() == 0
@@ -0,0 +1,54 @@
+"""
+解析结果快照：停止时保存，重启后未修改的文件直接从快照加载
+"""
+
+import os
+
+import pytest
+
+from backend.excel_service import ExcelService
+from conftest import HEADER, bump_mtime, quote_rows, write_workbook
+
+
+def _restart(data_dir):
+    """模拟服务重启：新的服务实例载入快照索引"""
+    service = ExcelService(base_dir=data_dir)
+    service.restore_snapshot()
+    return service
+
+
+def test_snapshot_round_trip_across_restart(service, make_quote, data_dir, monkeypatch):
+    make_quote("a.xlsx", quote_rows(6))
+    make_quote("m.xlsx", sheets={"主表": [HEADER] + quote_rows(3), "附表": [HEADER] + quote_rows(2, start=4)})
+    expected = {
+        ("a.xlsx", None): service.read_table("a.xlsx").to_records(),
+        ("m.xlsx", None): service.read_table("m.xlsx").to_records(),
+        ("m.xlsx", "附表"): service.read_table("m.xlsx", "附表").to_records(),
+    }
+    assert service.save_snapshot()["written"] == 3
+
+    restarted = ExcelService(base_dir=data_dir)
+    assert restarted.restore_snapshot() == 3
+
+    def parse(*args, **kwargs):
+        pytest.fail("未修改的文件被重新解析")
+
+    monkeypatch.setattr(restarted, "_parse_excel", parse)
+    for (name, sheet), records in expected.items():
+        assert restarted.read_table(name, sheet).to_records() == records
+    assert restarted.list_sheets("m.xlsx") == ["主表", "附表"]
+
+
+def test_modified_file_is_parsed_again(service, make_quote, data_dir):
+    make_quote("a.xlsx", quote_rows(6))
+    service.read_table("a.xlsx")
+    service.save_snapshot()
+
+    # 停止期间文件被其他程序修改，快照中的解析结果不再使用
+    path = os.path.join(data_dir, "a.xlsx")
+    write_workbook(path, {"报价": [HEADER] + quote_rows(2)})
+    bump_mtime(path)
+
+    restarted = _restart(data_dir)
+    assert len(restarted.read_table("a.xlsx")) == 2
+    assert restarted.save_snapshot()["written"] == 1
@@ -0,0 +1,63 @@
+"""SQLite 镜像同步"""
+
+import os
+
+from conftest import HEADER, bump_mtime, quote_rows, write_workbook
+
+
+def test_full_sync_after_external_edit_keeps_other_files(service, make_quote, data_dir):
+    for name in ("a.xlsx", "b.xlsx", "c.xlsx"):
+        make_quote(name, quote_rows(5))
+    first = service.sync_mirror()
+    assert first["synced"] == 3 and first["removed"] == 0
+    assert service.mirror.query([])["count"] == 15
+
+    # 在服务之外替换其中一个文件（如用Excel编辑后保存）
+    path = os.path.join(data_dir, "b.xlsx")
+    write_workbook(path, {"报价": [HEADER] + quote_rows(8)})
+    bump_mtime(path)
+
+    second = service.sync_mirror()
+    # 只写入变化的行（前5行内容相同）
+    assert second == {"synced": 1, "written": 3, "removed": 0, "errors": {}}
+    assert service.mirror.query([])["count"] == 18
+    assert set(service.mirror.versions()) == {"a.xlsx", "b.xlsx", "c.xlsx"}
+
+
+def test_full_sync_removes_deleted_files(service, make_quote, data_dir):
+    make_quote("a.xlsx", quote_rows(3))
+    make_quote("b.xlsx", quote_rows(4))
+    service.sync_mirror()
+
+    os.remove(os.path.join(data_dir, "a.xlsx"))
+    result = service.sync_mirror()
+    assert result["removed"] == 1
+    assert set(service.mirror.versions()) == {"b.xlsx"}
+    assert service.query([])["count"] == 4
+
+
+def test_multi_sheet_file_is_mirrored_per_sheet(service, make_quote):
+    make_quote("m.xlsx", sheets={"主表": [HEADER] + quote_rows(3), "附表": [HEADER] + quote_rows(2)})
+    service.sync_mirror()
+    rows = service.mirror.query([], limit=10)["rows"]
+    assert sorted({(r["文件"], r["工作表"]) for r in rows}) == [("m.xlsx", "主表"), ("m.xlsx", "附表")]
+
+
+def test_query_does_not_rescan_unchanged_files(service, make_quote, data_dir, monkeypatch):
+    make_quote("a.xlsx", quote_rows(3))
+    make_quote("b.xlsx", quote_rows(4))
+    assert service.query([])["count"] == 7
+
+    listed = []
+    list_files = service.list_excel_files
+    monkeypatch.setattr(service, "list_excel_files", lambda: listed.append(True) or list_files())
+    path = os.path.join(data_dir, "b.xlsx")
+    write_workbook(path, {"报价": [HEADER] + quote_rows(6)})
+    bump_mtime(path)
+
+    # 其他程序的修改由定期全部同步发现；指定文件时查询前检查这些文件
+    assert service.query([])["count"] == 7
+    assert service.query([], files=["b.xlsx"])["count"] == 6
+    assert listed == []
+    service.sync_mirror()
+    assert service.query([])["count"] == 9
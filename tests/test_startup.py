@@ -0,0 +1,34 @@
+"""
+服务启动和停止：重依赖延迟导入、后台预热、停止时保存快照
+"""
+
+import subprocess
+import sys
+import time
+
+from conftest import PROJECT_ROOT
+
+
+def test_import_does_not_load_pandas():
+    code = "import sys, backend.main; print('pandas' in sys.modules, 'openpyxl' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    assert output.split() == ["False", "False"]
+
+
+def test_lifespan_warms_up_and_saves_snapshot(client, service, make_quote, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    name = make_quote("预热.xlsx")
+    stopped = []
+    monkeypatch.setattr(main, "SNAPSHOT", True)
+    monkeypatch.setattr(main.job_manager, "shutdown", lambda: stopped.append(True))
+
+    with TestClient(main.app):
+        deadline = time.monotonic() + 5
+        while (name, None) not in service._cache:
+            assert time.monotonic() < deadline, "预热超时"
+            time.sleep(0.01)
+    assert stopped == [True]
+    assert service.snapshot.restore() == 1
@@ -0,0 +1,73 @@
+"""
+工作簿存储：本地存储的原子替换，内存存储
+"""
+
+import os
+
+import pytest
+
+from backend import storage
+from backend.excel_service import ExcelService
+from backend.storage import LocalStorage, create_storage
+from conftest import quote_rows
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(str(tmp_path / "data"), str(tmp_path / "backups"), str(tmp_path / "locks"))
+
+
+def _temp(local, data):
+    path = os.path.join(local.root, "new.tmp")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_replace_never_removes_the_file(local, monkeypatch):
+    local.write_bytes("a.xlsx", b"old")
+    removed = []
+    real_remove = os.remove
+    monkeypatch.setattr(storage.os, "remove", lambda p: removed.append(p) or real_remove(p))
+
+    local.replace("a.xlsx", _temp(local, b"new"))
+    with open(local.source("a.xlsx"), "rb") as f:
+        assert f.read() == b"new"
+    assert removed == []
+    assert not os.path.exists(os.path.join(local.root, "new.tmp"))
+
+
+def test_failed_replace_keeps_original(local, monkeypatch):
+    local.write_bytes("a.xlsx", b"old")
+    temp = _temp(local, b"new")
+
+    def fail(src, dst):
+        raise PermissionError("文件被占用")
+
+    monkeypatch.setattr(storage.os, "replace", fail)
+    with pytest.raises(PermissionError):
+        local.replace("a.xlsx", temp)
+    with open(local.source("a.xlsx"), "rb") as f:
+        assert f.read() == b"old"
+    assert not os.path.exists(temp)
+
+
+def test_memory_storage_save_and_undo(tmp_path, make_quote, data_dir):
+    make_quote("a.xlsx", quote_rows(5))
+    memory = create_storage("memory", data_dir, str(tmp_path / "backups"), str(tmp_path / "locks"))
+    service = ExcelService(base_dir=str(tmp_path / "service"), storage=memory)
+    assert service.list_excel_files() == ["a.xlsx"]
+
+    before = service.current_version("a.xlsx")
+    records = service.read_table("a.xlsx").to_records()
+    records[0]["内容"] = "修改后"
+    assert service.save_excel("a.xlsx", records[:3]) is True
+    assert service.current_version("a.xlsx") != before
+    assert service.read_table("a.xlsx").to_records()[0]["内容"] == "修改后"
+
+    # 只修改内存中的工作簿，不写回磁盘
+    assert len(ExcelService(base_dir=data_dir).read_table("a.xlsx")) == 5
+
+    assert service.undo("a.xlsx") is True
+    assert len(service.read_table("a.xlsx")) == 5
+    assert service.current_version("a.xlsx") == before
@@ -0,0 +1,42 @@
+"""
+请求阶段追踪：Server-Timing 头和慢请求日志
+"""
+
+from backend import tracing
+
+
+def test_server_timing_merges_stages():
+    trace, token = tracing.start_trace("GET /test")
+    try:
+        trace.add("parse", trace.start, 0.010)
+        trace.add("validate", trace.start + 0.010, 0.002)
+        trace.add("parse", trace.start + 0.012, 0.005)
+    finally:
+        tracing.end_trace(token)
+    assert trace.server_timing(0.020) == "parse;dur=15.0, validate;dur=2.0, total;dur=20.0"
+    assert [s["stage"] for s in trace.breakdown()] == ["parse", "validate", "parse"]
+
+
+def test_span_outside_request_is_noop():
+    assert tracing.current_trace() is None
+    with tracing.span("parse"):
+        pass
+
+
+def test_read_returns_server_timing(client, make_quote):
+    name = make_quote("追踪.xlsx")
+    response = client.get(f"/read/{name}")
+    assert response.status_code == 200
+    stages = [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+    # 在线程池中解析的阶段也记录到请求的追踪中
+    assert "parse" in stages
+    assert stages[-1] == "total"
+
+
+def test_slow_request_is_logged(client, make_quote, monkeypatch, capsys):
+    name = make_quote("慢请求.xlsx")
+    monkeypatch.setattr(tracing, "SLOW_REQUEST_MS", 0.001)
+    assert client.get(f"/read/{name}").status_code == 200
+    output = capsys.readouterr().out
+    assert f"慢请求 GET /read/{name} -> 200" in output
+    assert "parse@" in output
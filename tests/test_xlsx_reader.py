@@ -0,0 +1,36 @@
+"""
+轻量读取器（xlsx_reader）与 pandas 解析结果一致
+"""
+
+import pytest
+
+from backend.excel_service import ExcelService
+from conftest import HEADER, quote_rows, write_workbook
+
+
+def _services(tmp_path, sheets, title=None):
+    """相同文件分别放在两个数据目录中，用轻量读取器和 pandas 解析（互不共用布局缓存）"""
+    services = {}
+    for reader in ("lean", "pandas"):
+        base_dir = tmp_path / reader
+        base_dir.mkdir()
+        write_workbook(str(base_dir / "报价.xlsx"), sheets, title=title)
+        services[reader] = ExcelService(base_dir=str(base_dir), reader=reader)
+    return services["lean"], services["pandas"]
+
+
+@pytest.mark.parametrize("title", [None, "某某项目报价单"])
+def test_lean_reader_matches_pandas(tmp_path, title):
+    rows = quote_rows(20)
+    rows[3][4] = None        # 缺少数量
+    rows[5][1] = "  带空格 "  # 内容两端空格
+    rows[7] = [None] * len(HEADER)  # 空行
+    sheets = {"报价": [HEADER] + rows, "其他": [HEADER] + quote_rows(3, start=50)}
+    lean, pandas = _services(tmp_path, sheets, title=title)
+
+    assert lean.list_sheets("报价.xlsx") == pandas.list_sheets("报价.xlsx")
+    for sheet in (None, "其他"):
+        expected = pandas.read_table("报价.xlsx", sheet)
+        actual = lean.read_table("报价.xlsx", sheet)
+        assert actual.to_records() == expected.to_records()
+        assert actual.total == pytest.approx(expected.total)
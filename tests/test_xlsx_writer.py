@@ -0,0 +1,139 @@
+"""
+xlsx_writer.replace_sheet：只替换一个工作表的数据，不支持的工作表回退到 openpyxl
+"""
+
+import io
+import os
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.workbook.defined_name import DefinedName
+
+from backend import xlsx_writer
+from backend.xlsx_reader import UnsupportedWorkbook
+from conftest import HEADER, quote_rows, write_workbook
+
+
+def _workbook(tmp_path, edit=None):
+    path = str(tmp_path / "src.xlsx")
+    write_workbook(path, {"报价": [HEADER] + quote_rows(10), "说明": [["备注"], ["保留"]]})
+    if edit is not None:
+        wb = load_workbook(path)
+        edit(wb)
+        wb.save(path)
+    return path
+
+
+def _replace(src, tmp_path):
+    return xlsx_writer.replace_sheet(src, str(tmp_path / "dst.xlsx"), "报价", HEADER, quote_rows(3))
+
+
+def test_replace_sheet_keeps_other_sheets(tmp_path):
+    src = _workbook(tmp_path)
+    assert _replace(src, tmp_path) == 3
+    wb = load_workbook(str(tmp_path / "dst.xlsx"))
+    assert wb["报价"].max_row == 4
+    assert [c.value for c in wb["说明"][2]] == ["保留"]
+
+
+@pytest.mark.parametrize("edit", [
+    lambda wb: wb["报价"].conditional_formatting.add(
+        "E2:E11", CellIsRule(operator="greaterThan", formula=["3"])),
+    lambda wb: setattr(wb["报价"].auto_filter, "ref", "A1:I11"),
+    lambda wb: wb.defined_names.add(DefinedName("数量列", attr_text="报价!$E$2:$E$11")),
+], ids=["conditional_formatting", "auto_filter", "defined_name"])
+def test_range_parts_are_unsupported(tmp_path, edit):
+    with pytest.raises(UnsupportedWorkbook):
+        _replace(_workbook(tmp_path, edit), tmp_path)
+
+
+def test_defined_name_of_other_sheet_is_supported(tmp_path):
+    edit = lambda wb: wb.defined_names.add(DefinedName("备注", attr_text="说明!$A$2"))
+    assert _replace(_workbook(tmp_path, edit), tmp_path) == 3
+
+
+def test_missing_sheet_data_is_unsupported(tmp_path):
+    src = _workbook(tmp_path)
+    broken = str(tmp_path / "broken.xlsx")
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(broken, "w") as zout:
+        for info in zin.infolist():
+            data = zin.read(info.filename)
+            if info.filename == "xl/worksheets/sheet1.xml":
+                data = data.replace(b"sheetData", b"sheetDatum")
+            zout.writestr(info, data)
+    with pytest.raises(UnsupportedWorkbook):
+        _replace(broken, tmp_path)
+
+
+def test_save_falls_back_for_conditional_formatting(service, make_quote, data_dir):
+    name = make_quote("条件格式.xlsx")
+    path = os.path.join(data_dir, name)
+    wb = load_workbook(path)
+    wb["报价"].conditional_formatting.add("E2:E11", CellIsRule(operator="greaterThan", formula=["3"]))
+    wb.save(path)
+
+    records = service.read_table(name).to_records()[:4]
+    assert service.save_excel(name, records) is True
+    assert len(service.read_table(name)) == 4
+
+
+def _with_images(path):
+    """在两个工作表中各插入一张图片"""
+    from openpyxl.drawing.image import Image
+    from PIL import Image as PILImage
+
+    wb = load_workbook(path)
+    for name, cell in (("报价", "K2"), ("说明", "B2")):
+        data = io.BytesIO()
+        PILImage.new("RGB", (8, 8), "red").save(data, format="PNG")
+        data.seek(0)
+        wb[name].add_image(Image(data), cell)
+    wb.save(path)
+
+
+def test_save_sheet_keeps_other_sheets_and_images(service, make_quote, data_dir):
+    name = make_quote("多表.xlsx", sheets={
+        "报价": [HEADER] + quote_rows(10),
+        "说明": [["说明"], ["付款方式：月结"]],
+    })
+    path = os.path.join(data_dir, name)
+    _with_images(path)
+
+    records = service.read_table(name, "报价").to_records()
+    records[0]["内容"] = "修改后"
+    assert service.save_excel(name, records[:6], "报价") is True
+
+    table = service.read_table(name, "报价")
+    assert len(table) == 6
+    assert table.to_records()[0]["内容"] == "修改后"
+    wb = load_workbook(path)
+    assert wb.sheetnames == ["报价", "说明"]
+    assert wb["说明"]["A2"].value == "付款方式：月结"
+    assert len(wb["报价"]._images) == 1
+    assert len(wb["说明"]._images) == 1
+    with zipfile.ZipFile(path) as z:
+        assert len([n for n in z.namelist() if n.startswith("xl/media/")]) == 2
+
+
+@pytest.mark.parametrize("edit", [
+    lambda wb: wb.defined_names.add(DefinedName("范围", attr_text="'报价'!$A$1:$D$6")),
+    lambda wb: wb["报价"].conditional_formatting.add(
+        "E2:E6", CellIsRule(operator="greaterThan", formula=["3"])),
+], ids=["defined_name", "conditional_formatting"])
+def test_fallback_keeps_rows_of_multi_sheet_save(service, make_quote, data_dir, edit):
+    # 多工作表文件逐行生成数据（生成器），回退到 openpyxl 时不能丢失数据行
+    name = make_quote("回退.xlsx", sheets={"报价": [HEADER] + quote_rows(5), "说明": [["说明"]]})
+    path = os.path.join(data_dir, name)
+    wb = load_workbook(path)
+    edit(wb)
+    wb.save(path)
+
+    records = service.read_table(name, "报价").to_records()
+    records[0]["内容"] = "修改后"
+    assert service.save_excel(name, records, "报价") is True
+    ws = load_workbook(path)["报价"]
+    assert ws.max_row == 6
+    assert ws["B2"].value == "修改后"
+    assert len(service.read_table(name, "报价")) == 5